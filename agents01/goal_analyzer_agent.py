@@ -0,0 +1,35 @@
+from typing import List, Optional
+from pydantic import BaseModel
+from agents import Agent
+
+class ParsedGoalDetails(BaseModel):
+    goal_type: Optional[str] = None # weight_loss, weight_gain, muscle_gain, endurance, flexibility, maintenance, general_fitness, diet
+    target_quantity: Optional[float] = None
+    target_unit: Optional[str] = None # kg, lb, km, mi
+    target_kg: Optional[float] = None
+    deadline: Optional[str] = None # YYYY-MM-DD
+    diet_keywords: List[str] = []
+
+class GoalAnalyzerAgent(Agent):
+    name: str = "GoalAnalyzerAgent"
+
+    description: str = (
+        "Parses free-text health and fitness goals that the rule-based GoalAnalyzerTool "
+        "could not understand with confidence."
+    )
+
+    base_instructions: str = (
+        "Extract the user's goal into the structured fields. Use null for anything the user did not say. "
+        "target_kg is the amount to lose or gain in kilograms (convert pounds), never the target body weight. Resolve relative deadlines to an absolute date, counting from today's date given with the goal. "
+        "Do not invent targets or deadlines."
+    )
+
+    tools = []
+
+    def __init__(self):
+        super().__init__(
+            name=self.name,
+            instructions=f"{self.description}\n\n{self.base_instructions}",
+            tools=self.tools,
+            output_type=ParsedGoalDetails,
+        )
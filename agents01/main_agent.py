@@ -1,9 +1,10 @@
-from agents import Agent 
+from agents import Agent, RunContextWrapper, handoff
 from tools.goal_analyzer_tool import GoalAnalyzerTool
 from tools.meal_planner_tool import MealPlannerTool
 from tools.workout_recommender_tool import WorkoutRecommenderTool
 from tools.checkin_scheduler_tool import CheckinSchedulerTool
 from tools.progress_tracker_tool import ProgressTrackerTool
+from tools.progress_summary_tool import ProgressSummaryTool
 
 class HealthWellnessAgent(Agent):
     name: str = "HealthWellnessAgent"
@@ -18,7 +19,7 @@ class HealthWellnessAgent(Agent):
         "1. Collect fitness and dietary goals through multi-turn conversation.\n"
         "2. Analyze goals using the GoalAnalyzerTool.\n"
         "3. Generate customized meal and workout plans.\n"
-        "4. Track progress and schedule reminders.\n"
+        "4. Track progress and schedule reminders. For 'how am I trending' questions use ProgressSummaryTool.\n"
         "5. Maintain context across interactions.\n"
         "6. Validate inputs and produce structured outputs.\n"
         "7. Hand off to specialized agents when needed (nutrition, injury, escalation).\n"
@@ -31,6 +32,7 @@ class HealthWellnessAgent(Agent):
         WorkoutRecommenderTool,
         CheckinSchedulerTool,
         ProgressTrackerTool,
+        ProgressSummaryTool,
     ]
 
     handoff_to_agents = []  # will be set in main.py
@@ -41,3 +43,35 @@ class HealthWellnessAgent(Agent):
             instructions=f"{self.description}\n\n{self.base_instructions}",
             tools=self.tools,
         )
+
+def _log_model_handoff(handoff_type: str):
+    # Records handoffs the model decides on, through the same path as the classifier and endpoints.
+    def on_handoff(ctx: RunContextWrapper) -> None:
+        from context import UserSessionContext
+        from services.handoff_classifier import record_handoff
+
+        if isinstance(ctx.context, UserSessionContext):
+            record_handoff(ctx.context, handoff_type, "model-initiated handoff", source="agent")
+    return on_handoff
+
+def build_health_wellness_agent() -> HealthWellnessAgent:
+    """
+    Builds the main agent with its tools and the specialist agents it can hand off to.
+    Build it once and reuse it: the agent holds no per-user state.
+    """
+    from agents01.escalation_agent import EscalationAgent
+    from agents01.nutrition_expert_agent import NutritionExpertAgent
+    from agents01.injury_support_agent import InjurySupportAgent
+    from services.handoff_classifier import handoff_type_for
+
+    agent = HealthWellnessAgent()
+    agent.handoff_to_agents = [
+        EscalationAgent(),
+        NutritionExpertAgent(),
+        InjurySupportAgent(),
+    ]
+    agent.handoffs = [
+        handoff(specialist, on_handoff=_log_model_handoff(handoff_type_for(specialist.name)))
+        for specialist in agent.handoff_to_agents
+    ]
+    return agent
@@ -1,19 +1,112 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime # Added datetime import
 
-from agents01.main_agent import HealthWellnessAgent
 from context import UserSessionContext
-
-app = FastAPI()
-
-# In-memory store for user sessions (for demonstration purposes)
-# Production kay liye, isko database ya kisi aur persistent storage say replace karna hoga
-user_sessions: Dict[str, UserSessionContext] = {}
-
-# Agent ko initialize karain. Ye production main theek tareeqay say manage karna hoga.
-health_wellness_agent_instance = HealthWellnessAgent()
+from services.session_store import create_session_store
+from services.session_locks import UserLocks, save_session, update_session
+from services.plan_cache import get_plan_cache
+from services.job_queue import JobQueueFullError, get_job_queue
+from services.progress_store import get_progress_store
+from services.metric_series import UnitMismatchError, get_metric_store
+from services.bulk_ingest import BulkIngestError, detect_format, ingest
+from services.meal_batch import refresh_meal_plans
+from services.checkin_scheduler import get_checkin_scheduler, parse_time_of_day
+from services.conversation import get_conversation_service
+from services.handoff_classifier import record_handoff
+from services.user_ids import get_user_id_registry
+from services.metrics import REGISTRY
+from services.instrumentation import MetricsMiddleware, StackSampler
+from services.admission import AdmissionMiddleware, get_admission_controller
+from services.model_client import get_upstream_limiter
+import config
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model client is built lazily in config.py, so startup does no network I/O.
+    # The optional warm-up runs in the background and never delays serving requests.
+    warmup_task = asyncio.create_task(config.warm_up()) if config.WARMUP_ON_STARTUP else None
+    # Plans for the most common stored goal/diet combinations are built in the background too.
+    precompute_task = (
+        asyncio.create_task(plan_cache.precompute_popular(session_store, config.PLAN_PRECOMPUTE_TOP_N))
+        if config.PLAN_PRECOMPUTE_ON_STARTUP else None
+    )
+    # Check-in reminders: reload persisted schedules and tick in the background; reminders missed while
+    # down are caught up by the first tick, after the app has started serving.
+    if config.CHECKIN_SCHEDULER_ENABLED:
+        await checkin_scheduler.start()
+    # Background jobs: re-queue anything left over from the last run, then start the workers.
+    await job_queue.start()
+    if profiler is not None:
+        profiler.start() # Samples this (the event loop's) thread
+    yield
+    if profiler is not None:
+        profiler.stop()
+    await job_queue.stop()
+    await checkin_scheduler.stop()
+    for task in (warmup_task, precompute_task):
+        if task is not None and not task.done():
+            task.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-user and global rate limits, and 503s for model-calling routes once too many are in flight.
+# Added before the metrics middleware so rejected requests are still timed and counted.
+admission = get_admission_controller()
+if config.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission, max_body_bytes=config.ADMISSION_MAX_BODY_BYTES)
+# Latency histograms per route (plus per tool and model call, recorded where those run), at /metrics.
+if config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Optional sampling profiler of the event loop thread, at /debug/profile.
+profiler = StackSampler(config.PROFILER_INTERVAL_SECONDS) if config.PROFILER_ENABLED else None
+
+# Session store: bounded in-memory LRU tier in front of a local SQLite (WAL) file.
+# Sessions survive restarts and are shared by all uvicorn workers using the same DATABASE_PATH.
+session_store = create_session_store()
+
+# Session updates for one user run one at a time (per-user asyncio locks, no cross-user waiting);
+# across workers, stale writes are detected by the store's row version and retried.
+user_locks = UserLocks()
+
+# Goal analysis and plans shared by every /set_goal with the same inputs (content-hash keyed LRU).
+plan_cache = get_plan_cache()
+
+# Stable integer uid per user_id, allocated once in SQLite and shared by every worker.
+user_id_registry = get_user_id_registry()
+
+# Progress logs live in their own append-only, time-indexed table instead of inside the session,
+# so logging an entry does not rewrite or return the user's whole history.
+progress_store = get_progress_store()
+
+# Numeric metrics (weight, steps, ...) as compact per-user time series with NumPy aggregates.
+# Wearable exports are uploaded in bulk through /bulk_track_progress (services/bulk_ingest.py).
+metric_store = get_metric_store()
+
+# Weekly check-in scheduler (heap + SQLite), started and stopped with the app.
+checkin_scheduler = get_checkin_scheduler()
+
+# Background jobs (bounded asyncio worker pool, status in SQLite), started and stopped with the app.
+# /set_goal?async=true runs there and is polled through /jobs/{job_id}.
+job_queue = get_job_queue()
+
+# Queue depth and cache effectiveness, read when /metrics is scraped.
+REGISTRY.gauge("job_queue_pending", "Jobs waiting for a worker.", lambda: job_queue.pending)
+REGISTRY.gauge("plan_cache_hits", "/set_goal plan lookups served from the plan cache.", lambda: plan_cache.hits)
+REGISTRY.gauge("plan_cache_misses", "/set_goal plan lookups that built plans.", lambda: plan_cache.misses)
+REGISTRY.gauge("model_requests_in_flight", "Upstream model requests in flight.", lambda: get_upstream_limiter().in_flight)
+REGISTRY.gauge("admission_model_requests", "Model-calling requests admitted and still running.", lambda: admission.model_requests)
+REGISTRY.gauge("model_requests_waiting", "Model calls waiting for the upstream limiter.", lambda: get_upstream_limiter().waiting)
+
+# One HealthWellnessAgent (tools + specialist handoffs) shared by every chat request, run
+# asynchronously with a cap on concurrent model calls (config.MAX_CONCURRENT_MODEL_CALLS).
+# Each user's recent conversation is kept in SQLite and truncated to a token budget per turn.
+conversation_service = get_conversation_service()
 
 class GoalRequest(BaseModel):
     user_id: str
@@ -29,10 +122,28 @@ class PlanResponse(BaseModel):
     workout_plan: Optional[Dict[str, Any]] = None
     # Aur bhi fields jo aap return karna chahtay hain
 
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    user_id: str
+    status: str # queued, running, succeeded or failed
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None # The endpoint's normal response once succeeded
+    error: Optional[str] = None
+
 # Pydantic models for Check-in Scheduler Tool
 class CheckinRequest(BaseModel):
     user_id: str
-    checkin_date: str # YYYY-MM-DD format
+    checkin_date: str # YYYY-MM-DD format; first check-in, repeated weekly on the same weekday
+    checkin_time: str = "09:00" # HH:MM or '9 AM'
+    reminder_type: str = "email"
     notes: Optional[str] = None
 
 class CheckinResponse(BaseModel):
@@ -43,18 +154,48 @@ class CheckinResponse(BaseModel):
 
 # Pydantic models for Progress Tracker Tool
 class ProgressLog(BaseModel):
+    id: Optional[int] = None
     timestamp: str
     entry: str
 
 class ProgressUpdateRequest(BaseModel):
     user_id: str
     log_entry: str
+    metric_name: Optional[str] = None # e.g. 'weight'; with metric_value, also stored as a numeric data point
+    metric_value: Optional[str] = None # e.g. '72.5 kg' or '8000'
+
+class ProgressUpdateResponse(BaseModel):
+    user_id: str
+    status: str
+    message: str
+    entry: ProgressLog
+    total_entries: int
+    metric: Optional[Dict[str, Any]] = None # The numeric data point recorded, if any
+
+class BulkProgressResponse(BaseModel):
+    user_id: str
+    status: str
+    message: str
+    rows_received: int
+    rows_ingested: int
+    rows_rejected: int
+    metrics_recorded: int # Accepted rows that carried a numeric metric
+    total_entries: int
+    errors: List[str] # First few rejected rows with the reason
+
+class ProgressSummaryResponse(BaseModel):
+    user_id: str
+    status: str
+    message: str
+    summaries: List[Dict[str, Any]]
 
 class ProgressResponse(BaseModel):
     user_id: str
     status: str
     message: str
     progress_logs: List[ProgressLog]
+    total_entries: int # Entries in the since/until range, or all the user's entries without one
+    next_cursor: Optional[int] = None # Pass as `cursor` to fetch the next page
 
 # Pydantic models for Handoffs
 class HandoffRequest(BaseModel):
@@ -69,99 +210,147 @@ class HandoffResponse(BaseModel):
     handoff_type: str
     expert_contact: Optional[str] = None
 
-@app.post("/set_goal", response_model=PlanResponse) # Add response_model for better docs
-async def set_user_goal(request: GoalRequest):
-    try:
-        user_id = request.user_id
-        
-        # Get or create user session context
-        if user_id not in user_sessions:
-            user_sessions[user_id] = UserSessionContext(
-                name=request.user_name,
-                uid=hash(user_id) % (10**8),
-            )
-        user_context = user_sessions[user_id]
-
-        # Update context with current request data
-        # Note: This simply updates the context's goal and diet preferences.
-        # A real GoalAnalyzerTool would parse and validate the goal_description.
-        user_context.goal = {"description": request.goal_description}
+# Pydantic models for bulk meal-plan regeneration
+class BulkMealPlanRequest(BaseModel):
+    user_ids: Optional[List[str]] = None # None regenerates plans for every stored user
+
+class BulkMealPlanResponse(BaseModel):
+    status: str
+    message: str
+    updated_users: int
+    missing_user_ids: List[str]
+
+# Pydantic models for chat
+class ChatRequest(BaseModel):
+    user_id: str
+    message: str
+
+class ChatResponse(BaseModel):
+    user_id: str
+    status: str
+    message: str
+    reply: str
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def _set_goal(request: GoalRequest) -> PlanResponse:
+    user_id = request.user_id
+    uid = user_id_registry.uid_for(user_id)
+
+    # Goal analysis and plans depend only on the request, so they are looked up (or built)
+    # before taking the user's lock. Identical inputs, from this user or any other, are served
+    # from the plan cache without re-parsing the goal or asking the LLM again.
+    plans = await plan_cache.get_or_build(request.goal_description, request.diet_preferences)
+    goal = plans.goal_for(request.goal_description)
+
+    def apply(user_context: UserSessionContext):
+        user_context.uid = uid # Also replaces per-process hash uids from older sessions
         user_context.diet_preferences = request.diet_preferences
+        user_context.goal = goal
+        user_context.meal_plan = list(plans.meal_plan)
+        user_context.workout_plan = plans.workout_plan
 
-        # --- Simulating Agent's Internal Tool Orchestration ---
-        # A proper HealthWellnessAgent would have an internal method (e.g., `ainvoke` or `process_goal`)
-        # that orchestrates its tools (GoalAnalyzerTool, MealPlannerTool, WorkoutRecommenderTool).
-        # Since that method is not exposed in the provided HealthWellnessAgent class,
-        # we are simulating the outcome of those tools by directly modifying the UserSessionContext.
-
-        # 1. Goal Analysis (Simulated by updating context directly)
-        # In a real scenario, GoalAnalyzerTool would process request.goal_description
-        # and update user_context.goal with a structured, analyzed goal.
-        user_context.goal["status"] = "analyzed" # Mark as analyzed
-
-        # 2. Meal Plan Generation (Simulated)
-        # MealPlannerTool would use user_context.diet_preferences and user_context.goal
-        # to generate a detailed meal plan.
-        user_context.meal_plan = [
-            f"Monday: Healthy meal based on goal: {request.goal_description} & preference: {request.diet_preferences}",
-            f"Tuesday: Nutritious meal for {request.diet_preferences}",
-            f"Wednesday: Balanced meal for {request.diet_preferences}",
-            "Thursday: Protein-rich dinner recommendation",
-            "Friday: Light and fresh meal idea",
-            "Saturday: Moderately flexible meal",
-            "Sunday: Family-friendly healthy option"
-        ]
-        
-        # 3. Workout Plan Recommendation (Simulated)
-        # WorkoutRecommenderTool would use user_context.goal to create a workout plan.
-        user_context.workout_plan = {
-            "Monday": f"Strength Training (Full Body) for goal: {request.goal_description}",
-            "Tuesday": "Cardio (Running 45 min)",
-            "Wednesday": "Rest / Active Recovery (e.g., light stretching)",
-            "Thursday": "Yoga / Flexibility session",
-            "Friday": "High-Intensity Interval Training (HIIT)",
-            "Saturday": "Long Walk / Hike (Outdoor activity)",
-            "Sunday": "Complete Rest"
-        }
-        
-        # --- End of Simulation ---
-
-        # Update the session with the modified context (redundant if context is mutable, but good practice for clarity)
-        user_sessions[user_id] = user_context
-
-        return PlanResponse(
-            user_id=user_id,
-            status="success",
-            message="Goals processed and plans generated by agent (simulated).",
-            meal_plan=user_context.meal_plan,
-            workout_plan=user_context.workout_plan
-        )
+    # Get or create the user's session, update it and persist it
+    user_context, _ = await update_session(
+        session_store, user_locks, user_id, apply,
+        create=lambda: UserSessionContext(name=request.user_name, uid=uid),
+    )
+
+    return PlanResponse(
+        user_id=user_id,
+        status="success",
+        message="Goals processed and plans generated.",
+        meal_plan=user_context.meal_plan,
+        workout_plan=user_context.workout_plan
+    )
+
+async def _set_goal_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return (await _set_goal(GoalRequest(**payload))).model_dump()
+
+job_queue.register("set_goal", _set_goal_job)
+
+@app.post("/set_goal", response_model=PlanResponse) # Add response_model for better docs
+async def set_user_goal(request: GoalRequest, run_async: bool = Query(False, alias="async")):
+    """
+    Analyzes the goal and builds meal and workout plans. With ?async=true the work is queued as
+    a background job instead: the response (202) carries a job id to poll at /jobs/{job_id}.
+    """
+    if run_async:
+        try:
+            job = job_queue.submit("set_goal", request.user_id, request.model_dump())
+        except JobQueueFullError as e:
+            raise HTTPException(status_code=503, detail=f"Too many queued jobs, retry later: {e}")
+        response = JobResponse(job_id=job.job_id, status=job.status, status_url=f"/jobs/{job.job_id}")
+        return JSONResponse(status_code=202, content=response.model_dump())
+    try:
+        return await _set_goal(request)
     except Exception as e:
         # Robust Error Handling
         print(f"Error processing /set_goal for user {request.user_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp is not None else None
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return JobStatusResponse(
+        job_id=job.job_id,
+        kind=job.kind,
+        user_id=job.user_id,
+        status=job.status,
+        created_at=_isoformat(job.created_at),
+        started_at=_isoformat(job.started_at),
+        finished_at=_isoformat(job.finished_at),
+        result=job.result,
+        error=job.error,
+    )
+
 @app.post("/schedule_checkin", response_model=CheckinResponse)
 async def schedule_checkin(request: CheckinRequest):
     try:
         user_id = request.user_id
-        if user_id not in user_sessions:
+        if user_id not in session_store:
             raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
-        user_context = user_sessions[user_id]
 
-        # Simulate CheckinSchedulerTool
-        # In a real tool, this would schedule a reminder or store the check-in details.
-        # Assuming UserSessionContext can store scheduled_checkins
-        if not hasattr(user_context, 'scheduled_checkins') or user_context.scheduled_checkins is None:
-            user_context.scheduled_checkins = []
-        user_context.scheduled_checkins.append({"date": request.checkin_date, "notes": request.notes})
+        try:
+            checkin_date = datetime.strptime(request.checkin_date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="checkin_date must be in YYYY-MM-DD format.")
+        time_of_day = parse_time_of_day(request.checkin_time)
+        if time_of_day is None:
+            raise HTTPException(status_code=400, detail="checkin_time must look like '09:00' or '9 AM'.")
+
+        # Register the recurring weekly check-in with the scheduler (same one CheckinSchedulerTool uses).
+        # It is persisted and a reminder is sent through the notifier on every occurrence.
+        hour, minute = time_of_day
+        entry = checkin_scheduler.schedule(
+            user_id,
+            checkin_date.weekday(),
+            hour,
+            minute,
+            reminder_type=request.reminder_type,
+            notes=request.notes or "",
+            first_fire_at=checkin_date.replace(hour=hour, minute=minute),
+        )
 
-        user_sessions[user_id] = user_context # Update session
+        # The session mirrors the active schedule (one recurring check-in per user).
+        def apply(user_context: UserSessionContext):
+            user_context.scheduled_checkins = [entry.as_dict()]
+        updated = await update_session(session_store, user_locks, user_id, apply)
+        if updated is None:
+            raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
+        user_context, _ = updated
 
         return CheckinResponse(
             user_id=user_id,
             status="success",
-            message=f"Check-in scheduled for {request.checkin_date}.",
+            message=f"Weekly check-in scheduled. Next check-in: {entry.as_dict()['next_checkin']}.",
             scheduled_checkins=user_context.scheduled_checkins
         )
     except HTTPException as e:
@@ -170,28 +359,43 @@ async def schedule_checkin(request: CheckinRequest):
         print(f"Error scheduling check-in for user {request.user_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
-@app.post("/track_progress", response_model=ProgressResponse)
+async def import_session_progress(user_id: str) -> None:
+    """
+    Moves progress_logs saved in the session before the progress store existed into the store
+    (once per user), so /get_progress lists the user's whole history.
+    """
+    if not progress_store.has_imported(user_id):
+        await update_session(session_store, user_locks, user_id, lambda user_context: progress_store.import_session(user_id, user_context))
+
+@app.post("/track_progress", response_model=ProgressUpdateResponse)
 async def track_progress(request: ProgressUpdateRequest):
     try:
         user_id = request.user_id
-        if user_id not in user_sessions:
+        if user_id not in session_store:
             raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
-        user_context = user_sessions[user_id]
-
-        # Simulate ProgressTrackerTool
-        # This tool would typically add a log entry to the user's progress.
-        # Assuming UserSessionContext can store progress_logs (List[Dict[str, str]])
-        if not hasattr(user_context, 'progress_logs') or user_context.progress_logs is None:
-            user_context.progress_logs = []
-        user_context.progress_logs.append({"timestamp": datetime.now().isoformat(), "entry": request.log_entry})
 
-        user_sessions[user_id] = user_context # Update session
-
-        return ProgressResponse(
+        metric = None
+        if request.metric_name and request.metric_value:
+            # Numeric metrics go into the user's columnar time series (same store ProgressTrackerTool uses).
+            try:
+                recorded = metric_store.record_text(user_id, request.metric_name, request.metric_value)
+            except UnitMismatchError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if recorded is None:
+                raise HTTPException(status_code=400, detail="metric_value must be a number with an optional unit, e.g. '72.5 kg'.")
+            metric = dict(zip(("metric", "value", "unit"), recorded))
+
+        await import_session_progress(user_id)
+        # Append-only write: cost does not depend on how many entries the user already has.
+        entry, total_entries = progress_store.append(user_id, request.log_entry)
+
+        return ProgressUpdateResponse(
             user_id=user_id,
             status="success",
             message="Progress logged successfully.",
-            progress_logs=user_context.progress_logs # Direct return of list of dicts
+            entry=entry,
+            total_entries=total_entries,
+            metric=metric
         )
     except HTTPException as e:
         raise e
@@ -199,19 +403,68 @@ async def track_progress(request: ProgressUpdateRequest):
         print(f"Error tracking progress for user {request.user_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+@app.post("/bulk_track_progress/{user_id}", response_model=BulkProgressResponse)
+async def bulk_track_progress(user_id: str, request: Request, format: Optional[str] = None):
+    """
+    Bulk upload of progress/wearable rows as NDJSON or CSV (see services/bulk_ingest.py).
+    The format comes from `?format=` or the Content-Type header. The body is parsed as it
+    streams in and accepted rows (progress entries and metric points) are stored in one
+    transaction; invalid rows are skipped.
+    """
+    try:
+        if user_id not in session_store:
+            raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
+        fmt = (format or detect_format(request.headers.get("content-type")) or "").lower()
+        if not fmt:
+            raise HTTPException(status_code=415, detail="Send NDJSON (application/x-ndjson) or CSV (text/csv), or pass ?format=ndjson|csv.")
+
+        await import_session_progress(user_id)
+        result = await ingest(user_id, request.stream(), fmt, progress_store, metric_store)
+
+        return BulkProgressResponse(
+            user_id=user_id,
+            status="success" if result.rows_ingested or not result.rows_rejected else "failed",
+            message=f"Ingested {result.rows_ingested} of {result.rows_received} rows.",
+            rows_received=result.rows_received,
+            rows_ingested=result.rows_ingested,
+            rows_rejected=result.rows_rejected,
+            metrics_recorded=result.metrics_recorded,
+            total_entries=result.total_entries,
+            errors=result.errors
+        )
+    except HTTPException as e:
+        raise e
+    except BulkIngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnitMismatchError as e:
+        # A concurrent write changed a series' unit after the rows were validated; nothing was stored.
+        raise HTTPException(status_code=409, detail=f"{e} The series changed during the upload and nothing was stored; retry the upload.")
+    except Exception as e:
+        print(f"Error bulk tracking progress for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
 @app.get("/get_progress/{user_id}", response_model=ProgressResponse)
-async def get_progress(user_id: str):
+async def get_progress(
+    user_id: str,
+    cursor: Optional[int] = None, # `next_cursor` from the previous page
+    limit: int = Query(50, ge=1, le=500),
+    since: Optional[datetime] = None, # Inclusive lower bound on entry timestamp
+    until: Optional[datetime] = None, # Exclusive upper bound on entry timestamp
+):
     try:
-        if user_id not in user_sessions:
+        if user_id not in session_store:
             raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
-        user_context = user_sessions[user_id]
 
-        # Return existing progress logs
+        # Return one page of progress logs in chronological order
+        await import_session_progress(user_id)
+        progress_logs, next_cursor = progress_store.list(user_id, cursor=cursor, limit=limit, since=since, until=until)
         return ProgressResponse(
             user_id=user_id,
             status="success",
             message="Progress logs retrieved successfully.",
-            progress_logs=user_context.progress_logs if user_context.progress_logs else []
+            progress_logs=progress_logs,
+            total_entries=progress_store.count(user_id, since=since, until=until),
+            next_cursor=next_cursor
         )
     except HTTPException as e:
         raise e
@@ -219,16 +472,124 @@ async def get_progress(user_id: str):
         print(f"Error retrieving progress for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+@app.get("/progress_summary/{user_id}", response_model=ProgressSummaryResponse)
+async def progress_summary(user_id: str, metric: Optional[str] = None, window_days: int = Query(7, ge=1, le=90)):
+    try:
+        user_context = session_store.get(user_id)
+        if user_context is None:
+            raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
+
+        # Aggregates (rolling average, weekly deltas, trend toward the goal) computed over the stored series.
+        metrics = [metric] if metric else metric_store.metrics(user_id)
+        summaries = [
+            summary for summary in (
+                metric_store.summary(user_id, name, goal=user_context.goal, window_days=window_days) for name in metrics
+            ) if summary is not None
+        ]
+        return ProgressSummaryResponse(
+            user_id=user_id,
+            status="success",
+            message=f"Summaries for {len(summaries)} metrics.",
+            summaries=summaries
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Error summarizing progress for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.post("/bulk_meal_plans", response_model=BulkMealPlanResponse)
+async def bulk_meal_plans(request: BulkMealPlanRequest):
+    try:
+        # Regenerates meal plans from each user's stored goal and diet preferences.
+        # Users are planned in batches with one vectorized NumPy pass per batch (services/meal_batch.py).
+        # A user whose session changes meanwhile (e.g. /set_goal) is re-planned from the saved session.
+        user_ids = request.user_ids if request.user_ids is not None else session_store.user_ids()
+        updated_users, missing_user_ids = await asyncio.to_thread(refresh_meal_plans, session_store, user_ids)
+
+        return BulkMealPlanResponse(
+            status="success",
+            message=f"Meal plans regenerated for {updated_users} users.",
+            updated_users=updated_users,
+            missing_user_ids=missing_user_ids
+        )
+    except Exception as e:
+        print(f"Error regenerating bulk meal plans: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    try:
+        user_id = request.user_id
+        # The user's lock is held for the whole run, so a second message from the same user
+        # waits instead of saving over this run's changes.
+        async with user_locks.hold(user_id):
+            user_context = session_store.get(user_id)
+            if user_context is None:
+                raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
+
+            # The stored session is the run context, so tools see (and may update) the user's state.
+            user_context.uid = user_id_registry.uid_for(user_id) # Tools map the uid back to user_id
+            reply = await conversation_service.chat(user_id, request.message, context=user_context)
+            save_session(session_store, user_id, user_context) # Persist anything the run changed
+
+        return ChatResponse(
+            user_id=user_id,
+            status="success",
+            message="Reply generated.",
+            reply=reply
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"Error processing /chat for user {request.user_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streams the agent's reply as Server-Sent Events: one `data: {"delta": ...}` event per text chunk,
+    then `event: done` (or `event: error` if the run fails part-way).
+    """
+    user_id = request.user_id
+    if user_id not in session_store:
+        raise HTTPException(status_code=404, detail="User session not found. Please set a goal first.")
+
+    async def events():
+        try:
+            async with user_locks.hold(user_id): # Held until the reply is complete and saved, as in /chat
+                user_context = session_store.get(user_id)
+                if user_context is None:
+                    yield _sse({"detail": "User session not found. Please set a goal first."}, event="error")
+                    return
+                user_context.uid = user_id_registry.uid_for(user_id) # Tools map the uid back to user_id
+                async for delta in conversation_service.stream_chat(user_id, request.message, context=user_context):
+                    yield _sse({"delta": delta})
+                save_session(session_store, user_id, user_context)
+            yield _sse({"user_id": user_id}, event="done")
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in-stream instead of as a 500.
+            print(f"Error streaming chat for user {user_id}: {e}")
+            yield _sse({"detail": f"Internal Server Error: {str(e)}"}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def _record_endpoint_handoff(request: HandoffRequest, handoff_type: str) -> None:
+    # Same record_handoff() path the chat classifier and model-initiated handoffs use.
+    # A user may ask for an expert before setting a goal; then there is no session to log into yet.
+    reason = f"{request.reason}: {request.details}" if request.details else request.reason
+    await update_session(
+        session_store, user_locks, request.user_id,
+        lambda user_context: record_handoff(user_context, handoff_type, reason, source="api"),
+    )
+
 @app.post("/request_human_coach", response_model=HandoffResponse)
 async def request_human_coach(request: HandoffRequest):
     try:
         user_id = request.user_id
-        if user_id not in user_sessions:
-            # It's possible a user requests a coach without a full session, depending on design.
-            # For this example, we'll allow it but note session state.
-            pass # Or create a minimal session
+        await _record_endpoint_handoff(request, "escalation_agent")
 
-        # Simulate EscalationAgent handoff
+        # EscalationAgent handoff
         # In a real scenario, this would notify a human coach system.
         return HandoffResponse(
             user_id=user_id,
@@ -245,10 +606,9 @@ async def request_human_coach(request: HandoffRequest):
 async def consult_nutrition_expert(request: HandoffRequest):
     try:
         user_id = request.user_id
-        if user_id not in user_sessions:
-            pass # Allow without full session
+        await _record_endpoint_handoff(request, "nutrition_expert_agent")
 
-        # Simulate NutritionExpertAgent handoff
+        # NutritionExpertAgent handoff
         return HandoffResponse(
             user_id=user_id,
             status="success",
@@ -264,10 +624,9 @@ async def consult_nutrition_expert(request: HandoffRequest):
 async def consult_injury_expert(request: HandoffRequest):
     try:
         user_id = request.user_id
-        if user_id not in user_sessions:
-            pass # Allow without full session
+        await _record_endpoint_handoff(request, "injury_support_agent")
 
-        # Simulate InjurySupportAgent handoff
+        # InjurySupportAgent handoff
         return HandoffResponse(
             user_id=user_id,
             status="success",
@@ -279,34 +638,60 @@ async def consult_injury_expert(request: HandoffRequest):
         print(f"Error consulting injury expert for user {request.user_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Latency histograms (routes, tools, model calls), token and handoff counters in Prometheus text format.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(limit: int = Query(100, ge=1, le=10000), reset: bool = False):
+    """
+    Most frequent event-loop stacks from the sampling profiler, in collapsed (flame graph) form.
+    Only available with PROFILER_ENABLED; `reset=true` starts a new sampling window.
+    """
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler is disabled (set PROFILER_ENABLED=true).")
+    report = f"# {profiler.samples} samples every {profiler.interval * 1000:g} ms\n" + "\n".join(profiler.top(limit)) + "\n"
+    if reset:
+        profiler.reset()
+    return PlainTextResponse(report)
+
 # --- Mazeed Ahem Points (Further Important Considerations) ---
 
 # 1. State Management:
-#    `user_sessions` dictionary is used for in-memory state management.
-#    For production, replace this with a persistent storage solution (e.g., database, Redis)
-#    to ensure data durability and scalability across multiple API instances.
+#    Sessions go through `session_store` (services/session_store.py): an in-memory LRU tier
+#    with size/TTL eviction in front of a SQLite database in WAL mode. Both keep sessions in a
+#    compact msgpack form (services/session_codec.py), and a save writes only the fields that
+#    changed. Point DATABASE_PATH at a shared location so multiple API workers see the same sessions.
 
 # 2. Error Handling:
 #    Implemented with `try-except` blocks and `HTTPException` for graceful error responses.
 #    Consider more specific exception handling and custom error classes for different scenarios.
+#    Every response is also counted by route and status in `/metrics` (services/instrumentation.py),
+#    next to per-tool and per-model-call latency histograms, so error rates and p99s can be scraped.
 
 # 3. Asynchronous Operations:
-#    The endpoint `set_user_goal` is an `async def` function. If your actual agent's tools
-#    (e.g., LLM calls, external API requests) involve I/O-bound operations, ensure they are
-#    implemented asynchronously and awaited properly within the agent's logic to prevent blocking
-#    the FastAPI event loop.
+#    Agent runs go through `conversation_service` (services/conversation.py), which awaits
+#    Runner.run / Runner.run_streamed on the event loop and limits concurrent model calls with a
+#    semaphore. `/chat` returns the whole reply; `/chat/stream` forwards tokens as Server-Sent Events.
 
 # 4. Security:
-#    This example does NOT include any security measures (authentication, authorization, rate limiting).
-#    For a production API, robust security is CRITICAL. Implement appropriate authentication
-#    (e.g., OAuth2, API Keys) and authorization mechanisms.
+#    Requests are rate limited per client address, per user_id and globally, and model-calling
+#    routes are shed under overload (services/admission.py). There is still NO authentication or
+#    authorization: user_id is whatever the client sends, so any caller can act as any user and
+#    the per-user limit is only fair sharing. For a production API, implement authentication
+#    (e.g., OAuth2, API Keys), authorization, and key the user bucket on the verified identity.
 
 # 5. Modularity:
 #    For APIs with many endpoints, consider using `fastapi.APIRouter` to organize your routes
 #    into separate modules for better maintainability and scalability.
 
 # 6. Agent Implementation Details:
-#    The current implementation simulates the agent's tool orchestration. In a real scenario,
-#    you would likely have a method within `HealthWellnessAgent` that takes the `UserSessionContext`
-#    and processes the request, internally calling `GoalAnalyzerTool`, `MealPlannerTool`, etc.,
-#    and then updating the context. This would keep the FastAPI endpoint cleaner.
+#    `/chat` runs the shared HealthWellnessAgent with the user's stored session as run context.
+#    Clear specialist requests start on the specialist agent directly (services/handoff_classifier.py),
+#    and every handoff, including the three handoff endpoints, is logged in `handoff_logs`.
+#    `/set_goal` calls the local engines behind the agent's tools directly (services/goal_parser.py,
+#    services/meal_planner.py, services/workout_library.py), so no LLM turn is needed for the
+#    common case. The agent's tools wrap the same engines, so both paths produce the same plans.
@@ -0,0 +1,137 @@
+"""
+Admission control benchmark: tail latency of /chat under overload, with and without shedding.
+
+The app runs in-process with StubModel (`--latency` per model call) behind
+MAX_CONCURRENT_MODEL_CALLS, so it serves a fixed number of chats per second. Chats from distinct
+users arrive open-loop at `--rate` per second for `--seconds`, above that capacity:
+  * no shedding: every chat is admitted and queues for a model slot,
+  * shedding:    chats beyond ADMISSION_MAX_MODEL_REQUESTS in flight get an immediate 503.
+Rate limits are raised out of the way so only shedding differs. Also reports the cost of one
+token-bucket take() on each backend and the per-request overhead of the middleware with each
+backend (the SQLite one runs take() in a worker thread, off the event loop).
+
+Usage:
+    python benchmarks/admission_benchmark.py [--rate 600] [--seconds 3] [--latency 0.2] [--max-model-requests 128]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "admission_benchmark.db")
+os.environ["CHECKIN_SCHEDULER_ENABLED"] = "false"
+os.environ["RESPONSE_CACHE_ENABLED"] = "false" # Every chat reaches the (stub) model
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+import api
+from benchmarks.stub_model import StubModel, stub_run_config
+from services.admission import AdmissionController, AdmissionMiddleware, InMemoryRateLimitStore, SQLiteRateLimitStore
+
+def store_costs():
+    print("token bucket take(), 100,000 calls over 1,000 keys")
+    for label, store in (("in-memory (16 shards)", InMemoryRateLimitStore()), ("SQLite", SQLiteRateLimitStore(os.environ["DATABASE_PATH"]))):
+        calls = 100000 if label.startswith("in-memory") else 10000
+        start = time.perf_counter()
+        for index in range(calls):
+            store.take(f"user:{index % 1000}", 1e6, 1e6, 1)
+        print(f"  {label:<36} {(time.perf_counter() - start) / calls * 1e6:9.1f} us/call")
+
+async def middleware_cost(requests: int):
+    print(f"AdmissionMiddleware, {requests:,} requests to minimal routes (best of 3)")
+
+    class Entry(BaseModel):
+        user_id: str
+        value: int
+
+    limits = dict(client_rate=1e9, client_burst=1e9, user_rate=1e9, user_burst=1e9, global_rate=1e9, global_burst=1e9)
+    backends = {"memory": InMemoryRateLimitStore(), "sqlite": SQLiteRateLimitStore(os.environ["DATABASE_PATH"])}
+    results = {}
+    for backend in (None, "memory", "sqlite") * 3:
+        app = FastAPI()
+
+        @app.get("/items/{user_id}")
+        async def get_item(user_id: str):
+            return {"user_id": user_id}
+
+        @app.post("/items")
+        async def post_item(entry: Entry):
+            return entry
+
+        if backend is not None:
+            app.add_middleware(AdmissionMiddleware, controller=AdmissionController(backends[backend], **limits))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            for label, send in (
+                ("user_id in path", lambda index: client.get(f"/items/u{index % 100}")),
+                ("user_id in JSON body", lambda index: client.post("/items", json={"user_id": f"u{index % 100}", "value": index})),
+            ):
+                for index in range(100): # Warm-up
+                    await send(index)
+                start = time.perf_counter()
+                for index in range(requests):
+                    await send(index)
+                key = (label, backend)
+                results[key] = min(results.get(key, float("inf")), (time.perf_counter() - start) / requests)
+    for label in ("user_id in path", "user_id in JSON body"):
+        for backend in ("memory", "sqlite"):
+            overhead = results[(label, backend)] - results[(label, None)]
+            print(f"  {label + ', ' + backend:<36} {results[(label, None)] * 1e6:7.1f} -> {results[(label, backend)] * 1e6:7.1f} us/request ({overhead * 1e6:+.1f})")
+
+async def overload(client: httpx.AsyncClient, rate: float, seconds: float, users: int):
+    results = []
+
+    async def one(index: int):
+        start = time.perf_counter()
+        response = await client.post("/chat", json={"user_id": f"load-{index % users}", "message": "how can I stay motivated this week?"})
+        results.append((response.status_code, time.perf_counter() - start))
+
+    tasks = []
+    started = time.perf_counter()
+    for index in range(int(rate * seconds)):
+        tasks.append(asyncio.create_task(one(index)))
+        await asyncio.sleep(max(0.0, started + (index + 1) / rate - time.perf_counter()))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    ok = np.asarray([seconds for status, seconds in results if status == 200]) * 1000
+    shed = [seconds for status, seconds in results if status == 503]
+    p50, p99 = np.percentile(ok, [50, 99]) if len(ok) else (0.0, 0.0)
+    other = len(results) - len(ok) - len(shed)
+    return (f"{len(ok):5} ok  p50 {p50:7.0f} ms  p99 {p99:7.0f} ms   {len(shed):5} shed"
+            + (f" (answered in {np.mean(shed) * 1000:.1f} ms avg)" if shed else "")
+            + (f"  {other} other" if other else "") + f"   {len(ok) / elapsed:6.0f} chats/s served")
+
+async def run(args):
+    stub = StubModel(latency=args.latency)
+    api.conversation_service._run_config = lambda: stub_run_config(stub)
+    users = int(args.rate * args.seconds) # One chat per user, so per-user limits never apply
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.lifespan(api.app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        api.admission.client_rate = api.admission.user_rate = api.admission.global_rate = float("inf")
+        api.admission.client_burst = api.admission.user_burst = api.admission.global_burst = float("inf")
+        for index in range(users):
+            await client.post("/set_goal", json={"user_id": f"load-{index}", "user_name": "Benchmark", "goal_description": "lose 5 kg in 2 months"})
+        print(f"/chat at {args.rate:.0f}/s for {args.seconds:.0f} s, stub model {args.latency * 1000:.0f} ms, "
+              f"{api.config.MAX_CONCURRENT_MODEL_CALLS} concurrent model calls")
+        for label, limit in (("no shedding", 10**9), (f"shedding at {args.max_model_requests}", args.max_model_requests)):
+            api.admission.max_model_requests = limit
+            print(f"  {label:<22} {await overload(client, args.rate, args.seconds, users)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=600.0, help="Chats arriving per second.")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub model latency in seconds.")
+    parser.add_argument("--max-model-requests", type=int, default=128)
+    args = parser.parse_args()
+    store_costs()
+    asyncio.run(middleware_cost(2000))
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Bulk ingestion benchmark: rows/sec for /bulk_track_progress (NDJSON and CSV) against one
+/track_progress request per row.
+
+Runs the FastAPI app in-process with TestClient against a temporary SQLite database. The
+upload is sent as a chunked body, so the streaming parser sees it the way it would from a
+real client. A few rows per upload are deliberately invalid to exercise the reject path.
+
+Usage:
+    python benchmarks/bulk_ingest_benchmark.py [--rows 50000] [--single-rows 500]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bulk_benchmark.db")
+os.environ["CHECKIN_SCHEDULER_ENABLED"] = "false"
+os.environ["ADMISSION_ENABLED"] = "false" # Measures the app itself, not the rate limits
+
+from fastapi.testclient import TestClient
+
+from api import app
+
+METRICS = [("weight", "kg", 60.0, 90.0), ("steps", "", 2000, 15000), ("resting heart rate", "bpm", 50, 80), ("sleep", "hours", 5.0, 9.0)]
+
+def make_rows(count: int, rng: random.Random):
+    start = datetime(2026, 1, 1)
+    for index in range(count):
+        metric, unit, low, high = METRICS[index % len(METRICS)]
+        row = {"timestamp": (start + timedelta(minutes=15 * index)).isoformat(), "metric": metric, "value": round(rng.uniform(low, high), 1), "unit": unit}
+        if index % 1000 == 999:
+            row["value"] = "n/a" # Invalid on purpose
+        yield row
+
+def ndjson_body(rows, chunk_rows: int = 500):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row))
+        if len(lines) == chunk_rows:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+def csv_body(rows, chunk_rows: int = 500):
+    yield b"timestamp,metric,value,unit\n"
+    lines = []
+    for row in rows:
+        lines.append(f"{row['timestamp']},{row['metric']},{row['value']},{row['unit']}")
+        if len(lines) == chunk_rows:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+def create_user(client: TestClient, user_id: str):
+    response = client.post("/set_goal", json={"user_id": user_id, "user_name": "Benchmark", "goal_description": "lose 5 kg in 2 months", "diet_preferences": "vegetarian"})
+    response.raise_for_status()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="Rows per bulk upload.")
+    parser.add_argument("--single-rows", type=int, default=500, help="Rows sent one request at a time for the baseline.")
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        for fmt, body, content_type in (("ndjson", ndjson_body, "application/x-ndjson"), ("csv", csv_body, "text/csv")):
+            user_id = f"bulk-{fmt}"
+            create_user(client, user_id)
+            start = time.perf_counter()
+            response = client.post(f"/bulk_track_progress/{user_id}", content=body(make_rows(args.rows, random.Random(1))), headers={"Content-Type": content_type})
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            summary = response.json()
+            print(f"bulk {fmt:<7} {summary['rows_ingested'] / elapsed:10,.0f} rows/sec   "
+                  f"ingested {summary['rows_ingested']:,}, rejected {summary['rows_rejected']:,}, metrics {summary['metrics_recorded']:,}")
+
+        user_id = "bulk-single"
+        create_user(client, user_id)
+        rows = list(make_rows(args.single_rows, random.Random(1)))
+        start = time.perf_counter()
+        for row in rows:
+            client.post("/track_progress", json={
+                "user_id": user_id,
+                "log_entry": f"{row['metric']}: {row['value']} {row['unit']}",
+                "metric_name": row["metric"],
+                "metric_value": f"{row['value']} {row['unit']}",
+            })
+        elapsed = time.perf_counter() - start
+        print(f"single       {len(rows) / elapsed:10,.0f} rows/sec   (one /track_progress request per row)")
+
+if __name__ == "__main__":
+    main()
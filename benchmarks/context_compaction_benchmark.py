@@ -0,0 +1,159 @@
+"""
+Context compaction benchmark: estimated prompt tokens per model call, measured on what the model
+actually receives, before and with services/context_compaction.py.
+
+Long-lived users (a goal, plans on file, weekly check-ins, `--points` data points per tracked
+metric and a log of past handoffs) send a mix of topical and open questions through
+ConversationService backed by a StubModel that records each prompt. The intent router and
+handoff classifier are off so every message reaches the model. Three configurations:
+  * before compaction: static instructions, every tool schema and the input (no session data;
+    the agent calls tools to learn about the user),
+  * profile (the default): the same plus the session profile after the instructions,
+  * profile + topic tools (CONTEXT_TOOL_FILTER_ENABLED): only the tools for the message's topic.
+For each: prompt tokens per call, the profile's share, and the distinct prompt prefixes (tool list
++ static instructions) across calls, each of which the provider has to cache separately.
+Also reports the tools sent per sample message and the cost of prepare() per turn.
+
+Token counts use the app's own estimate (services/chat_history.estimate_tokens), not a tokenizer.
+
+Usage:
+    python benchmarks/context_compaction_benchmark.py [--users 50] [--points 365] [--turns 400]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "context_compaction_benchmark.db")
+os.environ["CHECKIN_SCHEDULER_ENABLED"] = "false"
+
+from agents01.main_agent import build_health_wellness_agent
+from benchmarks.stub_model import StubModel, stub_run_config
+from context import UserSessionContext
+from services.chat_history import estimate_tokens
+from services.context_compaction import ContextCompactor, _item_tokens, _tool_tokens, relevant_tools
+from services.conversation import ConversationService
+from services.metric_series import MetricStore
+
+MESSAGES = [
+    "plan my meals for the week, vegetarian please",
+    "what should I eat after a workout?",
+    "give me a 3 day workout routine for strength",
+    "can you schedule my weekly check-in for Monday at 9 AM",
+    "how is my weight trending, am I on track?",
+    "I weighed 71.8 kg this morning",
+    "I feel unmotivated lately, any tips?",
+    "is it ok to train with sore legs?",
+]
+METRICS = (("weight", "kg", 80.0, -0.02), ("steps", "", 8000.0, 5.0), ("sleep", "hours", 7.0, 0.0), ("resting heart rate", "bpm", 64.0, -0.01))
+HANDOFF_TYPES = ("nutrition_expert", "injury_support", "escalation")
+
+def seed_user(index: int, store: MetricStore, points: int, rng: random.Random) -> UserSessionContext:
+    user_id = f"user-{index}"
+    start = datetime(2025, 10, 1)
+    store.record_many(user_id, [
+        (metric, start + timedelta(days=day), round(base + drift * day + rng.uniform(-1, 1) * base * 0.01, 1), unit)
+        for metric, unit, base, drift in METRICS for day in range(points)
+    ])
+    return UserSessionContext(
+        name=f"User {index}", uid=index,
+        goal={
+            "description": "lose 8 kg in 4 months", "original_description": "lose 8 kg in 4 months", "status": "active",
+            "parsed_details": {"goal_type": "weight_loss", "target_quantity": 8.0, "target_unit": "kg", "target_kg": 8.0, "deadline": "2026-12-31"},
+        },
+        diet_preferences="vegetarian",
+        workout_plan={"recommended_plan": {"frequency": "4 days/week", "duration_per_session": "45 minutes",
+                                           "days": [{"day": f"Day {day}", "exercises": ["squats", "push-ups", "rows", "plank"]} for day in range(1, 5)]}},
+        meal_plan=[f"Day {day}: oats with berries, lentil curry with rice, tofu stir-fry with vegetables" for day in range(1, 8)],
+        injury_notes="Mild knee pain when running downhill; avoid deep lunges.",
+        handoff_logs=[f"2026-0{1 + entry % 9}-1{entry % 10}T10:00:00 | {rng.choice(HANDOFF_TYPES)} | agent | asked about knees and diet"
+                      for entry in range(40)],
+        progress_logs=[{"timestamp": f"2025-0{1 + entry % 9}-01T08:00:00", "metric": "weight", "value": f"{82 - entry * 0.1:.1f} kg"}
+                       for entry in range(60)],
+        scheduled_checkins=[{"day": "Monday", "time": "09:00", "reminder_type": "weekly", "notes": "weigh-in", "next_checkin": "2026-10-19T09:00:00"}],
+    )
+
+class RecordingModel(StubModel):
+    """
+    StubModel that estimates the tokens of every prompt it receives and records its prefix.
+    """
+
+    def __init__(self, static_instructions: str):
+        super().__init__(latency=0.0)
+        self.static_instructions = static_instructions
+        self.tokens = 0
+        self.profile_tokens = 0
+        self.prefixes = set()
+        self.prefix_tokens = 0
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs):
+        instructions = system_instructions or ""
+        tool_tokens = sum(_tool_tokens(tool) for tool in tools)
+        self.tokens += estimate_tokens(instructions) + tool_tokens + sum(_item_tokens(item) for item in input)
+        self.profile_tokens += estimate_tokens(instructions) - estimate_tokens(self.static_instructions)
+        self.prefixes.add(tuple(tool.name for tool in tools))
+        self.prefix_tokens += tool_tokens + estimate_tokens(self.static_instructions)
+        return await super().get_response(system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs)
+
+async def run_turns(compactor, contexts, turns: int, rng: random.Random) -> RecordingModel:
+    agent = build_health_wellness_agent()
+    stub = RecordingModel(agent.instructions)
+    service = ConversationService(agent, run_config=lambda: stub_run_config(stub), compactor=compactor)
+    for _ in range(turns):
+        index = rng.randrange(len(contexts))
+        await service.chat(f"user-{index}", rng.choice(MESSAGES), contexts[index])
+    return stub
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--points", type=int, default=365, help="Data points per tracked metric and user (one per day).")
+    parser.add_argument("--turns", type=int, default=400)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    store = MetricStore(os.environ["DATABASE_PATH"])
+    contexts = [seed_user(index, store, args.points, rng) for index in range(args.users)]
+
+    print(f"{args.users} users with {len(METRICS)} metrics x {args.points} points, 40 handoffs, {args.turns} turns")
+    print(f"  {'':26}{'tokens/call':>12}{'profile':>9}{'prefix':>8}{'prefixes':>10}")
+    baseline = None
+    for label, compactor in (
+        ("before compaction", None),
+        ("profile (default)", ContextCompactor(store)),
+        ("profile + topic tools", ContextCompactor(store, filter_tools=True)),
+    ):
+        stub = asyncio.run(run_turns(compactor, contexts, args.turns, random.Random(11)))
+        tokens = stub.tokens / stub.calls
+        baseline = baseline or tokens
+        change = f"  ({tokens / baseline - 1:+.0%} vs before)" if compactor is not None else ""
+        print(f"  {label:<26}{tokens:12,.0f}{stub.profile_tokens / stub.calls:9,.0f}{stub.prefix_tokens / stub.calls:8,.0f}{len(stub.prefixes):10}{change}")
+        if compactor is not None:
+            # The compactor's own baseline estimate should match the measured "before" prompt.
+            print(f"  {'':26}compactor estimate: {compactor.baseline_tokens / compactor.calls:,.0f} baseline, {compactor.sent_tokens / compactor.calls:,.0f} sent")
+
+    print("tools sent per message with topic tools")
+    compactor = ContextCompactor(store, filter_tools=True)
+    agent = build_health_wellness_agent()
+    tool_count = len(agent.tools)
+    for message in MESSAGES:
+        tools = relevant_tools(message, compactor.min_confidence)
+        print(f"  {message:<58} {len(tools) if tools is not None else tool_count}/{tool_count}"
+              f"  {', '.join(sorted(tools)) if tools is not None else '(all)'}")
+
+    print("profile of one user")
+    print("\n".join("  " + line for line in compactor.prepare("user-0", MESSAGES[0], contexts[0]).summary.splitlines()))
+
+    calls = 2000
+    start = time.perf_counter()
+    for index in range(calls):
+        compactor.prepare(f"user-{index % args.users}", MESSAGES[index % len(MESSAGES)], contexts[index % args.users])
+    print(f"prepare() per turn                     {(time.perf_counter() - start) / calls * 1e6:9.1f} us")
+
+if __name__ == "__main__":
+    main()
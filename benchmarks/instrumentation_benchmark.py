@@ -0,0 +1,136 @@
+"""
+Instrumentation benchmark: cost of the metrics hooks, and a /metrics breakdown of a chat workload.
+
+  * raw cost of Histogram.observe / Counter.inc and of rendering /metrics,
+  * per-request overhead of MetricsMiddleware on a minimal FastAPI route,
+  * per-call overhead of instrument_tool() on a trivial function tool,
+  * /chat and /set_goal through the app with StubModel (wrapped in InstrumentedModel) standing in
+    for Gemini: prints p50/p99 per route, tool and model call from the recorded histograms.
+
+Usage:
+    python benchmarks/instrumentation_benchmark.py [--requests 2000] [--chats 300] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "instrumentation_benchmark.db")
+os.environ["CHECKIN_SCHEDULER_ENABLED"] = "false"
+os.environ["ADMISSION_ENABLED"] = "false" # Measures the app itself, not the rate limits
+os.environ["RESPONSE_CACHE_ENABLED"] = "false" # Every agent turn reaches the (stub) model
+
+import httpx
+from agents import function_tool
+from agents.tool_context import ToolContext
+from fastapi import FastAPI
+
+from benchmarks.stub_model import StubModel, stub_run_config
+from services.instrumentation import InstrumentedModel, MetricsMiddleware, instrument_tool
+from services.metrics import HTTP_REQUEST_SECONDS, MODEL_CALL_SECONDS, TOOL_CALL_SECONDS, Histogram, MetricsRegistry
+
+def per_op(label: str, count: int, fn):
+    start = time.perf_counter()
+    for index in range(count):
+        fn(index)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<38} {elapsed / count * 1e9:9,.0f} ns/op")
+
+def primitives():
+    print("metric primitives")
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram.", ("route",))
+    counter = registry.counter("bench_total", "Benchmark counter.", ("route",))
+    routes = [f"/route{index}" for index in range(20)]
+    per_op("Histogram.observe", 200000, lambda index: histogram.observe(0.0123, routes[index % 20]))
+    per_op("Counter.inc", 200000, lambda index: counter.inc(routes[index % 20]))
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"  render 20 series                       {(time.perf_counter() - start) * 1000:9.2f} ms ({len(text):,} bytes)")
+
+async def middleware_overhead(requests: int):
+    print(f"MetricsMiddleware, {requests:,} requests to a minimal route")
+    results = {"without middleware": [], "with middleware": []}
+    for label, instrumented in (("without middleware", False), ("with middleware", True)) * 3: # Interleaved runs, best of 3
+        app = FastAPI()
+
+        @app.get("/ping/{item}")
+        async def ping(item: str):
+            return {"item": item}
+
+        if instrumented:
+            app.add_middleware(MetricsMiddleware)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            for index in range(200): # Warm-up
+                await client.get(f"/ping/{index}")
+            start = time.perf_counter()
+            for index in range(requests):
+                await client.get(f"/ping/{index}")
+            results[label].append((time.perf_counter() - start) / requests)
+    best = {label: min(times) for label, times in results.items()}
+    for label, seconds in best.items():
+        print(f"  {label:<38} {seconds * 1e6:9.1f} us/request")
+    print(f"  overhead                               {(best['with middleware'] - best['without middleware']) * 1e6:9.1f} us/request")
+
+async def tool_overhead(calls: int):
+    print(f"instrument_tool, {calls:,} calls of a trivial tool")
+
+    async def echo(value: int) -> int:
+        return value
+
+    plain = function_tool(echo, name_override="EchoTool")
+    instrumented = instrument_tool(function_tool(echo, name_override="EchoToolInstrumented"))
+    context = ToolContext(context=None, tool_name="EchoTool", tool_call_id="bench", tool_arguments='{"value": 1}')
+    for label, tool in (("plain FunctionTool", plain), ("instrumented FunctionTool", instrumented)):
+        start = time.perf_counter()
+        for _ in range(calls):
+            await tool.on_invoke_tool(context, '{"value": 1}')
+        print(f"  {label:<38} {(time.perf_counter() - start) / calls * 1e6:9.1f} us/call")
+    TOOL_CALL_SECONDS._series.pop(("EchoToolInstrumented", "ok"), None) # Keep the workload report to real tools
+
+def quantiles(histogram: Histogram, *labels: str) -> str:
+    p50, p99 = histogram.quantile(0.5, *labels), histogram.quantile(0.99, *labels)
+    return f"n={histogram.count(*labels):5}  p50 <= {p50 * 1000:7.1f} ms  p99 <= {p99 * 1000:7.1f} ms"
+
+async def chat_workload(chats: int, latency: float):
+    import api
+
+    stub = StubModel(latency=latency)
+    api.conversation_service._run_config = lambda: stub_run_config(InstrumentedModel(stub, "stub"))
+    messages = [
+        "log weight 72kg", "give me a 7-day vegetarian meal plan", "what should I eat before a run?",
+        "schedule my check-in for Monday 9 AM", "how can I stay motivated this week?", "make me a workout plan for 30 minutes",
+    ]
+    print(f"/set_goal + {chats} /chat turns, stub model latency {latency * 1000:.0f} ms")
+    async with api.lifespan(api.app), httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://benchmark", timeout=None) as client:
+        for user in range(10):
+            await client.post("/set_goal", json={"user_id": f"u{user}", "user_name": "Benchmark", "goal_description": "lose 5 kg in 2 months"})
+        await asyncio.gather(*(
+            client.post("/chat", json={"user_id": f"u{index % 10}", "message": messages[index % len(messages)]})
+            for index in range(chats)
+        ))
+        await client.get("/metrics")
+
+    for route in ("/set_goal", "/chat"):
+        print(f"  route {route:<31} {quantiles(HTTP_REQUEST_SECONDS, 'POST', route, '200')}")
+    for labels in sorted(TOOL_CALL_SECONDS._series):
+        print(f"  tool {labels[0]:<24} {labels[1]:<6} {quantiles(TOOL_CALL_SECONDS, *labels)}")
+    for labels in sorted(MODEL_CALL_SECONDS._series):
+        print(f"  model {labels[0]} ({labels[1]}, {labels[2]}){'':<16} {quantiles(MODEL_CALL_SECONDS, *labels)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub model latency in seconds.")
+    args = parser.parse_args()
+    primitives()
+    asyncio.run(middleware_overhead(args.requests))
+    asyncio.run(tool_overhead(args.requests * 10))
+    asyncio.run(chat_workload(args.chats, args.latency))
+
+if __name__ == "__main__":
+    main()
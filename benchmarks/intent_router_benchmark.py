@@ -0,0 +1,122 @@
+"""
+Intent router benchmark: routing accuracy on a labeled message set and messages per second.
+
+Every message is labeled with the intent the router should take it to, or None when it must
+go to HealthWellnessAgent. "Wrongly routed" (a message sent to the wrong tool, or to a tool when
+it should have reached the agent) is the number that matters most and should stay at 0.
+
+Usage:
+    python benchmarks/intent_router_benchmark.py [--iterations 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents01.main_agent import HealthWellnessAgent
+from context import UserSessionContext
+from services.intent_router import IntentRouter
+
+LABELED_MESSAGES = [
+    ("log weight 72kg", "log_progress"),
+    ("Log my weight as 72.5 kg", "log_progress"),
+    ("record weight: 160 lbs", "log_progress"),
+    ("track body fat 18%", "log_progress"),
+    ("log 8000 steps", "log_progress"),
+    ("log 10,000 steps today", "log_progress"),
+    ("I slept 7 hours last night", "log_progress"),
+    ("ran 5 km today", "log_progress"),
+    ("walked 3 miles", "log_progress"),
+    ("drank 2 liters of water", "log_progress"),
+    ("weighed in at 80 kg this morning", "log_progress"),
+    ("log resting heart rate 62 bpm", "log_progress"),
+    ("add 1800 calories for today", "log_progress"),
+    ("log waist 84 cm", "log_progress"),
+    ("how do I log my weight?", None),
+    ("should I track my weight every day", None),
+    ("what is a healthy weight for me", None),
+    ("I feel tired after workouts", None),
+    ("my weight went up again", None),
+    ("log my weight loss of 2 kg", None),
+    ("I want to log my weight loss goal of 5 kg", None),
+    ("schedule my check-in for Monday 9 AM", "schedule_checkin"),
+    ("schedule a weekly checkin every friday at 18:30", "schedule_checkin"),
+    ("Set my check in on Wednesday at 7pm via sms", "schedule_checkin"),
+    ("remind me every sunday at 8 am to check in", "schedule_checkin"),
+    ("book a check-in on tue at 10:15", "schedule_checkin"),
+    ("schedule my check-in for thursday", "schedule_checkin"),
+    ("when is my next check-in?", None),
+    ("cancel my check-in on Monday", None),
+    ("schedule a check-in", None),
+    ("make me a vegetarian meal plan", "meal_plan"),
+    ("give me a new meal plan", "meal_plan"),
+    ("create a 2200 calorie keto meal plan", "meal_plan"),
+    ("generate my meals for the week", "meal_plan"),
+    ("what should I eat before a workout?", None),
+    ("is this meal plan healthy?", None),
+    ("why does my meal plan have so much rice", None),
+    ("give me a workout plan", "workout_plan"),
+    ("make me a beginner workout routine with dumbbells", "workout_plan"),
+    ("create a 30 minute advanced training program", "workout_plan"),
+    ("how many workouts should I do per week?", None),
+    ("I hurt my knee during my workout", None),
+    ("hello", None),
+    ("I want to lose 5 kg in 2 months", None),
+    ("I need to talk to a human coach", None),
+    ("what are good sources of protein", None),
+]
+
+def evaluate(router: IntentRouter, context: UserSessionContext):
+    outcomes = Counter()
+    mistakes = []
+    for message, expected in LABELED_MESSAGES:
+        routed = router.match(message, context)
+        actual = routed.intent if routed else None
+        if actual == expected:
+            outcomes["routed correctly" if expected else "left to agent correctly"] += 1
+        elif actual is None:
+            outcomes["missed (sent to agent)"] += 1
+            mistakes.append((message, expected, actual))
+        else:
+            outcomes["wrongly routed"] += 1
+            mistakes.append((message, expected, actual))
+    return outcomes, mistakes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="Passes over the labeled set for the throughput run.")
+    args = parser.parse_args()
+
+    router = IntentRouter(HealthWellnessAgent.tools)
+    context = UserSessionContext(name="Benchmark", uid=1, diet_preferences="vegetarian")
+
+    outcomes, mistakes = evaluate(router, context)
+    print(f"Accuracy: {(outcomes['routed correctly'] + outcomes['left to agent correctly']) / len(LABELED_MESSAGES):.1%} "
+          f"on {len(LABELED_MESSAGES)} labeled messages")
+    for outcome in ("routed correctly", "left to agent correctly", "missed (sent to agent)", "wrongly routed"):
+        print(f"  {outcome:<24} {outcomes[outcome]}")
+    for message, expected, actual in mistakes:
+        print(f"  ! {message!r}: expected {expected}, got {actual}")
+
+    messages = [message for message, _ in LABELED_MESSAGES] * args.iterations
+    start = time.perf_counter()
+    for message in messages:
+        router.match(message, context)
+    elapsed = time.perf_counter() - start
+    print(f"match    {len(messages) / elapsed:12,.0f} messages/sec   {elapsed / len(messages) * 1e6:6.1f} us/message")
+
+    routable = [message for message, expected in LABELED_MESSAGES if expected in ("log_progress", "meal_plan")]
+    async def route_all():
+        for message in routable * 20:
+            await router.route(message, context)
+    start = time.perf_counter()
+    asyncio.run(route_all())
+    elapsed = time.perf_counter() - start
+    print(f"route    {len(routable) * 20 / elapsed:12,.0f} messages/sec   (classification + tool call, progress and meal plans)")
+
+if __name__ == "__main__":
+    main()
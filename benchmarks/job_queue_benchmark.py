@@ -0,0 +1,97 @@
+"""
+Job queue benchmark: /set_goal held open vs /set_goal?async=true plus polling.
+
+Goal analysis is given a simulated model latency (as when the LLM fallback or the full agent
+runs), and the plan cache is disabled so every request does the work. Many clients call the
+API concurrently through an in-process ASGI client:
+  * sync:  each request stays open for the whole analysis + planning,
+  * async: each request returns a job id at once; the bounded worker pool runs the jobs and
+           clients poll GET /jobs/{id} until they finish.
+
+Reports how long requests hold a connection and the end-to-end time until every plan is ready.
+
+Usage:
+    python benchmarks/job_queue_benchmark.py [--clients 200] [--latency-ms 200] [--workers 16]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "job_queue_benchmark.db")
+os.environ["CHECKIN_SCHEDULER_ENABLED"] = "false"
+os.environ["ADMISSION_ENABLED"] = "false" # Measures the app itself, not the rate limits
+
+import httpx
+import numpy as np
+
+import api
+from services import plan_cache
+from services.goal_parser import analyze_goal
+from services.plan_cache import PlanCache
+
+def percentiles(samples):
+    p50, p95 = np.percentile(np.asarray(samples) * 1000, [50, 95])
+    return f"p50 {p50:7.1f} ms   p95 {p95:7.1f} ms"
+
+async def run(clients: int, workers: int):
+    api.plan_cache = PlanCache(max_entries=0) # Every request builds its plans
+    api.job_queue.workers = workers
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.lifespan(api.app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        def body(mode, index):
+            return {"user_id": f"{mode}-{index}", "user_name": "Benchmark", "goal_description": f"lose {index % 20 + 1} kg in 3 months"}
+
+        async def sync_client(index):
+            start = time.perf_counter()
+            response = await client.post("/set_goal", json=body("sync", index))
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        held = await asyncio.gather(*(sync_client(index) for index in range(clients)))
+        total = time.perf_counter() - start
+        print(f"sync   connection held  {percentiles(held)}   all plans ready after {total * 1000:7.0f} ms")
+
+        async def async_client(index):
+            start = time.perf_counter()
+            response = await client.post("/set_goal?async=true", json=body("async", index))
+            response.raise_for_status()
+            submitted = time.perf_counter() - start
+            status_url = response.json()["status_url"]
+            polls = 0
+            while True:
+                await asyncio.sleep(0.05)
+                polls += 1
+                job = (await client.get(status_url)).json()
+                if job["status"] in ("succeeded", "failed"):
+                    return submitted, job["status"], polls
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(async_client(index) for index in range(clients)))
+        total = time.perf_counter() - start
+        failed = sum(status != "succeeded" for _, status, _ in results)
+        polls = sum(count for _, _, count in results) / clients
+        print(f"async  connection held  {percentiles([submitted for submitted, _, _ in results])}   "
+              f"all plans ready after {total * 1000:7.0f} ms   ({failed} failed, {polls:.1f} polls/client)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Simulated model latency of goal analysis.")
+    parser.add_argument("--workers", type=int, default=16, help="Job queue worker pool size.")
+    args = parser.parse_args()
+
+    async def slow_analysis(description):
+        await asyncio.sleep(args.latency_ms / 1000)
+        return analyze_goal(description)
+
+    plan_cache.analyze_goal_with_llm_fallback = slow_analysis
+    print(f"{args.clients} concurrent clients, {args.latency_ms:.0f} ms goal analysis, {args.workers} job workers")
+    asyncio.run(run(args.clients, args.workers))
+
+if __name__ == "__main__":
+    main()
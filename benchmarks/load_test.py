@@ -0,0 +1,295 @@
+"""
+Offline load test: api.py under uvicorn against the local stub LLM server (stub_llm_server.py).
+
+Starts both servers as subprocesses on a fresh database, creates `--users` sessions through
+/set_goal (measuring the server's resident memory per session), then replays a weighted mix of
+/set_goal, /track_progress, /get_progress, /schedule_checkin, /chat and /chat/stream traffic
+from closed-loop clients at each concurrency level for `--duration` seconds. Reports throughput,
+error count and p50/p95/p99 latency per level (and p95 per endpoint).
+
+Results can be stored as a baseline and compared on later runs: a level whose throughput drops,
+or whose p95/p99 latency rises, by more than `--tolerance` is flagged as a regression (as is
+memory per session), and the script exits with status 1. Baselines are machine specific, so
+compare runs from the same host and with the same stub settings.
+
+Usage:
+    python benchmarks/load_test.py [--levels 1,4,16,64] [--duration 10] [--users 200]
+                                   [--latency 0.2] [--tokens 60] [--tokens-per-second 200]
+                                   [--save-baseline | --baseline benchmarks/load_test_baseline.json]
+                                   [--env RESPONSE_CACHE_ENABLED=false ...]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "load_test_baseline.json")
+
+# Share of requests per operation, roughly what a day of real traffic looks like.
+MIX: Dict[str, float] = {
+    "set_goal": 0.10,
+    "track_progress": 0.25,
+    "get_progress": 0.25,
+    "schedule_checkin": 0.05,
+    "chat": 0.30,
+    "chat_stream": 0.05,
+}
+
+GOALS = [
+    "lose 5 kg in 2 months", "lose 10 pounds in 8 weeks", "gain 3 kg of muscle in 3 months",
+    "run a 5k in 6 weeks", "improve my stamina for hiking", "lose 8 kg before my wedding in 4 months",
+]
+DIETS = [None, "vegetarian", "vegan", "keto", "gluten free"]
+MESSAGES = [
+    "log weight 72kg", "give me a 7-day vegetarian meal plan", "what should I eat before a run?",
+    "schedule my check-in for Monday 9 AM", "how can I stay motivated this week?",
+    "make me a workout plan for 30 minutes", "my knee hurts after squats, what should I do?",
+    "how much protein do I need per day?",
+]
+
+def rss_kb(pid: int) -> Optional[int]:
+    """Resident memory of a process in kB (Linux /proc; None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def start_servers(args, database_path: str) -> Tuple[subprocess.Popen, subprocess.Popen]:
+    llm = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, "benchmarks", "stub_llm_server.py"),
+         "--port", str(args.llm_port), "--latency", str(args.latency), "--tokens", str(args.tokens),
+         "--tokens-per-second", str(args.tokens_per_second)],
+        cwd=PROJECT_ROOT,
+    )
+    env = dict(
+        os.environ,
+        DATABASE_PATH=database_path,
+        CHECKIN_SCHEDULER_ENABLED="false",
+        WARMUP_ON_STARTUP="false",
+        GEMINI_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1/",
+        GEMINI_API_KEY="stub",
+    )
+    for setting in args.env:
+        name, _, value = setting.partition("=")
+        env[name] = value
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL, # The app prints per-request errors; the report counts them instead
+    )
+    return llm, api
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with status {process.returncode} before it was ready.")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} was not ready after {timeout:.0f} s.")
+
+def goal_body(rng: random.Random, user_id: str) -> dict:
+    return {"user_id": user_id, "user_name": "Load Test", "goal_description": rng.choice(GOALS), "diet_preferences": rng.choice(DIETS)}
+
+async def call(client: httpx.AsyncClient, operation: str, user_id: str, rng: random.Random) -> int:
+    """Sends one request for `operation` and returns its status code."""
+    if operation == "set_goal":
+        response = await client.post("/set_goal", json=goal_body(rng, user_id))
+    elif operation == "track_progress":
+        response = await client.post("/track_progress", json={
+            "user_id": user_id, "log_entry": "Morning weigh-in", "metric_name": "weight", "metric_value": f"{rng.uniform(60, 90):.1f} kg",
+        })
+    elif operation == "get_progress":
+        response = await client.get(f"/get_progress/{user_id}")
+    elif operation == "schedule_checkin":
+        checkin_date = date.today() + timedelta(days=rng.randint(1, 7))
+        response = await client.post("/schedule_checkin", json={
+            "user_id": user_id, "checkin_date": checkin_date.isoformat(), "checkin_time": rng.choice(["07:30", "09:00", "18:00"]),
+        })
+    elif operation == "chat":
+        response = await client.post("/chat", json={"user_id": user_id, "message": rng.choice(MESSAGES)})
+    else:
+        async with client.stream("POST", "/chat/stream", json={"user_id": user_id, "message": rng.choice(MESSAGES)}) as response:
+            async for _ in response.aiter_bytes():
+                pass
+    return response.status_code
+
+async def seed_sessions(client: httpx.AsyncClient, users: int, rng: random.Random) -> int:
+    semaphore = asyncio.Semaphore(16)
+
+    async def create(index: int) -> int:
+        async with semaphore:
+            return (await client.post("/set_goal", json=goal_body(rng, f"load-{index}"))).status_code
+
+    statuses = await asyncio.gather(*(create(index) for index in range(users)))
+    return sum(status == 200 for status in statuses)
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, duration: float, users: int, seed: int) -> dict:
+    samples: List[Tuple[str, float, bool]] = [] # (operation, seconds, failed)
+    operations, weights = list(MIX), list(MIX.values())
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(worker: int):
+        rng = random.Random(seed * 1000 + worker)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            user_id = f"load-{rng.randrange(users)}"
+            start = time.perf_counter()
+            try:
+                failed = await call(client, operation, user_id, rng) >= 400
+            except httpx.HTTPError:
+                failed = True
+            samples.append((operation, time.perf_counter() - start, failed))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(worker) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.asarray([seconds for _, seconds, _ in samples]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+    per_operation = {}
+    for operation in operations:
+        values = [seconds * 1000 for name, seconds, _ in samples if name == operation]
+        if values:
+            per_operation[operation] = {"requests": len(values), "p95_ms": float(np.percentile(values, 95))}
+    return {
+        "requests": len(samples),
+        "errors": sum(failed for _, _, failed in samples),
+        "throughput_rps": len(samples) / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "operations": per_operation,
+    }
+
+def print_level(concurrency: int, result: dict) -> None:
+    print(f"  c={concurrency:<4} {result['requests']:7,} req  {result['throughput_rps']:8.1f} req/s  "
+          f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+          f"{result['errors']} errors")
+    print("         p95 by endpoint: " + ", ".join(
+        f"{operation} {values['p95_ms']:.0f} ms" for operation, values in result["operations"].items()
+    ))
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of `results` against `baseline` beyond the relative `tolerance`."""
+    regressions = []
+    for level, current in results["levels"].items():
+        previous = baseline.get("levels", {}).get(level)
+        if previous is None:
+            continue
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"c={level}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+        for key in ("p95_ms", "p99_ms"):
+            if current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"c={level}: {key[:3]} {previous[key]:.1f} -> {current[key]:.1f} ms")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"c={level}: errors {previous['errors']} -> {current['errors']}")
+    memory, previous_memory = results.get("memory_per_session_kb"), baseline.get("memory_per_session_kb")
+    if memory is not None and previous_memory and memory > previous_memory * (1 + tolerance):
+        regressions.append(f"memory per session {previous_memory:.1f} -> {memory:.1f} kB")
+    return regressions
+
+async def run(args, api: subprocess.Popen) -> dict:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=max(args.levels) + 16, max_keepalive_connections=max(args.levels) + 16)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", timeout=120.0, limits=limits) as client:
+        await client.post("/set_goal", json=goal_body(rng, "load-warmup")) # Import paths and caches warmed before measuring
+        rss_before = rss_kb(api.pid)
+        created = await seed_sessions(client, args.users, rng)
+        rss_after = rss_kb(api.pid)
+        memory_per_session = (rss_after - rss_before) / created if rss_before and rss_after and created else None
+        print(f"{created} sessions created, "
+              + (f"{memory_per_session:.1f} kB resident memory per session" if memory_per_session is not None else "memory not measured"))
+
+        levels = {}
+        for concurrency in args.levels:
+            levels[str(concurrency)] = result = await run_level(client, concurrency, args.duration, args.users, args.seed + concurrency)
+            print_level(concurrency, result)
+        rss_end = rss_kb(api.pid)
+        if rss_end:
+            print(f"server resident memory after the run: {rss_end / 1024:.1f} MB")
+    return {
+        "settings": {"latency": args.latency, "tokens": args.tokens, "tokens_per_second": args.tokens_per_second,
+                     "duration": args.duration, "users": args.users, "env": args.env},
+        "memory_per_session_kb": memory_per_session,
+        "levels": levels,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=lambda text: [int(level) for level in text.split(",")], default=[1, 4, 16, 64],
+                        help="Comma-separated numbers of concurrent clients.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of traffic per concurrency level.")
+    parser.add_argument("--users", type=int, default=200, help="Sessions created before the run; traffic picks among them.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub model seconds before the first token.")
+    parser.add_argument("--tokens", type=int, default=60, help="Stub model words per reply.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--llm-port", type=int, default=8101)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="Extra setting for the API server (repeatable).")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against, if the file exists.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline instead of comparing.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change allowed before flagging a regression.")
+    parser.add_argument("--output", help="Also write this run's results as JSON.")
+    args = parser.parse_args()
+
+    database_path = os.path.join(tempfile.mkdtemp(), "load_test.db")
+    llm, api = start_servers(args, database_path)
+    try:
+        asyncio.run(wait_until_ready(f"http://127.0.0.1:{args.llm_port}/stats", llm))
+        asyncio.run(wait_until_ready(f"http://127.0.0.1:{args.api_port}/openapi.json", api))
+        print(f"stub model {args.latency * 1000:.0f} ms + {args.tokens} tokens at {args.tokens_per_second:.0f}/s, "
+              f"{args.duration:.0f} s per level, mix " + ", ".join(f"{name} {share:.0%}" for name, share in MIX.items()))
+        results = asyncio.run(run(args, api))
+    finally:
+        for process in (api, llm):
+            process.terminate()
+            process.wait()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline first)")
+        return
+    with open(args.baseline) as stored:
+        baseline = json.load(stored)
+    if baseline.get("settings") != results["settings"]:
+        print("warning: baseline was recorded with different settings, comparison may not be meaningful")
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return
+    print(f"REGRESSIONS against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for regression in regressions:
+        print(f"  {regression}")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Meal planner benchmark: plans per second for the catalog-backed generator.
+
+Reports on a single core:
+  * catalog load time (once per process),
+  * uncached plan generation (the lru cache is cleared before every call),
+  * cached plan generation (repeated identical requests),
+  * vectorized batch selection for a whole cohort (services/meal_batch.py).
+
+Usage:
+    python benchmarks/meal_planner_benchmark.py [--requests 20000]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.recipe_catalog import get_catalog
+from services import meal_planner
+from services.meal_batch import select_meals_batch
+
+PREFERENCES = [None, "vegetarian", "vegan", "pescatarian", "keto", "high protein", "halal", "vegetarian, no nuts"]
+RESTRICTIONS = [None, ["gluten-free"], ["nut-free"], ["dairy"], ["gluten", "soy"], ["shellfish"]]
+CALORIE_GOALS = [1500, 1800, 2000, 2200, 2600, 3000]
+
+def run(requests: int, clear_cache: bool) -> float:
+    combinations = itertools.cycle(itertools.product(PREFERENCES, RESTRICTIONS, CALORIE_GOALS))
+    start = time.perf_counter()
+    for _ in range(requests):
+        preferences, restrictions, caloric_goal = next(combinations)
+        if clear_cache:
+            meal_planner._build_plan.cache_clear()
+        meal_planner.generate_meal_plan(preferences, restrictions, caloric_goal)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--batch-users", type=int, default=100000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = get_catalog()
+    print(f"Catalog: {len(catalog)} recipes, {len(catalog.tags)} tags, loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for label, clear_cache in (("uncached", True), ("cached", False)):
+        elapsed = run(args.requests, clear_cache)
+        print(f"{label:<9} {args.requests / elapsed:12,.0f} plans/sec   {elapsed / args.requests * 1e6:8.1f} us/plan")
+
+    combinations = list(itertools.product(PREFERENCES, RESTRICTIONS, CALORIE_GOALS))
+    cohort = [combinations[i % len(combinations)] for i in range(args.batch_users)]
+    goals = [caloric_goal for _, _, caloric_goal in cohort]
+    restriction_sets = [meal_planner.parse_restrictions(preferences, restrictions) for preferences, restrictions, _ in cohort]
+    start = time.perf_counter()
+    select_meals_batch(goals, restriction_sets)
+    elapsed = time.perf_counter() - start
+    print(f"{'batch':<9} {args.batch_users / elapsed:12,.0f} plans/sec   {elapsed / args.batch_users * 1e6:8.1f} us/plan (selection only, {args.batch_users:,} users)")
+
+if __name__ == "__main__":
+    main()
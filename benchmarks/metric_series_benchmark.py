@@ -0,0 +1,68 @@
+"""
+Metric time-series benchmark: memory per data point and aggregate query latency.
+
+Compares the columnar store (services/metric_series.py) with the previous representation,
+a list of string dicts per entry, for a cohort of users with a year of daily weigh-ins.
+
+Usage:
+    python benchmarks/metric_series_benchmark.py [--users 1000] [--days 365]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.metric_series import MetricStore
+
+GOAL = {"parsed_details": {"goal_type": "weight_loss", "target_kg": 8.0, "deadline": None}}
+
+def dict_log(users: int, days: int, start: datetime):
+    return {
+        f"user{user}": [
+            {"timestamp": (start + timedelta(days=day)).isoformat(), "metric_name": "weight",
+             "metric_value": f"{90 - day * 0.02 + user % 7:.1f} kg", "notes": None}
+            for day in range(days)
+        ]
+        for user in range(users)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+    points = args.users * args.days
+    start = datetime.now() - timedelta(days=args.days)
+
+    tracemalloc.start()
+    log = dict_log(args.users, args.days, start)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del log
+
+    store = MetricStore(":memory:", max_users=args.users)
+    began = time.perf_counter()
+    for user in range(args.users):
+        for day in range(args.days):
+            store.record(f"user{user}", "weight", 90 - day * 0.02 + user % 7, "kg", start + timedelta(days=day))
+    ingest = time.perf_counter() - began
+    columnar_bytes = store.memory_bytes()
+
+    print(f"{points:,} points ({args.users:,} users x {args.days} days)")
+    print(f"list of dicts  {dict_bytes / points:8.1f} bytes/point")
+    print(f"columnar       {columnar_bytes / points:8.1f} bytes/point (array capacity included)   "
+          f"{dict_bytes / columnar_bytes:.0f}x smaller")
+    print(f"ingest         {points / ingest:10,.0f} points/sec (including the SQLite append)")
+
+    began = time.perf_counter()
+    for user in range(args.users):
+        store.summary(f"user{user}", "weight", goal=GOAL)
+    elapsed = time.perf_counter() - began
+    print(f"summary        {elapsed / args.users * 1e6:8.1f} us/user (rolling average, weekly deltas, slope, goal progress)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Model client benchmark: default AsyncOpenAI client vs the pooled, limited, retrying client
+from services/model_client.py, against the local stub LLM server with injected faults.
+
+`--calls` model calls are sent by `--concurrency` concurrent callers to a stub that answers some
+requests with 429 and makes some slow. Each scenario gets a fresh stub server and reports
+succeeded calls, p50/p95/p99 latency of the successful ones, upstream requests and connections,
+and the peak number of requests in flight upstream.
+  * default:  AsyncOpenAI with its default transport and built-in retries, no limiter,
+  * pooled:   pooled transport + UpstreamLimiter + jittered retries (ResilientModel),
+  * hedged:   as pooled, plus a second attempt for calls slower than --hedge-after.
+
+Usage:
+    python benchmarks/model_client_benchmark.py [--calls 400] [--concurrency 16] [--error-rate 0.1]
+                                                [--slow-rate 0.03] [--hedge-after 0.5]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import numpy as np
+from agents import ModelSettings, ModelTracing, OpenAIChatCompletionsModel
+from openai import AsyncOpenAI
+
+from benchmarks.load_test import wait_until_ready
+from services.model_client import ResilientModel, UpstreamLimiter, create_client
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def burst(model, calls: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        async with semaphore:
+            return await timed(index)
+
+    async def timed(index: int):
+        start = time.perf_counter()
+        try:
+            await model.get_response(
+                "You are a health coach.", f"Question {index}: how do I stay consistent?", ModelSettings(),
+                [], None, [], ModelTracing.DISABLED,
+            )
+            return time.perf_counter() - start
+        except Exception:
+            return None
+
+    return await asyncio.gather(*(one(index) for index in range(calls)))
+
+async def scenario(name: str, args, port: int):
+    base_url = f"http://127.0.0.1:{port}/v1/"
+    client = AsyncOpenAI(api_key="stub", base_url=base_url) if name == "default" else create_client("stub", base_url)
+    model = OpenAIChatCompletionsModel(model="stub", openai_client=client)
+    if name != "default":
+        model = ResilientModel(
+            model,
+            UpstreamLimiter(args.max_concurrent), "stub",
+            max_retries=3, backoff_base=0.1, backoff_max=2.0,
+            hedge_after=args.hedge_after if name == "hedged" else None,
+        )
+    results = await burst(model, args.calls, args.concurrency)
+    await client.close()
+    async with httpx.AsyncClient() as stats_client:
+        stats = (await stats_client.get(f"http://127.0.0.1:{port}/stats")).json()
+    latencies = np.asarray([seconds for seconds in results if seconds is not None]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+    print(f"  {name:<8} {len(latencies):4}/{args.calls} ok   p50 {p50:7.0f} ms  p95 {p95:7.0f} ms  p99 {p99:7.0f} ms   "
+          f"{stats['requests']:4} upstream requests ({stats['rate_limited']} got 429) on {stats['connections']} connections, "
+          f"peak {stats['peak_active']} in flight")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16, help="Callers sending model calls at the same time.")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--max-concurrent", type=int, default=32, help="UpstreamLimiter cap for the pooled scenarios.")
+    parser.add_argument("--hedge-after", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8102)
+    args = parser.parse_args()
+    print(f"{args.calls} calls from {args.concurrency} concurrent callers, stub {args.latency * 1000:.0f} ms, {args.error_rate:.0%} 429s, "
+          f"{args.slow_rate:.0%} slow ({args.slow_latency:.1f} s)")
+    for name in ("default", "pooled", "hedged"):
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(PROJECT_ROOT, "benchmarks", "stub_llm_server.py"), "--port", str(args.port),
+             "--latency", str(args.latency), "--tokens", "20", "--tokens-per-second", "1000",
+             "--error-rate", str(args.error_rate), "--slow-rate", str(args.slow_rate), "--slow-latency", str(args.slow_latency)],
+            cwd=PROJECT_ROOT,
+        )
+        try:
+            asyncio.run(wait_until_ready(f"http://127.0.0.1:{args.port}/stats", server))
+            asyncio.run(scenario(name, args, args.port))
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
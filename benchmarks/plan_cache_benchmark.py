@@ -0,0 +1,108 @@
+"""
+Plan cache benchmark: /set_goal with and without the plan cache (services/plan_cache.py).
+
+Users pick goals and diet preferences from a skewed (Zipf-like) distribution of common
+combinations, as real sign-ups do. Reports:
+  * goal analysis + plan building per call, cold (builder caches cleared) and through the plan cache,
+  * /set_goal requests/sec through the app with the cache disabled and enabled, and how many
+    plan sets were built versus served from the cache,
+  * the time precompute_popular() needs to warm a fresh cache from the stored sessions.
+
+The LLM goal-analysis fallback is disabled so nothing leaves the machine; with it enabled, every
+low-confidence description served from the cache also saves a model call.
+
+Usage:
+    python benchmarks/plan_cache_benchmark.py [--users 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "plan_cache_benchmark.db")
+os.environ["CHECKIN_SCHEDULER_ENABLED"] = "false"
+os.environ["ADMISSION_ENABLED"] = "false" # Measures the app itself, not the rate limits
+os.environ["GOAL_LLM_FALLBACK_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+
+import api
+from services import goal_parser, meal_planner, workout_library
+from services.plan_cache import PlanCache, build_plans, plan_key
+
+GOALS = [
+    "lose 5 kg in 2 months", "gain muscle", "run a 10k by summer", "lose 10 lbs by december",
+    "improve endurance", "get stronger", "lose weight", "build muscle and lose fat", "train for a marathon",
+    "improve flexibility", "lose 3 kg in 6 weeks", "gain 4 kg of muscle by june",
+]
+DIETS = [None, "vegetarian", "vegan", "keto", "gluten free", "high protein", "no dairy", "pescatarian", "halal"]
+
+def combinations(count: int, rng: random.Random):
+    pairs = [(goal, diet) for goal in GOALS for diet in DIETS]
+    weights = [1 / (rank + 1) for rank in range(len(pairs))] # Zipf-like popularity
+    return rng.choices(pairs, weights=weights, k=count)
+
+def clear_builder_caches():
+    goal_parser._analyze_normalized.cache_clear()
+    meal_planner._build_plan.cache_clear()
+    workout_library._parameterized_plan.cache_clear()
+
+async def per_call(label: str, count: int, fn):
+    start = time.perf_counter()
+    for index in range(count):
+        await fn(index)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {elapsed / count * 1e6:9.1f} us/call")
+
+async def compare_builds(pairs):
+    async def cold(index):
+        clear_builder_caches()
+        await build_plans("", *pairs[index])
+
+    cache = PlanCache()
+    await cache.precompute(pairs)
+    await per_call("built from scratch (builder caches cold)", len(pairs), cold)
+    await per_call("built (builder caches warm)", len(pairs), lambda index: build_plans("", *pairs[index]))
+    await per_call("plan cache hit", len(pairs), lambda index: cache.get_or_build(*pairs[index]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    args = parser.parse_args()
+    requests = combinations(args.users, random.Random(3))
+    distinct = len({plan_key(goal, diet) for goal, diet in requests})
+    print(f"{args.users:,} users, {distinct} distinct goal/diet combinations")
+
+    print("goal analysis + meal plan + workout plan")
+    pairs = sorted(set(requests), key=str)
+    asyncio.run(compare_builds(pairs))
+
+    print(f"/set_goal, {args.users:,} requests")
+    with TestClient(api.app) as client:
+        for label, max_entries in (("plan cache disabled", 0), ("plan cache enabled", 10000)):
+            clear_builder_caches()
+            api.plan_cache = PlanCache(max_entries=max_entries)
+            start = time.perf_counter()
+            for index, (goal, diet) in enumerate(requests):
+                response = client.post("/set_goal", json={
+                    "user_id": f"{label}-{index}", "user_name": "Benchmark", "goal_description": goal, "diet_preferences": diet,
+                })
+                response.raise_for_status()
+            elapsed = time.perf_counter() - start
+            cache = api.plan_cache
+            print(f"  {label:<22} {args.users / elapsed:8,.0f} requests/sec   "
+                  f"plans built {cache.misses:,}, served from cache {cache.hits:,}")
+
+    print("precompute from stored sessions")
+    cache = PlanCache()
+    clear_builder_caches()
+    start = time.perf_counter()
+    built = asyncio.run(cache.precompute_popular(api.session_store, limit=100))
+    print(f"  {built} combinations precomputed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
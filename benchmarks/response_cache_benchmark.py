@@ -0,0 +1,103 @@
+"""
+Response cache benchmark: hit rate and turn latency with and without the cache.
+
+Sends a stream of chat messages drawn from a small set of common requests, with random
+casing/punctuation/filler variations, through ConversationService backed by StubModel
+(simulated model latency, no network), once uncached and once through CachingModel. Each worker
+is a different user with the same diet, so replies are shared between workers. Near-duplicate hits
+are off in the app by default; `--similarity` enables them here.
+
+Usage:
+    python benchmarks/response_cache_benchmark.py [--messages 2000] [--latency 0.05] [--similarity 0.9]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents01.main_agent import build_health_wellness_agent
+from benchmarks.stub_model import StubModel, stub_run_config
+from context import UserSessionContext
+from services.conversation import ConversationService
+from services.response_cache import CachingModel, ResponseCache
+
+COMMON_MESSAGES = [
+    "make me a vegetarian meal plan",
+    "how do I lose 5 kg",
+    "what should I eat before a workout",
+    "give me a beginner workout plan",
+    "how much water should I drink",
+    "is it ok to skip breakfast",
+    "how do I build muscle at home",
+    "what is a good high protein snack",
+]
+VARIATIONS = [
+    lambda text: text,
+    lambda text: text.capitalize() + "?",
+    lambda text: text.upper(),
+    lambda text: "please " + text,
+    lambda text: text + " please!",
+    lambda text: "hey, " + text,
+]
+
+def make_messages(count: int, unique_share: float, rng: random.Random):
+    messages = []
+    for index in range(count):
+        if rng.random() < unique_share:
+            messages.append(f"question {index}: tell me something about exercise number {index}")
+        else:
+            messages.append(rng.choice(VARIATIONS)(rng.choice(COMMON_MESSAGES)))
+    return messages
+
+async def run(model, messages, concurrency: int) -> float:
+    service = ConversationService(build_health_wellness_agent(), run_config=lambda: stub_run_config(model), max_concurrent_calls=concurrency)
+    contexts = [UserSessionContext(name=f"user{i}", uid=i, diet_preferences="vegetarian") for i in range(concurrency)]
+    queue = list(messages)
+    start = time.perf_counter()
+
+    async def worker(worker_id: int):
+        while queue:
+            message = queue.pop()
+            await service.run(message, contexts[worker_id])
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated model latency in seconds.")
+    parser.add_argument("--unique-share", type=float, default=0.2, help="Share of messages that are one-off questions.")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--similarity", type=float, default=0.9, help="Near-duplicate threshold; 0 = exact hits only, the app default.")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.unique_share, random.Random(42))
+
+    stub = StubModel(latency=args.latency)
+    elapsed = asyncio.run(run(stub, messages, args.concurrency))
+    print(f"{'uncached':<9} {args.messages / elapsed:10,.0f} turns/sec   model calls: {stub.calls}")
+
+    stub = StubModel(latency=args.latency)
+    cache = ResponseCache(max_entries=5000, ttl_seconds=3600, similarity_threshold=args.similarity or None)
+    elapsed = asyncio.run(run(CachingModel(stub, cache), messages, args.concurrency))
+    stats = cache.stats()
+    print(f"{'cached':<9} {args.messages / elapsed:10,.0f} turns/sec   model calls: {stub.calls}")
+    print(f"hit rate {stats['hit_rate']:.1%} (exact {stats['exact_hits']}, similar {stats['similar_hits']}, misses {stats['misses']})")
+
+    if not args.similarity:
+        return
+    prompts = [f"how do i lose weight fast tip number {i}" for i in range(5000)]
+    for prompt in prompts:
+        cache.store("scope", prompt, [])
+    start = time.perf_counter()
+    for prompt in prompts[:1000]:
+        cache.lookup("scope", prompt + " now")
+    print(f"similarity lookup over {len(cache):,} entries in one scope (worst case): {(time.perf_counter() - start) / 1000 * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    main()
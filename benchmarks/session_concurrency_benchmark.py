@@ -0,0 +1,176 @@
+"""
+Session concurrency benchmark: lost updates, per-user lock scaling and cross-worker conflicts.
+
+  1. Many concurrent read-modify-write cycles on the same user, each awaiting between its read
+     and its save (as /set_goal and /chat do): unguarded, and with update_session()
+     (services/session_locks.py). Every cycle appends one handoff log line, so the final count
+     shows how many updates were lost.
+  2. Throughput of per-user locked updates as the number of independent users grows, each
+     update awaiting a simulated model call. With per-user locks the elapsed time stays flat
+     and throughput grows linearly with users.
+  3. Two "workers" (threads, each with its own event loop, locks and TieredSessionStore) on the
+     same SQLite file updating the same users: conflicts are detected by the row version and
+     retried, and no update is lost.
+  4. The API itself: concurrent handoff requests for one user through an in-process ASGI client.
+
+Usage:
+    python benchmarks/session_concurrency_benchmark.py [--updates 200] [--latency-ms 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "concurrency_benchmark.db")
+os.environ["CHECKIN_SCHEDULER_ENABLED"] = "false"
+os.environ["ADMISSION_ENABLED"] = "false" # Measures the app itself, not the rate limits
+
+import httpx
+
+from context import UserSessionContext
+from services.session_locks import UserLocks, update_session
+from services.session_store import InMemoryLRUSessionStore, SessionConflictError, SQLiteSessionStore, TieredSessionStore
+
+def tiered_store(db_path: str) -> TieredSessionStore:
+    return TieredSessionStore(InMemoryLRUSessionStore(max_entries=10000, ttl_seconds=None), SQLiteSessionStore(db_path))
+
+class CountingStore(TieredSessionStore):
+    """Counts saves rejected with SessionConflictError."""
+
+    conflicts = 0
+
+    def put(self, user_id, session):
+        try:
+            super().put(user_id, session)
+        except SessionConflictError:
+            self.conflicts += 1
+            raise
+
+def log_line(index: int) -> str:
+    return f"2026-10-18T10:00:00 | escalation_agent | api | update {index}"
+
+async def lost_updates(updates: int, latency: float, db_path: str):
+    print(f"{updates} concurrent updates to one user, each awaiting {latency * 1000:.0f} ms between read and save")
+
+    store = InMemoryLRUSessionStore(max_entries=100, ttl_seconds=None)
+    store.put("u", UserSessionContext(name="U", uid=1))
+
+    async def unguarded(index):
+        session = store.get("u")
+        await asyncio.sleep(latency)
+        session.handoff_logs.append(log_line(index))
+        store.put("u", session)
+
+    await asyncio.gather(*(unguarded(index) for index in range(updates)))
+    print(f"  unguarded get/put         {len(store.get('u').handoff_logs):5} of {updates} kept")
+
+    store = tiered_store(db_path)
+    store.put("locked", UserSessionContext(name="U", uid=1))
+    locks = UserLocks()
+
+    async def append(session, index):
+        await asyncio.sleep(latency)
+        session.handoff_logs.append(log_line(index))
+
+    await asyncio.gather(*(update_session(store, locks, "locked", lambda session, index=index: append(session, index)) for index in range(updates)))
+    print(f"  update_session()          {len(store.get('locked').handoff_logs):5} of {updates} kept   ({len(locks)} locks left)")
+
+async def scaling(latency: float, db_path: str, updates_per_user: int = 10):
+    print(f"per-user locked updates, {updates_per_user} sequential updates per user, {latency * 1000:.0f} ms simulated model call each")
+    store = tiered_store(db_path)
+    locks = UserLocks()
+
+    async def append(session):
+        await asyncio.sleep(latency)
+        session.handoff_logs.append(log_line(0))
+
+    async def user_updates(user_id):
+        for _ in range(updates_per_user):
+            await update_session(store, locks, user_id, append)
+
+    for users in (1, 4, 16, 64, 256):
+        user_ids = [f"scale-{users}-{index}" for index in range(users)]
+        for user_id in user_ids:
+            store.put(user_id, UserSessionContext(name="U", uid=1))
+        start = time.perf_counter()
+        await asyncio.gather(*(user_updates(user_id) for user_id in user_ids))
+        elapsed = time.perf_counter() - start
+        serialized = users * updates_per_user * latency # What one lock shared by all users would take
+        print(f"  {users:4} users   {elapsed * 1000:8.1f} ms   {users * updates_per_user / elapsed:9,.0f} updates/sec   "
+              f"(one global lock: >= {serialized * 1000:,.0f} ms)")
+
+def two_workers(updates: int, db_path: str, users: int = 4):
+    print(f"two workers sharing {os.path.basename(db_path)}, {updates} updates each, spread over {users} users")
+    seed = tiered_store(db_path)
+    for index in range(users):
+        seed.put(f"shared-{index}", UserSessionContext(name="U", uid=index))
+    stores = [CountingStore(InMemoryLRUSessionStore(max_entries=100, ttl_seconds=None), SQLiteSessionStore(db_path)) for _ in range(2)]
+    errors = []
+
+    def worker(number: int):
+        async def run():
+            locks = UserLocks()
+
+            async def append(session, index):
+                await asyncio.sleep(0)
+                session.handoff_logs.append(log_line(index))
+
+            await asyncio.gather(*(
+                update_session(stores[number], locks, f"shared-{index % users}", lambda session, index=index: append(session, index))
+                for index in range(updates)
+            ))
+        try:
+            asyncio.run(run())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(2)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    kept = sum(len(seed.backend.get(f"shared-{index}").handoff_logs) for index in range(users))
+    print(f"  kept {kept} of {2 * updates} updates in {elapsed * 1000:.0f} ms, "
+          f"conflicts retried: {stores[0].conflicts} + {stores[1].conflicts}, failed: {len(errors)}")
+
+async def api_handoffs(updates: int):
+    from api import app
+
+    print(f"{updates} concurrent handoff requests for one user through the API")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        response = await client.post("/set_goal", json={"user_id": "api-user", "user_name": "Benchmark", "goal_description": "lose 5 kg in 2 months"})
+        response.raise_for_status()
+        paths = ["/request_human_coach", "/consult_nutrition_expert", "/consult_injury_expert"]
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(paths[index % len(paths)], json={"user_id": "api-user", "reason": f"question {index}"})
+            for index in range(updates)
+        ))
+        elapsed = time.perf_counter() - start
+    from api import session_store
+
+    failed = sum(response.status_code != 200 for response in responses)
+    print(f"  {len(session_store.get('api-user').handoff_logs)} handoffs logged, {failed} failed, {updates / elapsed:,.0f} requests/sec")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+    db_path = os.environ["DATABASE_PATH"]
+
+    asyncio.run(lost_updates(args.updates, latency, db_path))
+    asyncio.run(scaling(latency, db_path))
+    two_workers(args.updates, db_path)
+    asyncio.run(api_handoffs(args.updates))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Session store benchmark: memory per session and save/load cost.
+
+Compares the compact representation (services/session_codec.py: msgpack blob per field,
+a SQLite BLOB column per field, dirty-field saves) with the previous one: a UserSessionContext
+object per hot session and the whole session rewritten as a JSON row on every save.
+Sessions are filled the way /set_goal fills them, plus a few handoff and progress entries.
+
+Usage:
+    python benchmarks/session_store_benchmark.py [--users 5000] [--saves 5000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import UserSessionContext
+from services.db import connect
+from services.goal_parser import analyze_goal
+from services.meal_planner import estimate_caloric_goal, generate_meal_plan
+from services.session_codec import pack_session
+from services.session_store import InMemoryLRUSessionStore, SQLiteSessionStore, TieredSessionStore
+from services.workout_library import recommend_workout
+
+GOALS = ["lose 5 kg in 2 months", "gain muscle", "run a 10k by summer", "lose 10 lbs by december", "improve endurance", "get stronger"]
+DIETS = ["vegetarian", "vegan", None, "keto", "gluten free", "high protein"]
+
+def make_session(index: int, rng: random.Random) -> UserSessionContext:
+    description = rng.choice(GOALS)
+    diet = rng.choice(DIETS)
+    goal = {"description": description, **analyze_goal(description), "status": "analyzed"}
+    return UserSessionContext(
+        name=f"User {index}",
+        uid=index,
+        goal=goal,
+        diet_preferences=diet,
+        meal_plan=list(generate_meal_plan(diet, goal["parsed_details"]["diet_keywords"], estimate_caloric_goal(goal))),
+        workout_plan=recommend_workout(goal["parsed_details"]["goal_type"], description),
+        handoff_logs=[f"2026-10-0{day}T09:00:00 | escalation_agent | api | question {index}" for day in range(1, 4)],
+        scheduled_checkins=[{"day": "Monday", "time": "09:00", "reminder_type": "email", "notes": "", "next_checkin": "2026-10-19T09:00"}],
+    )
+
+class JSONRowSessionStore:
+    """The previous SQLite backend: one JSON document per session, rewritten on every save."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._conn.execute("CREATE TABLE IF NOT EXISTS json_sessions (user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+
+    def get(self, user_id: str):
+        row = self._conn.execute("SELECT data FROM json_sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return UserSessionContext.model_validate_json(row[0]) if row else None
+
+    def put(self, user_id: str, session: UserSessionContext):
+        self._conn.execute(
+            "INSERT INTO json_sessions (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, session.model_dump_json(), time.time()),
+        )
+
+def timed(label: str, count: int, fn):
+    start = time.perf_counter()
+    for index in range(count):
+        fn(index)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {count / elapsed:10,.0f} ops/sec   {elapsed / count * 1e6:7.1f} us/op")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--saves", type=int, default=5000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    sessions = [make_session(index, rng) for index in range(args.users)]
+    user_ids = [f"user{index}" for index in range(args.users)]
+    db_path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+
+    legacy = JSONRowSessionStore(connect(db_path))
+    compact = TieredSessionStore(InMemoryLRUSessionStore(max_entries=args.users, ttl_seconds=None), SQLiteSessionStore(db_path))
+    for user_id, session in zip(user_ids, sessions):
+        legacy.put(user_id, session)
+        compact.put(user_id, session)
+
+    # Hot-tier memory: sessions as the old LRU held them (decoded from JSON) vs compact entries.
+    tracemalloc.start()
+    decoded = {user_id: legacy.get(user_id) for user_id in user_ids}
+    object_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del decoded
+    tracemalloc.start()
+    hot = InMemoryLRUSessionStore(max_entries=args.users, ttl_seconds=None)
+    for user_id in user_ids:
+        hot.put_compact(user_id, compact.backend.get_compact(user_id))
+    compact_bytes_traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{args.users:,} sessions in the hot tier")
+    print(f"  UserSessionContext objects   {object_bytes / args.users:8,.0f} bytes/session")
+    print(f"  CompactSession (msgpack)     {compact_bytes_traced / args.users:8,.0f} bytes/session   "
+          f"({hot.nbytes() / args.users:,.0f} of it encoded field data)")
+
+    # Sessions decoded at the same time (a meal-plan refresh batch, concurrent requests) share interned plan strings.
+    batch = user_ids[:1000]
+    tracemalloc.start()
+    decoded = [legacy.get(user_id) for user_id in batch]
+    json_batch_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del decoded
+    tracemalloc.start()
+    decoded = [compact.get(user_id) for user_id in batch]
+    compact_batch_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del decoded
+    print(f"{len(batch):,} sessions decoded at once")
+    print(f"  from JSON                    {json_batch_bytes / len(batch):8,.0f} bytes/session")
+    print(f"  from compact (interned)      {compact_batch_bytes / len(batch):8,.0f} bytes/session")
+
+    print(f"save after one change (append a handoff log line), {args.saves:,} saves")
+    legacy_sessions = [legacy.get(user_id) for user_id in user_ids]
+    compact_sessions = [compact.get(user_id) for user_id in user_ids]
+
+    def legacy_save(index):
+        session = legacy_sessions[index % args.users]
+        session.handoff_logs.append(f"2026-10-18T10:00:00 | injury_support_agent | api | save {index}")
+        legacy.put(user_ids[index % args.users], session)
+
+    def compact_save(index):
+        session = compact_sessions[index % args.users]
+        session.handoff_logs.append(f"2026-10-18T10:00:00 | injury_support_agent | api | save {index}")
+        compact.put(user_ids[index % args.users], session)
+
+    session = compact_sessions[0]
+    session.handoff_logs.append("2026-10-18T10:00:00 | injury_support_agent | api | size check")
+    packed, dirty = pack_session(session)
+    dirty_bytes = sum(len(blob) for name, blob in packed.field_items() if name in dirty)
+    print(f"  bytes written per save: JSON row {len(session.model_dump_json()):,}, dirty fields {dirty_bytes:,} ({', '.join(dirty)})")
+    timed("JSON row (whole session)", args.saves, legacy_save)
+    timed("field columns (dirty fields only)", args.saves, compact_save)
+    timed("field columns (nothing changed)", args.saves, lambda index: compact.put(user_ids[index % args.users], compact_sessions[index % args.users]))
+
+    print(f"load, {args.saves:,} loads")
+    timed("JSON row + model_validate_json", args.saves, lambda index: legacy.get(user_ids[index % args.users]))
+    timed("field columns + decode", args.saves, lambda index: compact.backend.get(user_ids[index % args.users]))
+    timed("hot tier (decode compact)", args.saves, lambda index: compact.get(user_ids[index % args.users]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Startup benchmark: measures import-to-first-request time for api.py and main.py.
+
+Each measurement runs in a fresh interpreter so module caches do not hide import cost.
+No network access is needed; the model client is only built lazily and never called.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports api.py and serves one /set_goal request through FastAPI's in-process TestClient.
+API_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import api
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(api.app) as client:
+    t2 = time.perf_counter()
+    response = client.post("/set_goal", json={
+        "user_id": "bench", "user_name": "Bench", "goal_description": "lose 5 kg in 2 months",
+    })
+    t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1, "first_request": t3 - t2, "status": response.status_code}))
+"""
+
+# Imports main.py and runs the CLI until it first asks for input (then answers 'quit').
+MAIN_SNIPPET = """
+import builtins, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+marks = {}
+def fake_input(prompt=""):
+    marks.setdefault("prompt", time.perf_counter())
+    return "quit"
+builtins.input = fake_input
+main.main()
+print(json.dumps({"import": t1 - t0, "startup": marks["prompt"] - t1, "first_request": 0.0, "status": 0}))
+"""
+
+def run_snippet(snippet: str) -> dict:
+    env = dict(os.environ, WARMUP_ON_STARTUP="false")
+    completed = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # The CLI prints its banner first; the timing JSON is always the last line.
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def report(label: str, samples: list) -> None:
+    print(f"\n{label} ({len(samples)} runs)")
+    for key in ("import", "startup", "first_request"):
+        values = [s[key] * 1000 for s in samples]
+        print(f"  {key:<14} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    totals = [(s["import"] + s["startup"] + s["first_request"]) * 1000 for s in samples]
+    print(f"  {'total':<14} median {statistics.median(totals):8.1f} ms   min {min(totals):8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report("api.py: import -> first /set_goal response", [run_snippet(API_SNIPPET) for _ in range(args.runs)])
+    report("main.py: import -> first prompt", [run_snippet(MAIN_SNIPPET) for _ in range(args.runs)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Local OpenAI-compatible chat completions server standing in for the Gemini endpoint.
+
+Answers POST /v1/chat/completions (plain and streamed) with a canned reply of `--tokens` words
+after `--latency` seconds, streaming the words at `--tokens-per-second`. Point the app at it with
+GEMINI_BASE_URL=http://127.0.0.1:<port>/v1/ and any GEMINI_API_KEY. GET /stats returns the number
+of requests served, the peak number in flight and the number of client connections opened.
+
+Faults for exercising the model client: `--error-rate` of requests get a 429 (with Retry-After),
+and `--slow-rate` of requests take `--slow-latency` seconds instead of `--latency`.
+
+Usage:
+    python benchmarks/stub_llm_server.py [--port 8101] [--latency 0.2] [--tokens 60] [--tokens-per-second 200]
+                                         [--error-rate 0.1] [--slow-rate 0.05 --slow-latency 3]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("Stay", "consistent", "with", "balanced", "meals,", "steady", "training", "and", "enough", "sleep.")
+
+def create_app(
+    latency: float, tokens: int, tokens_per_second: float,
+    error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 0.0, seed: int = 1,
+) -> FastAPI:
+    app = FastAPI()
+    stats = {"requests": 0, "active": 0, "peak_active": 0, "rate_limited": 0, "slow": 0, "connections": 0}
+    clients = set() # (host, port) of every client connection seen
+    rng = random.Random(seed)
+
+    def _reply() -> str:
+        return " ".join(WORDS[index % len(WORDS)] for index in range(tokens))
+
+    def _usage(body: dict) -> dict:
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4 # Rough estimate, like the app's own budget
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": tokens, "total_tokens": prompt_tokens + tokens}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        clients.add(request.scope.get("client"))
+        stats["connections"] = len(clients)
+        if rng.random() < error_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Resource has been exhausted (stub).", "type": "rate_limit_exceeded", "code": 429}},
+                status_code=429, headers={"retry-after": "0"},
+            )
+        first_token = latency
+        if rng.random() < slow_rate:
+            stats["slow"] += 1
+            first_token = slow_latency
+        stats["active"] += 1
+        stats["peak_active"] = max(stats["peak_active"], stats["active"])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "stub")
+
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(first_token + tokens / tokens_per_second)
+            finally:
+                stats["active"] -= 1
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": _reply()}, "finish_reason": "stop"}],
+                "usage": _usage(body),
+            })
+
+        def chunk(delta: dict, finish_reason=None) -> str:
+            data = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            try:
+                await asyncio.sleep(first_token)
+                yield chunk({"role": "assistant", "content": ""})
+                for index, word in enumerate(_reply().split(" ")):
+                    await asyncio.sleep(1 / tokens_per_second)
+                    yield chunk({"content": (" " if index else "") + word})
+                yield chunk({}, "stop")
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    usage = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [], "usage": _usage(body)}
+                    yield f"data: {json.dumps(usage)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                stats["active"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token.")
+    parser.add_argument("--tokens", type=int, default=60, help="Words in every reply.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429.")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests using --slow-latency.")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Seconds before the first token of a slow request.")
+    args = parser.parse_args()
+    app = create_app(args.latency, args.tokens, args.tokens_per_second, args.error_rate, args.slow_rate, args.slow_latency)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
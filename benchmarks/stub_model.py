@@ -0,0 +1,69 @@
+"""
+Local stand-in for the chat model, for benchmarks that should not call Gemini.
+
+StubModel answers every turn with a canned text reply after `latency` seconds, supports both
+plain and streamed runs, and counts calls and peak concurrency.
+"""
+import asyncio
+import time
+from typing import Callable, Optional
+
+from agents import Model, ModelResponse, RunConfig, Usage
+from openai.types.responses import (
+    Response, ResponseCompletedEvent, ResponseOutputMessage, ResponseOutputText, ResponseTextDeltaEvent,
+)
+
+def _message(text: str) -> ResponseOutputMessage:
+    return ResponseOutputMessage(
+        id="msg_stub", type="message", role="assistant", status="completed",
+        content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+    )
+
+def _last_user_text(input) -> str:
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if isinstance(item, dict) and item.get("role") == "user" and isinstance(item.get("content"), str):
+            return item["content"]
+    return ""
+
+class StubModel(Model):
+    def __init__(self, latency: float = 0.05, reply: Optional[Callable[[str], str]] = None):
+        self.latency = latency
+        self.reply = reply or (lambda prompt: f"Here is some advice about: {prompt}")
+        self.calls = 0
+        self.active = 0
+        self.peak_active = 0
+
+    async def _respond(self, input) -> str:
+        self.calls += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        return self.reply(_last_user_text(input))
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs):
+        text = await self._respond(input)
+        return ModelResponse(output=[_message(text)], usage=Usage(), response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs):
+        text = await self._respond(input)
+        words = text.split(" ")
+        for index, word in enumerate(words):
+            yield ResponseTextDeltaEvent(
+                type="response.output_text.delta", delta=(" " if index else "") + word, item_id="msg_stub",
+                output_index=0, content_index=0, sequence_number=index, logprobs=[],
+            )
+        yield ResponseCompletedEvent(
+            type="response.completed", sequence_number=len(words),
+            response=Response(
+                id="resp_stub", created_at=time.time(), model="stub", object="response", output=[_message(text)],
+                tool_choice="auto", tools=[], parallel_tool_calls=False,
+            ),
+        )
+
+def stub_run_config(model: Model) -> RunConfig:
+    return RunConfig(model=model, tracing_disabled=True)
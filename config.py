@@ -1,25 +1,11 @@
 import os
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, set_default_openai_client, set_tracing_disabled, RunConfig
+from agents import Agent, Model, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, set_default_openai_client, set_tracing_disabled, RunConfig
 
 load_dotenv() # Load environment variables from .env file
 
-gemini_api_key = os.getenv("GEMINI_API_KEY", "")
-
-# Reference: https://ai.google.dev/gemini-api/docs/openai
-external_client = AsyncOpenAI(
-    api_key=gemini_api_key,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-)
-
-set_default_openai_client(external_client)
-set_tracing_disabled(True)
-
-model = OpenAIChatCompletionsModel(
-    model="gemini-2.0-flash",
-    openai_client=external_client
-)
-
 # Model Settings
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash") # Default to gemini-2.0-flash if not set
 
@@ -27,14 +13,207 @@ MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash") # Default to gemini-2.0
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
+# Reference: https://ai.google.dev/gemini-api/docs/openai
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/")
+
+# Startup Settings
+# When enabled, api.py sends one small prompt to the model in the background at startup
+# so the first real request does not pay for connection setup.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+# Storage Settings
+DATABASE_PATH = os.getenv("DATABASE_PATH", "health_agent.db") # Local SQLite file shared by all workers
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000")) # Max sessions kept in the in-memory hot tier
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300")) # Max age of a hot-tier entry
+
+# Bulk Ingestion Settings
+BULK_INGEST_MAX_ROWS = int(os.getenv("BULK_INGEST_MAX_ROWS", "100000")) # Max rows accepted in one /bulk_track_progress upload
+BULK_INGEST_BATCH_SIZE = int(os.getenv("BULK_INGEST_BATCH_SIZE", "1000")) # Rows parsed before a batch is validated
+
+# Check-in Scheduler Settings
+CHECKIN_SCHEDULER_ENABLED = os.getenv("CHECKIN_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes") # Run the reminder loop in api.py
+CHECKIN_TICK_SECONDS = float(os.getenv("CHECKIN_TICK_SECONDS", "1.0")) # Max time between checks for due reminders
+
+# Job Queue Settings
+# Background jobs (e.g. /set_goal?async=true) run on a bounded worker pool; their status is kept in SQLite.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4")) # Jobs run concurrently per process
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "1000")) # Waiting jobs before new submissions get 503
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400")) # How long finished jobs stay pollable
+
+# Goal Analysis Settings
+# Goals are parsed by local rules first; the LLM is only asked when the rules have low confidence.
+GOAL_LLM_FALLBACK_ENABLED = os.getenv("GOAL_LLM_FALLBACK_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Plan Cache Settings
+# /set_goal reuses goal analysis and plans for inputs already seen (services/plan_cache.py).
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "10000")) # Max cached goal/diet combinations per process
+PLAN_PRECOMPUTE_ON_STARTUP = os.getenv("PLAN_PRECOMPUTE_ON_STARTUP", "false").lower() in ("1", "true", "yes") # Precompute popular combinations in the background
+PLAN_PRECOMPUTE_TOP_N = int(os.getenv("PLAN_PRECOMPUTE_TOP_N", "200")) # Number of most common stored combinations to precompute
+
+# Conversation Settings
+MAX_CONCURRENT_MODEL_CALLS = int(os.getenv("MAX_CONCURRENT_MODEL_CALLS", "64")) # Agent runs in flight per process; extra callers wait
+MAX_AGENT_TURNS = int(os.getenv("MAX_AGENT_TURNS", "10")) # Max model turns (tool calls/handoffs) per user message
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "50")) # Messages kept per user; older ones are dropped
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000")) # Estimated tokens of history + new message sent per turn
+
+# Model Client Settings
+# One pooled HTTP transport per process; the limits below are per process, so divide the
+# provider's quota by the number of uvicorn workers when setting MODEL_REQUESTS_PER_MINUTE.
+MODEL_HTTP_MAX_CONNECTIONS = int(os.getenv("MODEL_HTTP_MAX_CONNECTIONS", "100")) # Open connections to the model endpoint
+MODEL_HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("MODEL_HTTP_KEEPALIVE_CONNECTIONS", "32")) # Idle connections kept for reuse; below MODEL_MAX_CONCURRENT_REQUESTS they churn under load
+MODEL_HTTP_KEEPALIVE_SECONDS = float(os.getenv("MODEL_HTTP_KEEPALIVE_SECONDS", "30")) # How long an idle connection is kept
+MODEL_HTTP2 = os.getenv("MODEL_HTTP2", "false").lower() in ("1", "true", "yes") # Needs the h2 package
+MODEL_TIMEOUT_SECONDS = float(os.getenv("MODEL_TIMEOUT_SECONDS", "60")) # Per attempt
+MODEL_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MODEL_CONNECT_TIMEOUT_SECONDS", "5"))
+MODEL_MAX_CONCURRENT_REQUESTS = int(os.getenv("MODEL_MAX_CONCURRENT_REQUESTS", "32")) # Upstream requests in flight; extra calls wait
+MODEL_REQUESTS_PER_MINUTE = float(os.getenv("MODEL_REQUESTS_PER_MINUTE", "0")) # Token-bucket rate; 0 disables
+MODEL_RATE_BURST = int(os.getenv("MODEL_RATE_BURST", "10")) # Requests allowed at once after an idle period
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "3")) # Retries on 429, 5xx and connection errors
+MODEL_RETRY_BASE_SECONDS = float(os.getenv("MODEL_RETRY_BASE_SECONDS", "0.5")) # Backoff before the first retry (doubles, jittered)
+MODEL_RETRY_MAX_SECONDS = float(os.getenv("MODEL_RETRY_MAX_SECONDS", "20")) # Longest wait between attempts
+MODEL_HEDGE_AFTER_SECONDS = float(os.getenv("MODEL_HEDGE_AFTER_SECONDS", "0")) # Send a second attempt for calls slower than this; 0 disables
+
+# Admission Control Settings
+# Token buckets per client address, per user_id and for the whole service, plus load shedding of
+# model-calling routes (/chat, /chat/stream). Model-calling requests take ADMISSION_MODEL_ROUTE_COST
+# tokens, others one. The user_id is not authenticated; the client bucket bounds a caller that rotates it.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_BACKEND = os.getenv("ADMISSION_BACKEND", "memory") # 'memory' (per process) or 'sqlite' (shared by workers on DATABASE_PATH)
+ADMISSION_SHARDS = int(os.getenv("ADMISSION_SHARDS", "16")) # Lock shards of the in-memory buckets
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "20")) # Tokens per second refilled per client address
+ADMISSION_CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "100")) # Tokens a client address can spend at once
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "5")) # Tokens per second refilled per user
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "20")) # Tokens a user can spend at once
+ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "1000")) # Tokens per second for all users together
+ADMISSION_GLOBAL_BURST = float(os.getenv("ADMISSION_GLOBAL_BURST", "2000"))
+ADMISSION_MODEL_ROUTE_COST = float(os.getenv("ADMISSION_MODEL_ROUTE_COST", "5")) # Tokens a /chat or /chat/stream request takes
+ADMISSION_MAX_MODEL_REQUESTS = int(os.getenv("ADMISSION_MAX_MODEL_REQUESTS", "128")) # Model-calling requests in flight before new ones get 503
+ADMISSION_SHED_RETRY_AFTER_SECONDS = float(os.getenv("ADMISSION_SHED_RETRY_AFTER_SECONDS", "2")) # Retry-After sent with 503
+ADMISSION_MAX_BODY_BYTES = int(os.getenv("ADMISSION_MAX_BODY_BYTES", "65536")) # Largest JSON body read to find the user_id
+
+# Context Compaction Settings
+# Before each agent model call the session is sent as a short profile with per-metric aggregates
+# after the static instructions (services/context_compaction.py).
+CONTEXT_COMPACTION_ENABLED = os.getenv("CONTEXT_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Send only the tools for the message's topic. Off by default: it changes the prompt prefix between
+# topics, which costs provider prompt-cache hits (see benchmarks/context_compaction_benchmark.py).
+CONTEXT_TOOL_FILTER_ENABLED = os.getenv("CONTEXT_TOOL_FILTER_ENABLED", "false").lower() in ("1", "true", "yes")
+CONTEXT_TOOL_MIN_CONFIDENCE = float(os.getenv("CONTEXT_TOOL_MIN_CONFIDENCE", "0.75")) # Topic share of keyword score needed to drop other tools
+CONTEXT_SUMMARY_MAX_METRICS = int(os.getenv("CONTEXT_SUMMARY_MAX_METRICS", "5")) # Tracked metrics summarized in the profile
+
+# Intent Router Settings
+# Obvious requests ("log weight 72kg", "schedule my check-in for Monday 9 AM") call the tool directly.
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv("INTENT_ROUTER_MIN_CONFIDENCE", "0.75")) # Keyword-classifier confidence needed to skip the agent
+
+# Handoff Classifier Settings
+# Messages that clearly need a specialist (injury, medical diet, human coach) start on that agent.
+HANDOFF_CLASSIFIER_ENABLED = os.getenv("HANDOFF_CLASSIFIER_ENABLED", "true").lower() in ("1", "true", "yes")
+HANDOFF_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("HANDOFF_CLASSIFIER_MIN_CONFIDENCE", "0.7")) # Share of lexicon score the winning specialist needs
+
+# Metrics Settings
+# Latency histograms for every route, tool call and model call, served at GET /metrics (Prometheus text format).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes") # Sample event-loop stacks, served at GET /debug/profile
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.01")) # Time between stack samples
+
+# Response Cache Settings
+# Repeated or near-identical user messages are answered from a local cache instead of the model.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000")) # Max cached replies per process
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")) # Max age of a cached reply
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0")) # Min n-gram cosine similarity for a near-duplicate hit; 0 = exact hits only
+
+gemini_api_key = GEMINI_API_KEY or ""
+
+# Nothing below talks to the network or builds a client at import time.
+# The client, model and RunConfig are created on first use and then reused
+# by every caller in the process.
+
+@lru_cache(maxsize=1)
+def get_external_client() -> AsyncOpenAI:
+    """
+    Returns the shared AsyncOpenAI client for the Gemini endpoint, creating it on first use.
+    It uses the pooled transport from services/model_client.py (MODEL_HTTP_* settings).
+    """
+    from services.model_client import create_client
+
+    external_client = create_client(gemini_api_key, GEMINI_BASE_URL)
+
+    set_default_openai_client(external_client)
+    set_tracing_disabled(True)
+    return external_client
+
+@lru_cache(maxsize=1)
+def get_response_cache():
+    """
+    Returns the shared response cache, creating it on first use.
+    """
+    from services.response_cache import ResponseCache
+
+    return ResponseCache(
+        max_entries=RESPONSE_CACHE_SIZE,
+        ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        similarity_threshold=RESPONSE_CACHE_SIMILARITY or None,
+    )
+
+@lru_cache(maxsize=1)
+def get_model() -> Model:
+    """
+    Returns the shared chat completions model, creating it on first use.
+    Calls go through the upstream limiter with retries (MODEL_* settings). With METRICS_ENABLED
+    they are timed; with RESPONSE_CACHE_ENABLED the model is wrapped in the response cache.
+    """
+    from services.model_client import resilient
+
+    model = OpenAIChatCompletionsModel(
+        model=MODEL_NAME,
+        openai_client=get_external_client()
+    )
+    model = resilient(model, MODEL_NAME)
+    if METRICS_ENABLED:
+        from services.instrumentation import InstrumentedModel
+
+        model = InstrumentedModel(model, MODEL_NAME) # Inside the cache, so only real model calls are timed
+    if RESPONSE_CACHE_ENABLED:
+        from services.response_cache import CachingModel
+
+        model = CachingModel(model, get_response_cache())
+    return model
+
+@lru_cache(maxsize=1)
+def get_run_config() -> RunConfig:
+    """
+    Returns the shared RunConfig used for every agent run, creating it on first use.
+    """
+    return RunConfig(
+        model=get_model(),
+        model_provider=get_external_client(),
+        tracing_disabled=True
+    )
 
-agent: Agent = Agent(name="Assistant", instructions="You are a helpful assistant")
+async def warm_up(prompt: str = "Hello, how are you.") -> Optional[str]:
+    """
+    Sends one small prompt through the model so the client and its connection are ready.
+    Meant to be scheduled as a background task at startup; failures are logged, never raised.
+    """
+    agent: Agent = Agent(name="Assistant", instructions="You are a helpful assistant")
+    try:
+        result = await Runner.run(agent, prompt, run_config=get_run_config())
+        return result.final_output
+    except Exception as e:
+        print(f"Model warm-up failed: {e}")
+        return None
 
-result = Runner.run_sync(agent, "Hello, how are you.", run_config=config)
+# Backwards compatible module attributes (`from config import config`, `config.model`, ...).
+# They resolve lazily through the getters above.
+_LAZY_ATTRIBUTES = {
+    "external_client": get_external_client,
+    "model": get_model,
+    "config": get_run_config,
+}
 
-print(result.final_output)
\ No newline at end of file
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List, Dict
+from pydantic import BaseModel, PrivateAttr
+from typing import Any, Optional, List, Dict
 
 class UserSessionContext(BaseModel):
     name: str
@@ -11,3 +11,8 @@ class UserSessionContext(BaseModel):
     injury_notes: Optional[str] = None
     handoff_logs: List[str] = []
     progress_logs: List[Dict[str, str]] = []
+    scheduled_checkins: List[Dict[str, str]] = []
+
+    # Encoded form this session was loaded from or last saved as (services/session_codec.py).
+    # Not part of the schema; the session store uses it to write only the fields that changed.
+    _stored: Any = PrivateAttr(default=None)
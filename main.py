@@ -1,5 +1,7 @@
 import sys
 import os
+import argparse
+import asyncio
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -8,78 +10,60 @@ load_dotenv()
 # Add the project root to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, RunConfig
-
 from context import UserSessionContext
-from config import config # Import the run_config from config.py
-
-# Import refactored tools
-from tools.goal_analyzer_tool import GoalAnalyzerTool
-from tools.meal_planner_tool import MealPlannerTool
-from tools.workout_recommender_tool import WorkoutRecommenderTool
-from tools.checkin_scheduler_tool import CheckinSchedulerTool
-from tools.progress_tracker_tool import ProgressTrackerTool
-
-# Import specialized agents
-from agents01.escalation_agent import EscalationAgent
-from agents01.nutrition_expert_agent import NutritionExpertAgent
-from agents01.injury_support_agent import InjurySupportAgent
-from agents01.main_agent import HealthWellnessAgent # Import the actual agent class
+from services.conversation import get_conversation_service # Shared agent runner; builds the agent, its tools and handoffs lazily
+from services.user_ids import get_user_id_registry
 
-# Instantiate tools
-goal_analyzer_tool = GoalAnalyzerTool
-meal_planner_tool = MealPlannerTool
-workout_recommender_tool = WorkoutRecommenderTool
-checkin_scheduler_tool = CheckinSchedulerTool
-progress_tracker_tool = ProgressTrackerTool
+async def chat(conversation, user_context):
+    """
+    Interactive chat loop: replies are streamed to the terminal as they are generated.
+    Conversation memory is kept under the 'cli' user, like any API user's history.
+    """
+    while True:
+        # input() blocks, so read it off the event loop
+        user_input = await asyncio.to_thread(input, "You: ")
+        if user_input.lower() == 'quit':
+            break
 
-# Instantiate specialized agents
-escalation_agent = EscalationAgent()
-nutrition_expert_agent = NutritionExpertAgent()
-injury_support_agent = InjurySupportAgent()
+        # Tool calls and handoffs to the specialist agents happen inside the run
+        print("Assistant: ", end="", flush=True)
+        async for delta in conversation.stream_chat("cli", user_input, context=user_context):
+            print(delta, end="", flush=True)
+        print()
 
 def main():
     print("Welcome to the Health & Wellness Planner Agent!")
     print("Type 'quit' to exit.")
 
-    user_context = UserSessionContext(name="Test User", uid=456)
+    # The CLI chats as the 'cli' user, so its uid is allocated like any API user's.
+    user_context = UserSessionContext(name="Test User", uid=get_user_id_registry().uid_for("cli"))
 
-    main_agent_instance = HealthWellnessAgent()
-    
-    # Assign the instantiated tools and handoff agents directly to the main_agent_instance
-    main_agent_instance.tools = [
-        goal_analyzer_tool,
-        meal_planner_tool,
-        workout_recommender_tool,
-        checkin_scheduler_tool,
-        progress_tracker_tool,
-    ]
-    main_agent_instance.handoff_to_agents = [
-        escalation_agent,
-        nutrition_expert_agent,
-        injury_support_agent,
-    ]
-    
-    # Initialize the main agent with the user context if needed
-    # This might need to be called within the run loop or passed through the runner
-    # main_agent_instance.init_session_context(user_context)
+    # Same conversation service (and agent instance, with tools and handoffs) that api.py's
+    # /chat/stream endpoint uses; model calls go through Runner.run_streamed.
+    asyncio.run(chat(get_conversation_service(), user_context))
 
-    # In a full implementation, you'd manage threads or sessions for each user
-    # For this CLI example, we'll simulate a single continuous conversation
+def refresh_meal_plans_command(user_ids, batch_size):
+    """
+    Regenerates stored meal plans for the given users (or every stored user) in vectorized batches.
+    """
+    from services.session_store import create_session_store
+    from services.meal_batch import refresh_meal_plans
 
-    while True:
-        user_input = input("You: ")
-        if user_input.lower() == 'quit':
-            break
-
-        # Assuming run_sync handles the agent's internal logic, including tool calls and handoffs
-        result = Runner.run_sync(main_agent_instance, user_input, run_config=config, context=user_context) # Pass user_context to the run
-        print(f"Assistant: {result.final_output}")
-        
-        # Handoffs are typically handled by the framework and result in a change of the active agent
-        # or a specific output. The current `openai_agents` library doesn't expose a direct
-        # mechanism for external `main` loop to check for handoff explicitly on return of `run_sync`.
-        # This part might need custom logic within the `on_message` or `_run` of the agent.
+    session_store = create_session_store()
+    updated, missing = refresh_meal_plans(session_store, user_ids or session_store.user_ids(), batch_size=batch_size)
+    print(f"Meal plans regenerated for {updated} users.")
+    if missing:
+        print(f"No session found for: {', '.join(missing)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Health & Wellness Planner Agent")
+    subparsers = parser.add_subparsers(dest="command")
+    refresh_parser = subparsers.add_parser("refresh-meal-plans", help="Regenerate meal plans for stored users in bulk.")
+    refresh_parser.add_argument("user_ids", nargs="*", help="Users to refresh (default: every stored user).")
+    refresh_parser.add_argument("--batch-size", type=int, default=1000, help="Users planned per vectorized batch.")
+    args = parser.parse_args()
+
+    if args.command == "refresh-meal-plans":
+        refresh_meal_plans_command(args.user_ids, args.batch_size)
+    else:
+        main()
\ No newline at end of file
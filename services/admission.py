@@ -0,0 +1,290 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import config
+from services.db import connect
+from services.metrics import ADMISSION_REJECTED
+
+# Admission control in front of every route (AdmissionMiddleware, installed in api.py):
+#   * per-client token buckets keyed on the client address (the peer, or X-Forwarded-For when
+#     uvicorn runs with --proxy-headers), which a client cannot change per request,
+#   * per-user token buckets keyed on the request's user_id (path parameter or JSON body field).
+#     The user_id is chosen by the client and not authenticated, so this bucket only keeps one
+#     user's traffic from starving others; the client bucket is what bounds an abusive caller,
+#   * one global token bucket for the process (memory backend) or for every worker (SQLite backend),
+#   * load shedding: once `max_model_requests` model-calling requests are in flight, new ones
+#     get 503 right away instead of queueing behind the model limiters.
+# Rejections are 429 (rate limits) or 503 (overload), both with Retry-After. Model-calling routes
+# take `model_route_cost` tokens, other routes one. Requests without a user_id skip the user
+# bucket, and monitoring routes are never limited. Stores that do I/O (SQLite) are called off
+# the event loop.
+
+# Routes that run the agent (and so spend the model budget).
+MODEL_ROUTES = frozenset({"/chat", "/chat/stream"})
+# Monitoring and docs, always admitted.
+EXEMPT_PREFIXES = ("/metrics", "/debug/", "/docs", "/redoc", "/openapi.json")
+
+GLOBAL_KEY = "*"
+
+class RateLimitStore:
+    """
+    Token buckets by key. take() debits `cost` tokens and returns 0, or returns the seconds until
+    the bucket will hold `cost` tokens (nothing is debited then). `blocking` stores do I/O in
+    take(), so the middleware runs it in a worker thread.
+    """
+
+    blocking = False
+
+    def take(self, key: str, rate: float, capacity: float, cost: float) -> float:
+        raise NotImplementedError
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    Buckets for this process, split into shards with their own lock and LRU bound, so
+    concurrent requests for different users rarely contend on one lock.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self._shards: List[Tuple[threading.Lock, "OrderedDict[str, List[float]]"]] = [
+            (threading.Lock(), OrderedDict()) for _ in range(max(shards, 1))
+        ]
+        self._max_keys_per_shard = max(max_keys // len(self._shards), 1)
+
+    def take(self, key: str, rate: float, capacity: float, cost: float) -> float:
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [capacity, now] # [tokens, updated]
+                if len(buckets) > self._max_keys_per_shard:
+                    buckets.popitem(last=False) # Least recently seen; it would have refilled anyway
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Buckets in the local SQLite database, shared by every worker process on the host.
+    Each take() is one atomic upsert, so workers never double-spend a bucket. A take() costs
+    tens of microseconds (more under write contention), so the middleware runs it in a thread.
+    """
+
+    blocking = True # Waits on the database (busy_timeout when another worker holds the write lock)
+
+    def __init__(self, path: Optional[str] = None):
+        self._conn = connect(path)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def take(self, key: str, rate: float, capacity: float, cost: float) -> float:
+        now = time.time() # Wall clock: shared across processes
+        refilled = "min(:capacity, tokens + (:now - updated) * :rate)"
+        with self._lock:
+            row = self._conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated) VALUES (:key, :capacity - :cost, :now)"
+                f" ON CONFLICT (key) DO UPDATE SET tokens = {refilled} - :cost, updated = :now"
+                f" WHERE {refilled} >= :cost RETURNING tokens",
+                {"key": key, "capacity": capacity, "cost": cost, "now": now, "rate": rate},
+            ).fetchone()
+            if row is not None:
+                return 0.0
+            tokens, updated = self._conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,),
+            ).fetchone()
+        return (cost - min(capacity, tokens + (now - updated) * rate)) / rate
+
+class AdmissionController:
+    """
+    Decides whether a request may run. Limits are plain attributes and can be changed at runtime.
+    """
+
+    def __init__(
+        self,
+        store: RateLimitStore,
+        client_rate: float = 20.0,
+        client_burst: float = 100.0,
+        user_rate: float = 5.0,
+        user_burst: float = 20.0,
+        global_rate: float = 1000.0,
+        global_burst: float = 2000.0,
+        model_route_cost: float = 5.0,
+        max_model_requests: int = 128,
+        shed_retry_after: float = 2.0,
+    ):
+        self.store = store
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.model_route_cost = model_route_cost
+        self.max_model_requests = max_model_requests
+        self.shed_retry_after = shed_retry_after
+        self.model_requests = 0 # Model-route requests admitted and still running
+
+    def admit(self, path: str, user_id: Optional[str], client: Optional[str] = None) -> Optional[Tuple[int, str, float]]:
+        """
+        Returns None to admit the request, or (status, reason, retry_after_seconds) to reject it.
+        """
+        model_route = path in MODEL_ROUTES
+        if model_route and self.model_requests >= self.max_model_requests:
+            return 503, "overloaded", self.shed_retry_after
+        cost = self.model_route_cost if model_route else 1.0
+        if client is not None:
+            wait = self.store.take(f"client:{client}", self.client_rate, max(self.client_burst, cost), cost)
+            if wait:
+                return 429, "client_rate", wait
+        if user_id is not None:
+            wait = self.store.take(f"user:{user_id}", self.user_rate, max(self.user_burst, cost), cost)
+            if wait:
+                return 429, "user_rate", wait
+        wait = self.store.take(GLOBAL_KEY, self.global_rate, max(self.global_burst, cost), cost)
+        if wait:
+            return 429, "global_rate", wait
+        return None
+
+def _user_id_from_body(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    user_id = data.get("user_id") if isinstance(data, dict) else None
+    return user_id if isinstance(user_id, str) else None
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController before the request reaches its route.
+    The client is the ASGI scope's client host. The user_id comes from a `{user_id}` path
+    parameter or, for small JSON bodies, the body's `user_id` field; a body read here is
+    replayed to the app unchanged.
+    """
+
+    def __init__(self, app, controller: "AdmissionController", max_body_bytes: int = 65536):
+        self.app = app
+        self.controller = controller
+        self.max_body_bytes = max_body_bytes
+        self._user_routes = None # Routes with a {user_id} path parameter, found on first use
+
+    def _user_id_from_path(self, scope) -> Optional[str]:
+        if self._user_routes is None:
+            self._user_routes = [route for route in scope["app"].router.routes if "{user_id}" in getattr(route, "path", "")]
+        for route in self._user_routes:
+            match = route.path_regex.match(scope["path"])
+            if match:
+                return match.group("user_id")
+        return None
+
+    async def _read_body(self, scope, receive) -> Optional[bytes]:
+        if scope["method"] not in ("POST", "PUT", "PATCH"):
+            return None
+        headers: Dict[bytes, bytes] = dict(scope["headers"])
+        if b"json" not in headers.get(b"content-type", b""):
+            return None
+        length = headers.get(b"content-length")
+        if length is None or not length.isdigit() or int(length) > self.max_body_bytes:
+            return None # Chunked or large (e.g. bulk uploads): left for the route to read
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return None # Client went away
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = self._user_id_from_path(scope)
+        body = None
+        if user_id is None:
+            body = await self._read_body(scope, receive)
+            if body is not None:
+                user_id = _user_id_from_body(body)
+        if body is not None:
+            replayed = False
+            upstream_receive = receive
+
+            async def receive():
+                nonlocal replayed
+                if replayed:
+                    return await upstream_receive() # Disconnect notifications
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+        client = scope["client"][0] if scope.get("client") else None
+        if self.controller.store.blocking:
+            rejection = await asyncio.to_thread(self.controller.admit, scope["path"], user_id, client)
+        else:
+            rejection = self.controller.admit(scope["path"], user_id, client)
+        if rejection is not None:
+            status, reason, retry_after = rejection
+            ADMISSION_REJECTED.inc(reason)
+            await _reject(send, status, reason, retry_after)
+            return
+
+        if scope["path"] not in MODEL_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        self.controller.model_requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.model_requests -= 1
+
+async def _reject(send, status: int, reason: str, retry_after: float) -> None:
+    detail = "Too many requests, retry later." if status == 429 else "Server is overloaded, retry later."
+    body = json.dumps({"detail": detail, "reason": reason}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+def create_rate_limit_store() -> RateLimitStore:
+    """
+    Builds the rate-limit store configured in config.py (ADMISSION_BACKEND).
+    """
+    if config.ADMISSION_BACKEND == "sqlite":
+        return SQLiteRateLimitStore(config.DATABASE_PATH)
+    return InMemoryRateLimitStore(shards=config.ADMISSION_SHARDS)
+
+@lru_cache(maxsize=1)
+def get_admission_controller() -> AdmissionController:
+    """
+    Process-wide admission controller with the ADMISSION_* settings.
+    """
+    return AdmissionController(
+        create_rate_limit_store(),
+        client_rate=config.ADMISSION_CLIENT_RATE,
+        client_burst=config.ADMISSION_CLIENT_BURST,
+        user_rate=config.ADMISSION_USER_RATE,
+        user_burst=config.ADMISSION_USER_BURST,
+        global_rate=config.ADMISSION_GLOBAL_RATE,
+        global_burst=config.ADMISSION_GLOBAL_BURST,
+        model_route_cost=config.ADMISSION_MODEL_ROUTE_COST,
+        max_model_requests=config.ADMISSION_MAX_MODEL_REQUESTS,
+        shed_retry_after=config.ADMISSION_SHED_RETRY_AFTER_SECONDS,
+    )
@@ -0,0 +1,244 @@
+import asyncio
+import codecs
+import csv
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import config
+from services.metric_series import MetricStore, canonical_metric, convert_unit, resolve_unit
+from services.progress_store import ProgressStore
+
+# Bulk ingestion of wearable/progress exports (POST /bulk_track_progress/{user_id}).
+# The request body is read chunk by chunk and split into lines as it arrives, so the raw
+# upload is never held in memory; only validated rows (a timestamp, a short entry and an
+# optional metric point) are kept. CSV is parsed with csv.reader over the decoded stream, so
+# quoted fields may span lines. Rows are validated a batch at a time and all accepted rows are
+# written at the end in one transaction: progress entries and numeric readings commit together
+# (both stores live in config.DATABASE_PATH; the write goes through the MetricStore connection).
+#
+# Accepted row fields (NDJSON objects or CSV columns with a header line):
+#   timestamp  ISO 8601 string or Unix epoch seconds (required)
+#   metric     e.g. "weight", "steps", "heart rate" (optional)
+#   value      number (required when metric is given)
+#   unit       e.g. "kg", "lb", "km" (optional, converted to the canonical unit)
+#   entry      free-text log entry (optional; generated from the metric when missing)
+
+FORMATS = ("ndjson", "csv")
+MAX_ERROR_SAMPLES = 20 # Rejected rows described in the response; the rest are only counted
+MAX_ENTRY_LENGTH = 2000
+MAX_CSV_RECORD_LINES = 100 # A quoted CSV field left open longer than this is a broken upload, not a long entry
+
+class BulkIngestError(ValueError):
+    """
+    The upload as a whole cannot be ingested (unknown format, missing CSV header, too many rows).
+    """
+
+@dataclass(slots=True)
+class BulkIngestResult:
+    rows_received: int = 0
+    rows_ingested: int = 0
+    rows_rejected: int = 0
+    metrics_recorded: int = 0
+    total_entries: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def reject(self, row_number: int, reason: str):
+        self.rows_rejected += 1
+        if len(self.errors) < MAX_ERROR_SAMPLES:
+            self.errors.append(f"row {row_number}: {reason}")
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines", "application/json"):
+        return "ndjson"
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    return None
+
+async def iter_lines(chunks: AsyncIterator[bytes], keep_ends: bool = False) -> AsyncIterator[str]:
+    """
+    Lines from a byte stream, decoded as UTF-8 across chunk boundaries. By default lines are
+    stripped and blank ones skipped; keep_ends yields every line as is (for csv.reader).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            if keep_ends:
+                yield line + "\n"
+            elif line.strip():
+                yield line.strip()
+    pending += decoder.decode(b"", final=True)
+    if keep_ends and pending:
+        yield pending
+    elif pending.strip():
+        yield pending.strip()
+
+def _parse_timestamp(raw) -> datetime:
+    if isinstance(raw, bool):
+        raise ValueError("timestamp must be an ISO 8601 string or epoch seconds")
+    if isinstance(raw, (int, float)):
+        return datetime.fromtimestamp(raw)
+    text = str(raw or "").strip()
+    if not text:
+        raise ValueError("timestamp is required")
+    try:
+        return datetime.fromtimestamp(float(text))
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        # Stored timestamps are naive local time, like the rest of the progress log.
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def validate_batch(
+    rows: List[Tuple[int, Dict]],
+    result: BulkIngestResult,
+    entries: List[Tuple[datetime, str]],
+    points: List[Tuple[str, datetime, float, str]],
+    units: Optional[Dict[str, str]] = None,
+):
+    """
+    Validates one batch of (row number, raw fields) and appends the accepted rows to `entries`
+    and `points`. Rejected rows are counted in `result`. `units` (canonical metric -> unit, from
+    MetricStore.units) rejects readings in another unit than their series; accepted rows add
+    their metric's unit to it. Unit errors are UnitMismatchError, a ValueError.
+    """
+    for row_number, row in rows:
+        try:
+            timestamp = _parse_timestamp(row.get("timestamp"))
+            metric = str(row.get("metric") or "").strip()
+            entry = str(row.get("entry") or "").strip()
+            point = None
+            if metric:
+                raw_value = row.get("value")
+                if raw_value is None or raw_value == "" or isinstance(raw_value, bool):
+                    raise ValueError("value is required when metric is given")
+                value = float(raw_value)
+                if not math.isfinite(value):
+                    raise ValueError("value must be a finite number")
+                converted = convert_unit(value, row.get("unit"))
+                if converted is None:
+                    raise ValueError(f"unknown unit {row.get('unit')!r}")
+                unit = converted[1]
+                if units is not None:
+                    canonical = canonical_metric(metric)
+                    unit = units[canonical] = resolve_unit(canonical, unit, units.get(canonical))
+                point = (metric, timestamp, converted[0], unit)
+                entry = entry or f"{metric}: {converted[0]:g} {unit}".rstrip()
+            elif not entry:
+                raise ValueError("row needs a metric and value, or an entry")
+            if len(entry) > MAX_ENTRY_LENGTH:
+                raise ValueError(f"entry is longer than {MAX_ENTRY_LENGTH} characters")
+        except (TypeError, ValueError, OverflowError, OSError) as e: # OverflowError/OSError: epoch out of range
+            result.reject(row_number, str(e))
+            continue
+        entries.append((timestamp, entry))
+        if point:
+            points.append(point)
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[List[str]]:
+    # Lines are gathered until their quotes balance, so a quoted field spanning lines is parsed
+    # by csv.reader as one record (escaped quotes are doubled and keep the count even).
+    pending: List[str] = []
+    quotes = 0
+    async for line in lines:
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            if len(pending) > MAX_CSV_RECORD_LINES:
+                raise BulkIngestError(f"CSV has a quoted field left open for more than {MAX_CSV_RECORD_LINES} lines.")
+            continue
+        record = next(csv.reader(pending), None)
+        pending.clear()
+        quotes = 0
+        if record and any(value.strip() for value in record):
+            yield record
+    if pending: # Unterminated quote at the end of the upload
+        record = next(csv.reader(pending), None)
+        if record:
+            yield record
+
+async def _iter_rows(chunks: AsyncIterator[bytes], fmt: str, result: BulkIngestResult) -> AsyncIterator[Tuple[int, Dict]]:
+    if fmt == "ndjson":
+        row_number = 0
+        async for line in iter_lines(chunks):
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                result.reject(row_number, f"invalid JSON ({e.msg})")
+                continue
+            if not isinstance(row, dict):
+                result.reject(row_number, "expected a JSON object")
+                continue
+            yield row_number, row
+        return
+
+    header = None
+    row_number = 0
+    async for values in _iter_csv_records(iter_lines(chunks, keep_ends=True)):
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            if "timestamp" not in header:
+                raise BulkIngestError("CSV header line must include a 'timestamp' column.")
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            result.reject(row_number, f"expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row_number, dict(zip(header, values))
+
+async def ingest(
+    user_id: str,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    progress_store: ProgressStore,
+    metric_store: MetricStore,
+    max_rows: int = config.BULK_INGEST_MAX_ROWS,
+    batch_size: int = config.BULK_INGEST_BATCH_SIZE,
+) -> BulkIngestResult:
+    """
+    Parses, validates and stores one upload. Nothing is written unless the whole body was read
+    without a BulkIngestError; rejected rows are skipped and reported in the result.
+    """
+    if fmt not in FORMATS:
+        raise BulkIngestError(f"Unsupported format {fmt!r}; use one of {', '.join(FORMATS)}.")
+    result = BulkIngestResult()
+    entries: List[Tuple[datetime, str]] = []
+    points: List[Tuple[str, datetime, float, str]] = []
+    units = metric_store.units(user_id)
+    batch: List[Tuple[int, Dict]] = []
+    async for row_number, row in _iter_rows(chunks, fmt, result):
+        batch.append((row_number, row))
+        if len(batch) >= batch_size:
+            validate_batch(batch, result, entries, points, units)
+            batch.clear()
+        if row_number > max_rows:
+            raise BulkIngestError(f"Upload has more than {max_rows} rows; split it into smaller files.")
+    validate_batch(batch, result, entries, points, units)
+    result.rows_received = result.rows_ingested = len(entries)
+    result.rows_received += result.rows_rejected
+
+    # The writes run off the event loop; a large upload takes long enough to stall other requests.
+    if not entries:
+        result.total_entries = progress_store.count(user_id)
+        return result
+    entries.sort(key=lambda item: item[0]) # Keep the log in time order within the upload
+    if not points:
+        _, result.total_entries = await asyncio.to_thread(progress_store.append_many, user_id, entries)
+        return result
+
+    def append_entries(conn):
+        # Runs inside the metric points' transaction, so entries and points commit together.
+        result.total_entries = ProgressStore.insert_many(conn, user_id, entries)
+
+    result.metrics_recorded = await asyncio.to_thread(metric_store.record_many, user_id, points, append_entries)
+    return result
@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import config
+from services.db import connect
+
+# Rough token estimate (about 4 characters per token for English text, plus a few tokens of
+# per-message overhead). Good enough to keep prompts under a budget without a tokenizer.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+class ChatHistoryStore:
+    """
+    Bounded per-user conversation history, stored in SQLite.
+    Only the newest `max_messages` messages are kept per user, and window() returns the newest
+    messages that fit a token budget, so prompt size stays flat however long a conversation gets.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_messages: int = 50, conn: Optional[sqlite3.Connection] = None):
+        self.max_messages = max_messages
+        self._conn = conn or connect(path)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " tokens INTEGER NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_user_id ON chat_messages (user_id, id)")
+
+    def append_turn(self, user_id: str, user_message: str, assistant_reply: str) -> None:
+        """
+        Records one user message and the reply to it, then drops the user's oldest messages
+        beyond `max_messages`.
+        """
+        now = time.time()
+        rows = [
+            (user_id, "user", user_message, estimate_tokens(user_message), now),
+            (user_id, "assistant", assistant_reply, estimate_tokens(assistant_reply), now),
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO chat_messages (user_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)", rows,
+                )
+                self._conn.execute(
+                    "DELETE FROM chat_messages WHERE user_id = ? AND id <= ("
+                    " SELECT id FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (user_id, user_id, self.max_messages),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def window(self, user_id: str, token_budget: int) -> List[Dict[str, str]]:
+        """
+        Returns the newest messages whose estimated tokens fit in `token_budget`, oldest first,
+        as model input items ({'role', 'content'}). The window always starts with a user message.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, tokens FROM chat_messages WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, self.max_messages),
+            ).fetchall()
+        messages: List[Dict[str, str]] = []
+        used = 0
+        for role, content, tokens in rows:
+            if used + tokens > token_budget:
+                break
+            used += tokens
+            messages.append({"role": role, "content": content})
+        messages.reverse()
+        while messages and messages[0]["role"] != "user":
+            messages.pop(0) # Never start mid-turn with a dangling assistant reply
+        return messages
+
+    def clear(self, user_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))
+
+def create_chat_history_store() -> ChatHistoryStore:
+    """
+    Builds the chat history store on the database configured in config.py.
+    """
+    return ChatHistoryStore(config.DATABASE_PATH, max_messages=config.CHAT_HISTORY_MAX_MESSAGES)
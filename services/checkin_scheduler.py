@@ -0,0 +1,345 @@
+import asyncio
+import heapq
+import itertools
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import config
+from services.db import connect
+
+# In-process scheduler for recurring weekly check-ins.
+# Every user's next fire time sits in a min-heap (O(log n) insert, O(1) peek), the schedule is
+# persisted in SQLite, and an asyncio task fires due reminders into a pluggable Notifier.
+# Reminders that came due while the process was down are fired once, in the background after startup.
+# The next occurrence is computed on the local calendar (weekday at hour:minute), so reminders
+# keep their wall-clock time across daylight saving changes. Each tick also picks up due rows
+# from the database, so schedules created by other workers are fired too.
+
+WEEKDAYS: Tuple[str, ...] = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+NOTIFY_RETRY_SECONDS = 60.0 # A reminder whose notifier call failed is retried after this long
+
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?\s*$", re.IGNORECASE)
+
+def parse_weekday(day: str) -> Optional[int]:
+    day = (day or "").strip().capitalize()
+    for index, name in enumerate(WEEKDAYS):
+        if day == name or (len(day) >= 3 and name.startswith(day)):
+            return index
+    return None
+
+def parse_time_of_day(text: str) -> Optional[Tuple[int, int]]:
+    """
+    Parses '9', '09:30', '9 AM' or '9:30 p.m.' into (hour, minute) on a 24-hour clock.
+    """
+    match = TIME_PATTERN.match(text or "")
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").lower().replace(".", "")
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+def next_occurrence(weekday: int, hour: int, minute: int, after: Optional[datetime] = None) -> datetime:
+    """
+    First datetime strictly after `after` that falls on `weekday` at hour:minute (local time).
+    """
+    after = after or datetime.now()
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    candidate += timedelta(days=(weekday - after.weekday()) % 7)
+    if candidate <= after:
+        candidate += timedelta(days=7)
+    return candidate
+
+@dataclass(slots=True)
+class ScheduledCheckin:
+    user_id: str
+    weekday: int
+    hour: int
+    minute: int
+    reminder_type: str
+    notes: str
+    next_fire_at: float # Epoch seconds
+
+    def as_dict(self) -> Dict[str, str]:
+        return {
+            "day": WEEKDAYS[self.weekday],
+            "time": f"{self.hour:02d}:{self.minute:02d}",
+            "reminder_type": self.reminder_type,
+            "notes": self.notes,
+            "next_checkin": datetime.fromtimestamp(self.next_fire_at).isoformat(timespec="minutes"),
+        }
+
+@dataclass(slots=True)
+class CheckinReminder:
+    user_id: str
+    reminder_type: str
+    notes: str
+    scheduled_for: float # Epoch seconds of the occurrence being reminded about
+    missed: bool # True when the occurrence passed while the scheduler was not running
+
+class Notifier(ABC):
+    """
+    Delivers check-in reminders. Swap in an email/SMS/push implementation in production.
+    """
+
+    @abstractmethod
+    async def notify(self, reminder: CheckinReminder) -> None:
+        ...
+
+class LogNotifier(Notifier):
+    """
+    Local stand-in notifier: prints each reminder and keeps the most recent ones in memory.
+    """
+
+    def __init__(self, history_size: int = 1000):
+        self.sent: "deque[CheckinReminder]" = deque(maxlen=history_size)
+
+    async def notify(self, reminder: CheckinReminder) -> None:
+        self.sent.append(reminder)
+        when = datetime.fromtimestamp(reminder.scheduled_for).isoformat(timespec="minutes")
+        print(f"Check-in reminder for user {reminder.user_id} via {reminder.reminder_type} ({when})"
+              + (" [missed while offline]" if reminder.missed else ""))
+
+class CheckinScheduler:
+    """
+    Heap-backed weekly check-in scheduler with SQLite persistence.
+    One recurring check-in per user; scheduling again replaces the previous one.
+    Superseded heap entries are skipped lazily when they reach the top.
+
+    With several workers sharing the database, each occurrence is claimed with a conditional
+    UPDATE before it is sent, so exactly one worker fires it.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        notifier: Optional[Notifier] = None,
+        tick_seconds: float = 1.0,
+        conn: Optional[sqlite3.Connection] = None,
+        retry_seconds: float = NOTIFY_RETRY_SECONDS,
+    ):
+        self.notifier = notifier or LogNotifier()
+        self.tick_seconds = tick_seconds
+        self.retry_seconds = retry_seconds
+        self._conn = conn or connect(path)
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int, str]] = []
+        self._entries: Dict[str, ScheduledCheckin] = {}
+        self._sequence = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkin_schedules ("
+            " user_id TEXT PRIMARY KEY,"
+            " weekday INTEGER NOT NULL,"
+            " hour INTEGER NOT NULL,"
+            " minute INTEGER NOT NULL,"
+            " reminder_type TEXT NOT NULL,"
+            " notes TEXT NOT NULL,"
+            " next_fire_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_checkin_next_fire ON checkin_schedules (next_fire_at)")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[ScheduledCheckin]:
+        return self._entries.get(user_id)
+
+    def schedule(
+        self,
+        user_id: str,
+        weekday: int,
+        hour: int,
+        minute: int,
+        reminder_type: str = "email",
+        notes: str = "",
+        first_fire_at: Optional[datetime] = None,
+    ) -> ScheduledCheckin:
+        """
+        Creates or replaces the user's weekly check-in and returns it.
+        `first_fire_at` overrides the first occurrence (e.g. a specific date); later ones follow weekly.
+        """
+        fire_at = first_fire_at if first_fire_at and first_fire_at > datetime.now() else next_occurrence(weekday, hour, minute)
+        entry = ScheduledCheckin(user_id, weekday, hour, minute, reminder_type or "email", notes or "", fire_at.timestamp())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO checkin_schedules (user_id, weekday, hour, minute, reminder_type, notes, next_fire_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET weekday = excluded.weekday, "
+                "hour = excluded.hour, minute = excluded.minute, reminder_type = excluded.reminder_type, "
+                "notes = excluded.notes, next_fire_at = excluded.next_fire_at",
+                (user_id, weekday, hour, minute, entry.reminder_type, entry.notes, entry.next_fire_at),
+            )
+            self._push(entry)
+        if self._wakeup is not None:
+            self._wakeup.set() # The new entry may be due before the loop's current sleep ends
+        return entry
+
+    def cancel(self, user_id: str) -> bool:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkin_schedules WHERE user_id = ?", (user_id,))
+            return self._entries.pop(user_id, None) is not None
+
+    def load(self) -> int:
+        """
+        Loads every persisted schedule into the heap; returns how many were loaded.
+        Entries already due are left due, so the next run_due() fires them as missed reminders.
+        """
+        rows = self._conn.execute(
+            "SELECT user_id, weekday, hour, minute, reminder_type, notes, next_fire_at FROM checkin_schedules"
+        ).fetchall()
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
+            for row in rows:
+                self._push(ScheduledCheckin(*row))
+        return len(rows)
+
+    async def run_due(self, now: Optional[float] = None) -> int:
+        """
+        Fires every reminder due at `now` and reschedules each for its next weekly occurrence.
+        A reminder whose notifier call fails is released and retried after `retry_seconds`.
+        Returns the number of reminders sent.
+        """
+        now = time.time() if now is None else now
+        fired = 0
+        self._sync_due(now)
+        while True:
+            with self._lock:
+                entry = self._pop_due(now)
+                if entry is None:
+                    break
+                scheduled_for = entry.next_fire_at
+                # The first occurrence after now on the local calendar: missed weeks are skipped
+                # (one reminder covers them) and DST changes keep the wall-clock time.
+                next_fire_at = next_occurrence(entry.weekday, entry.hour, entry.minute, datetime.fromtimestamp(now)).timestamp()
+                claimed = self._claim(entry, scheduled_for, next_fire_at)
+            if not claimed:
+                continue
+            try:
+                await self.notifier.notify(CheckinReminder(
+                    entry.user_id, entry.reminder_type, entry.notes, scheduled_for,
+                    missed=now - scheduled_for > max(self.tick_seconds * 2, 60),
+                ))
+            except Exception as e:
+                print(f"Check-in reminder for user {entry.user_id} failed, retrying in {self.retry_seconds:g}s: {e}")
+                with self._lock:
+                    self._claim(entry, next_fire_at, min(now + self.retry_seconds, next_fire_at))
+                continue
+            fired += 1
+        return fired
+
+    async def start(self) -> None:
+        """
+        Loads persisted schedules and starts the background loop, whose first tick fires anything
+        missed; startup does not wait for that catch-up.
+        """
+        if self._task is not None:
+            return
+        self.load()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_due()
+            except Exception as e:
+                print(f"Check-in scheduler tick failed: {e}")
+            # Sleep until the earliest entry is due, but never longer than one tick.
+            with self._lock:
+                delay = self._heap[0][0] - time.time() if self._heap else self.tick_seconds
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(max(delay, 0.0), self.tick_seconds))
+            except asyncio.TimeoutError:
+                pass
+
+    def _push(self, entry: ScheduledCheckin) -> None:
+        # Caller must hold self._lock.
+        self._entries[entry.user_id] = entry
+        heapq.heappush(self._heap, (entry.next_fire_at, next(self._sequence), entry.user_id))
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._compact()
+
+    def _claim(self, entry: ScheduledCheckin, expected: float, next_fire_at: float) -> bool:
+        # Caller must hold self._lock. Moves the entry from `expected` to `next_fire_at` if no other
+        # worker has fired or changed it since; otherwise picks up the stored version.
+        claimed = self._conn.execute(
+            "UPDATE checkin_schedules SET next_fire_at = ? WHERE user_id = ? AND next_fire_at = ?",
+            (next_fire_at, entry.user_id, expected),
+        ).rowcount == 1
+        if claimed:
+            entry.next_fire_at = next_fire_at
+            self._push(entry)
+        else:
+            self._reload(entry.user_id)
+        return claimed
+
+    def _sync_due(self, now: float) -> None:
+        # Adds due schedules this worker does not know about (created or changed by another worker).
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, weekday, hour, minute, reminder_type, notes, next_fire_at FROM checkin_schedules WHERE next_fire_at <= ?",
+                (now,),
+            ).fetchall()
+            for row in rows:
+                entry = self._entries.get(row[0])
+                if entry is None or entry != ScheduledCheckin(*row):
+                    self._push(ScheduledCheckin(*row))
+
+    def _pop_due(self, now: float) -> Optional[ScheduledCheckin]:
+        # Caller must hold self._lock. Returns the next live due entry, discarding stale heap items.
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, _, user_id = heapq.heappop(self._heap)
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.next_fire_at == fire_at:
+                return entry
+        return None
+
+    def _reload(self, user_id: str) -> None:
+        # Caller must hold self._lock.
+        row = self._conn.execute(
+            "SELECT user_id, weekday, hour, minute, reminder_type, notes, next_fire_at FROM checkin_schedules WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        if row is None:
+            self._entries.pop(user_id, None)
+        else:
+            self._push(ScheduledCheckin(*row))
+
+    def _compact(self) -> None:
+        # Drop superseded heap items once they outnumber live entries.
+        self._heap = [(entry.next_fire_at, next(self._sequence), user_id) for user_id, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+
+@lru_cache(maxsize=1)
+def get_checkin_scheduler() -> CheckinScheduler:
+    """
+    Process-wide scheduler on the database configured in config.py, using the local LogNotifier.
+    """
+    return CheckinScheduler(config.DATABASE_PATH, LogNotifier(), tick_seconds=config.CHECKIN_TICK_SECONDS)
@@ -0,0 +1,199 @@
+import copy
+import json
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from agents import Agent, FunctionTool
+from agents.run import CallModelData, ModelInputData
+
+from context import UserSessionContext
+from services.chat_history import estimate_tokens
+from services.intent_router import INTENTS, MIN_SCORE, keyword_scores
+from services.metric_series import MetricStore
+from services.metrics import PROMPT_TOKENS
+
+# Context compaction for agent runs, applied by ConversationService before every model call:
+#   * the session is sent as a short profile appended after the agent's (static) instructions:
+#     goal, plans on file and next check-in, numeric aggregates per tracked metric (latest value,
+#     rolling average, trend) instead of raw data points, and handoff counts instead of the log,
+#   * static text stays first (the same tools in a fixed order, then the instructions), so the
+#     prompt prefix is identical across users and turns and provider-side prompt caching can
+#     reuse it. The profile adds tokens to each call; it replaces tool calls the agent otherwise
+#     makes to learn about the user,
+#   * optionally (filter_tools) only the tools for the message's topic are sent, on a copy of the
+#     agent; the shared tool objects are never changed. This is off by default: it saves the
+#     schemas of the tools left out, but each topic then has its own prompt prefix to cache.
+# Estimated prompt tokens per model call go to /metrics: the baseline (the prompt as sent before
+# compaction: instructions, every tool schema and the input) and the prompt actually sent.
+
+# Tools the agent needs for each router intent.
+INTENT_TOOLS: Dict[str, FrozenSet[str]] = {
+    "schedule_checkin": frozenset({"CheckinSchedulerTool"}),
+    "log_progress": frozenset({"ProgressTrackerTool", "ProgressSummaryTool"}),
+    "meal_plan": frozenset({"MealPlannerTool", "GoalAnalyzerTool"}),
+    "workout_plan": frozenset({"WorkoutRecommenderTool", "GoalAnalyzerTool"}),
+}
+
+MAX_NOTE_CHARS = 200
+
+@dataclass(slots=True)
+class CompactionPlan:
+    tool_names: Optional[FrozenSet[str]] # None: every tool
+    summary: str # Session profile appended after the instructions
+
+# Plan for the run in the current task; set by prepare(), read before each model call.
+_plan: ContextVar[Optional[CompactionPlan]] = ContextVar("compaction_plan", default=None)
+
+def relevant_tools(message: str, min_confidence: float = 0.75) -> Optional[FrozenSet[str]]:
+    """
+    Tools for the message's topic, or None when no topic clearly wins. Question words are not
+    counted against the topic here: "what should I eat this week?" still only needs meal tools.
+    """
+    scores = keyword_scores(message)
+    best = max(INTENTS, key=scores.__getitem__)
+    total = sum(scores[intent] for intent in INTENTS)
+    if scores[best] < MIN_SCORE or scores[best] / total < min_confidence:
+        return None
+    return INTENT_TOOLS[best]
+
+def _value(value: Any) -> str:
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+def _metric_line(summary: Dict[str, Any]) -> str:
+    unit = f" {summary['unit']}" if summary["unit"] else ""
+    average = next((value for key, value in summary.items() if key.startswith("rolling_")), None)
+    parts = [f"{summary['metric']}: latest {_value(summary['latest']['value'])}{unit} on {summary['latest']['timestamp'][:10]}"]
+    if average is not None:
+        parts.append(f"7-day avg {_value(average)}")
+    if summary["trend_per_week"] is not None:
+        parts.append(f"trend {summary['trend_per_week'] + 0.0:+g}/week") # + 0.0: no "-0"
+    parts.append(f"range {_value(summary['min'])}-{_value(summary['max'])}")
+    parts.append(f"{summary['points']} entries since {summary['first']['timestamp'][:10]}")
+    progress = summary.get("goal_progress")
+    if progress:
+        parts.append(f"goal {progress['percent_complete']:g}% complete, {progress['remaining']:g}{unit} to go")
+    return ", ".join(parts) + "."
+
+def summarize_session(user_id: str, context: UserSessionContext, metric_store: MetricStore, max_metrics: int = 5) -> str:
+    """
+    Returns the compact session profile.
+    """
+    # No name or uid: replies are cached across users with the same profile (services/response_cache.py).
+    lines = ["User profile (summarized; use the tools for details)."]
+    goal = context.goal or {}
+    if goal:
+        details = goal.get("parsed_details") or {}
+        facts = [details.get("goal_type")]
+        if details.get("target_quantity"):
+            facts.append(f"target {_value(details['target_quantity'])} {details.get('target_unit') or ''}".strip())
+        if details.get("deadline"):
+            facts.append(f"by {details['deadline']}")
+        facts = [fact for fact in facts if fact]
+        description = goal.get("original_description") or goal.get("description") or "set"
+        lines.append(f"Goal: {description}" + (f" ({', '.join(facts)})." if facts else "."))
+    if context.diet_preferences:
+        lines.append(f"Diet: {context.diet_preferences}.")
+    if context.injury_notes:
+        lines.append(f"Injury notes: {context.injury_notes[:MAX_NOTE_CHARS]}")
+    plan = (context.workout_plan or {}).get("recommended_plan")
+    if plan:
+        lines.append(f"Workout plan on file: {plan.get('frequency')}, {plan.get('duration_per_session')} per session.")
+    if context.meal_plan:
+        lines.append(f"Meal plan on file: {len(context.meal_plan)} days.")
+    if context.scheduled_checkins:
+        checkin = context.scheduled_checkins[-1]
+        lines.append(f"Weekly check-in: {checkin.get('day')} {checkin.get('time')}, next {checkin.get('next_checkin')}.")
+
+    for metric in metric_store.metrics(user_id)[:max_metrics]:
+        summary = metric_store.summary(user_id, metric, goal=context.goal)
+        if summary is not None:
+            lines.append(_metric_line(summary))
+    if context.progress_logs:
+        latest = context.progress_logs[-1].get("timestamp", "")[:10]
+        lines.append(f"{len(context.progress_logs)} older progress notes" + (f", latest {latest}." if latest else "."))
+    if context.handoff_logs:
+        # Log lines are "timestamp | handoff_type | source | reason".
+        counts = Counter(entry.split(" | ")[1] for entry in context.handoff_logs if entry.count(" | ") >= 2)
+        latest = context.handoff_logs[-1].split(" | ")[0][:10]
+        lines.append("Handoffs: " + ", ".join(f"{name} x{count}" for name, count in counts.most_common()) + f" (latest {latest}).")
+    return "\n".join(lines)
+
+def _item_tokens(item: Any) -> int:
+    if isinstance(item, dict):
+        return estimate_tokens(json.dumps(item, default=str))
+    dump = getattr(item, "model_dump_json", None)
+    return estimate_tokens(dump() if dump is not None else str(item))
+
+def _tool_tokens(tool: FunctionTool) -> int:
+    return estimate_tokens(tool.name + tool.description + json.dumps(tool.params_json_schema))
+
+class ContextCompactor:
+    """
+    Per-run compaction: prepare() builds the session profile (and, with filter_tools, picks the
+    tools) for a message, filter() (RunConfig.call_model_input_filter) applies it before each
+    model call. Counters `calls`, `baseline_tokens` and `sent_tokens` total the estimated prompt sizes.
+    """
+
+    def __init__(self, metric_store: MetricStore, filter_tools: bool = False, min_confidence: float = 0.75, max_metrics: int = 5):
+        self.metric_store = metric_store
+        self.filter_tools = filter_tools
+        self.min_confidence = min_confidence
+        self.max_metrics = max_metrics
+        self.calls = 0
+        self.baseline_tokens = 0
+        self.sent_tokens = 0
+        self._tool_tokens: Dict[str, int] = {}
+        self._topic_agents: Dict[Tuple[int, FrozenSet[str]], Agent] = {}
+        self._all_tool_tokens: Dict[str, int] = {} # Agent name -> schema tokens of all its tools, for agents with topic copies
+
+    def agent_for(self, agent: Agent, plan: CompactionPlan) -> Agent:
+        """
+        The agent to run for the plan: `agent` itself, or a copy with only the plan's function
+        tools (handoffs and the shared tool objects are left as they are).
+        """
+        if plan.tool_names is None:
+            return agent
+        key = (id(agent), plan.tool_names)
+        topic_agent = self._topic_agents.get(key)
+        if topic_agent is None:
+            self._all_tool_tokens[agent.name] = self._tools_tokens(agent.tools)
+            topic_agent = self._topic_agents[key] = copy.copy(agent) # Agent.clone() needs the base __init__
+            topic_agent.tools = [tool for tool in agent.tools if not isinstance(tool, FunctionTool) or tool.name in plan.tool_names]
+        return topic_agent
+
+    def prepare(self, user_id: str, message: str, context: Optional[UserSessionContext]) -> CompactionPlan:
+        """
+        Plans compaction for the run about to start in the current task.
+        """
+        summary = summarize_session(user_id, context, self.metric_store, self.max_metrics) if context is not None else ""
+        plan = CompactionPlan(relevant_tools(message, self.min_confidence) if self.filter_tools else None, summary)
+        _plan.set(plan)
+        return plan
+
+    def _tools_tokens(self, tools) -> int:
+        total = 0
+        for tool in tools:
+            if isinstance(tool, FunctionTool):
+                if tool.name not in self._tool_tokens:
+                    self._tool_tokens[tool.name] = _tool_tokens(tool)
+                total += self._tool_tokens[tool.name]
+        return total
+
+    def filter(self, data: CallModelData) -> ModelInputData:
+        plan = _plan.get()
+        instructions = data.model_data.instructions or ""
+        tool_tokens = self._tools_tokens(data.agent.tools)
+        input_tokens = sum(_item_tokens(item) for item in data.model_data.input)
+        # Baseline: the prompt before compaction, with every tool of the agent and no profile.
+        baseline = estimate_tokens(instructions) + self._all_tool_tokens.get(data.agent.name, tool_tokens) + input_tokens
+        if plan is not None and plan.summary:
+            instructions = f"{instructions}\n\n{plan.summary}" # After the static text, so the prefix stays shared
+        sent = estimate_tokens(instructions) + tool_tokens + input_tokens
+        self.calls += 1
+        self.baseline_tokens += baseline
+        self.sent_tokens += sent
+        PROMPT_TOKENS.observe(baseline, "baseline")
+        PROMPT_TOKENS.observe(sent, "sent")
+        return ModelInputData(input=data.model_data.input, instructions=instructions)
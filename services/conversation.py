@@ -0,0 +1,195 @@
+import asyncio
+import dataclasses
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, List, Optional, Union
+
+from agents import Agent, RunConfig, Runner
+from openai.types.responses import ResponseTextDeltaEvent
+
+import config
+from context import UserSessionContext
+from services.chat_history import ChatHistoryStore, estimate_tokens
+from services.context_compaction import ContextCompactor
+from services.handoff_classifier import HandoffClassifier, record_handoff
+from services.instrumentation import time_handoffs
+from services.intent_router import IntentRouter
+from services.response_cache import set_session_fingerprint
+
+# Async conversation service shared by main.py (CLI chat) and api.py (/chat/stream).
+# Every model call goes through Runner.run / Runner.run_streamed on the event loop, so one
+# process can hold many conversations at once; a semaphore caps how many runs are talking
+# to the model concurrently, and callers beyond that wait for a free slot.
+# chat() / stream_chat() add per-user memory: the newest history that fits a token budget is
+# sent with each message, and the finished turn is appended to the history afterwards.
+# With a router, obvious requests ("log weight 72kg") are answered by calling the tool directly,
+# without a model call. With a handoff classifier, messages that clearly belong to a specialist
+# (injuries, medical diets, "talk to a human") start on that specialist agent instead.
+# With a compactor, each model call gets a compact session profile after the static instructions
+# (and, if it filters tools, only the tools for the message's topic).
+
+RunInput = Union[str, List[Any]]
+
+class ConversationService:
+    """
+    Runs agent turns for a shared agent, either to completion or as a stream of text deltas.
+    At most `max_concurrent_calls` runs are in flight at a time.
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        run_config: Optional[Callable[[], RunConfig]] = None,
+        max_concurrent_calls: int = 64,
+        max_turns: int = 10,
+        history: Optional[ChatHistoryStore] = None,
+        history_token_budget: int = 2000,
+        router: Optional[IntentRouter] = None,
+        handoff_classifier: Optional[HandoffClassifier] = None,
+        compactor: Optional[ContextCompactor] = None,
+    ):
+        self.agent = agent
+        self.max_turns = max_turns
+        self.history = history
+        self.history_token_budget = history_token_budget
+        self.router = router
+        self.handoff_classifier = handoff_classifier
+        self.compactor = compactor
+        # Specialists the main agent can hand off to, by agent name
+        self.specialists = {specialist.name: specialist for specialist in getattr(agent, "handoff_to_agents", [])}
+        self._run_config = run_config or config.get_run_config
+        self._semaphore = asyncio.Semaphore(max_concurrent_calls)
+
+    def run_config(self) -> RunConfig:
+        run_config = self._run_config()
+        if self.compactor is None:
+            return run_config
+        return dataclasses.replace(run_config, call_model_input_filter=self.compactor.filter)
+
+    async def run(self, input: RunInput, context: Optional[UserSessionContext] = None, agent: Optional[Agent] = None) -> Any:
+        """
+        Runs one turn to completion (on `agent`, default the main agent) and returns the final output.
+        """
+        set_session_fingerprint(context) # Cached replies are only shared between equivalent sessions
+        async with self._semaphore:
+            result = await Runner.run(
+                agent or self.agent, input, context=context, max_turns=self.max_turns, run_config=self.run_config(),
+            )
+        return result.final_output
+
+    async def stream(self, input: RunInput, context: Optional[UserSessionContext] = None, agent: Optional[Agent] = None) -> AsyncIterator[str]:
+        """
+        Runs one turn and yields the assistant's text as it is generated.
+        The concurrency slot is held until the run finishes or the consumer stops iterating.
+        """
+        set_session_fingerprint(context)
+        async with self._semaphore:
+            result = Runner.run_streamed(
+                agent or self.agent, input, context=context, max_turns=self.max_turns, run_config=self.run_config(),
+            )
+            try:
+                async for event in result.stream_events():
+                    if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                        if event.data.delta:
+                            yield event.data.delta
+            finally:
+                if not result.is_complete:
+                    result.cancel() # Client went away; stop the underlying model call
+
+    def select_agent(self, message: str, context: Optional[UserSessionContext]) -> Agent:
+        """
+        The specialist the classifier is confident about (recording the handoff), else the main agent.
+        """
+        if self.handoff_classifier is None:
+            return self.agent
+        decision = self.handoff_classifier.classify(message)
+        specialist = self.specialists.get(decision.target.agent_name) if decision is not None else None
+        if specialist is None:
+            return self.agent
+        if context is not None:
+            record_handoff(context, decision.target.handoff_type, message, source="classifier")
+        return specialist
+
+    async def route(self, message: str, context: Optional[UserSessionContext]) -> Optional[str]:
+        """
+        The reply for a message the router handled with a direct tool call, or None.
+        """
+        if self.router is None or context is None:
+            return None
+        routed = await self.router.route(message, context)
+        return routed.reply if routed is not None else None
+
+    def build_input(self, user_id: str, message: str) -> RunInput:
+        """
+        The user's recent history (truncated to the token budget) followed by the new message.
+        """
+        if self.history is None:
+            return message
+        budget = self.history_token_budget - estimate_tokens(message)
+        return self.history.window(user_id, budget) + [{"role": "user", "content": message}]
+
+    async def chat(self, user_id: str, message: str, context: Optional[UserSessionContext] = None) -> str:
+        """
+        Runs one turn with the user's conversation memory and records it.
+        """
+        with time_handoffs():
+            agent = self.select_agent(message, context)
+            routed = await self.route(message, context) if agent is self.agent else None
+            if routed is None and self.compactor is not None:
+                plan = self.compactor.prepare(user_id, message, context)
+                if agent is self.agent:
+                    agent = self.compactor.agent_for(agent, plan)
+            reply = routed if routed is not None else str(await self.run(self.build_input(user_id, message), context, agent))
+        if self.history is not None:
+            self.history.append_turn(user_id, message, reply)
+        return reply
+
+    async def stream_chat(self, user_id: str, message: str, context: Optional[UserSessionContext] = None) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of chat(). The turn is recorded only if the stream completes.
+        """
+        reply: List[str] = []
+        with time_handoffs():
+            agent = self.select_agent(message, context)
+            routed = await self.route(message, context) if agent is self.agent else None
+            if routed is not None:
+                reply.append(routed)
+                yield routed
+            else:
+                if self.compactor is not None:
+                    plan = self.compactor.prepare(user_id, message, context)
+                    if agent is self.agent:
+                        agent = self.compactor.agent_for(agent, plan)
+                async for delta in self.stream(self.build_input(user_id, message), context, agent):
+                    reply.append(delta)
+                    yield delta
+        if self.history is not None:
+            self.history.append_turn(user_id, message, "".join(reply))
+
+@lru_cache(maxsize=1)
+def get_conversation_service() -> ConversationService:
+    """
+    Process-wide service around one HealthWellnessAgent (with its tools and handoffs),
+    limited to config.MAX_CONCURRENT_MODEL_CALLS concurrent runs, with chat history in SQLite
+    and (if enabled) the local handoff classifier and intent router in front of the agent and
+    context compaction for its model calls.
+    """
+    from agents01.main_agent import build_health_wellness_agent
+    from services.chat_history import create_chat_history_store
+    from services.metric_series import get_metric_store
+
+    agent = build_health_wellness_agent()
+    return ConversationService(
+        agent,
+        max_concurrent_calls=config.MAX_CONCURRENT_MODEL_CALLS,
+        max_turns=config.MAX_AGENT_TURNS,
+        history=create_chat_history_store(),
+        history_token_budget=config.CHAT_HISTORY_TOKEN_BUDGET,
+        router=IntentRouter(agent.tools, config.INTENT_ROUTER_MIN_CONFIDENCE) if config.INTENT_ROUTER_ENABLED else None,
+        handoff_classifier=HandoffClassifier(min_confidence=config.HANDOFF_CLASSIFIER_MIN_CONFIDENCE) if config.HANDOFF_CLASSIFIER_ENABLED else None,
+        compactor=ContextCompactor(
+            get_metric_store(),
+            filter_tools=config.CONTEXT_TOOL_FILTER_ENABLED,
+            min_confidence=config.CONTEXT_TOOL_MIN_CONFIDENCE,
+            max_metrics=config.CONTEXT_SUMMARY_MAX_METRICS,
+        ) if config.CONTEXT_COMPACTION_ENABLED else None,
+    )
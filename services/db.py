@@ -0,0 +1,15 @@
+import sqlite3
+from typing import Optional
+
+import config
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Opens a SQLite connection tuned for many readers and one writer at a time.
+    WAL mode lets uvicorn workers read while another worker writes to the same file.
+    """
+    conn = sqlite3.connect(path or config.DATABASE_PATH, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL") # Safe with WAL, avoids an fsync per commit
+    conn.execute("PRAGMA busy_timeout=5000") # Wait for other workers' write locks instead of failing
+    return conn
@@ -0,0 +1,295 @@
+import calendar
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+# Rule-based goal parsing for GoalAnalyzerTool and /set_goal.
+# Everything here is local and deterministic; the LLM is only consulted (see
+# analyze_goal_with_llm_fallback) when the rules cannot make sense of a description.
+
+KG_PER_LB = 0.45359237
+
+# Phrase -> goal type. Longer phrases are matched first so "gain weight" wins over "weight".
+GOAL_TYPE_VOCABULARY: Dict[str, str] = {
+    "lose weight": "weight_loss", "weight loss": "weight_loss", "lose": "weight_loss", "drop": "weight_loss",
+    "shed": "weight_loss", "slim down": "weight_loss", "burn fat": "weight_loss", "fat loss": "weight_loss",
+    "cut weight": "weight_loss", "cut fat": "weight_loss", "cutting": "weight_loss", "lean out": "weight_loss",
+    "gain weight": "weight_gain", "put on weight": "weight_gain", "weight gain": "weight_gain",
+    "gain": "weight_gain", "put on": "weight_gain",
+    "build muscle": "muscle_gain", "gain muscle": "muscle_gain", "muscle gain": "muscle_gain", "bulk": "muscle_gain",
+    "bulk up": "muscle_gain", "bulking": "muscle_gain", "put on muscle": "muscle_gain",
+    "muscle": "muscle_gain", "stronger": "muscle_gain", "strength": "muscle_gain", "tone": "muscle_gain",
+    "marathon": "endurance", "half marathon": "endurance", "run": "endurance", "running": "endurance",
+    "endurance": "endurance", "stamina": "endurance", "cardio": "endurance", "5k": "endurance", "10k": "endurance",
+    "flexibility": "flexibility", "flexible": "flexibility", "stretch": "flexibility", "stretching": "flexibility",
+    "mobility": "flexibility", "yoga": "flexibility",
+    "maintain": "maintenance", "maintenance": "maintenance", "stay at": "maintenance",
+    "get fit": "general_fitness", "fitness": "general_fitness", "fitter": "general_fitness",
+    "healthy": "general_fitness", "healthier": "general_fitness", "active": "general_fitness",
+}
+
+DIET_VOCABULARY: Dict[str, str] = {
+    "vegetarian": "vegetarian", "veggie": "vegetarian", "vegan": "vegan", "plant based": "vegan",
+    "plant-based": "vegan", "keto": "keto", "ketogenic": "keto", "paleo": "paleo",
+    "gluten free": "gluten-free", "gluten-free": "gluten-free", "dairy free": "dairy-free",
+    "dairy-free": "dairy-free", "lactose free": "dairy-free", "nut free": "nut-free", "nut-free": "nut-free",
+    "low carb": "low-carb", "low-carb": "low-carb", "high protein": "high-protein", "high-protein": "high-protein",
+    "mediterranean": "mediterranean", "halal": "halal", "kosher": "kosher", "pescatarian": "pescatarian",
+    "intermittent fasting": "intermittent-fasting", "diabetic": "diabetic", "sugar free": "low-sugar",
+    "low sugar": "low-sugar", "cut sugar": "low-sugar", "cut out sugar": "low-sugar", "cut down on sugar": "low-sugar",
+}
+
+WEIGHT_UNITS: Dict[str, Tuple[str, float]] = {
+    "kg": ("kg", 1.0), "kgs": ("kg", 1.0), "kilo": ("kg", 1.0), "kilos": ("kg", 1.0),
+    "kilogram": ("kg", 1.0), "kilograms": ("kg", 1.0),
+    "lb": ("lb", KG_PER_LB), "lbs": ("lb", KG_PER_LB), "pound": ("lb", KG_PER_LB), "pounds": ("lb", KG_PER_LB),
+}
+
+DISTANCE_UNITS: Dict[str, str] = {"km": "km", "k": "km", "kilometer": "km", "kilometers": "km",
+                                  "mile": "mi", "miles": "mi", "mi": "mi"}
+
+NUMBER_WORDS: Dict[str, int] = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+PERIOD_DAYS: Dict[str, int] = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+MONTHS: Dict[str, int] = {name.lower(): index for index, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): index for index, name in enumerate(calendar.month_abbr) if name})
+
+NAMED_DATES: Dict[str, Tuple[int, int]] = {
+    "christmas": (12, 25), "new year": (1, 1), "new years": (1, 1), "new year's": (1, 1),
+    "summer": (6, 21), "end of the year": (12, 31), "end of year": (12, 31),
+}
+
+RECOMMENDATIONS: Dict[str, List[str]] = {
+    "weight_loss": ["Aim for a moderate calorie deficit of about 300-500 kcal per day.",
+                    "Combine strength training 2-3 times a week with regular cardio.",
+                    "Target roughly 0.5-1 kg of weight loss per week."],
+    "weight_gain": ["Aim for a calorie surplus of about 300-500 kcal per day.",
+                    "Prioritise protein and whole foods over empty calories."],
+    "muscle_gain": ["Progressive strength training 3-4 times a week.",
+                    "Eat about 1.6-2.2 g of protein per kg of body weight daily."],
+    "endurance": ["Build weekly distance gradually, by no more than about 10% per week.",
+                  "Include one long, easy session and one interval session each week."],
+    "flexibility": ["Stretch or do yoga for 10-20 minutes most days.",
+                    "Warm up before deep stretching to avoid strain."],
+    "maintenance": ["Keep calorie intake around maintenance and stay consistently active."],
+    "general_fitness": ["Mix cardio, strength and mobility work through the week.",
+                        "Aim for at least 150 minutes of moderate activity per week."],
+}
+
+LOW_CONFIDENCE_THRESHOLD = 0.5
+
+def _phrase_pattern(phrases) -> re.Pattern:
+    alternatives = sorted((re.escape(phrase) for phrase in phrases), key=len, reverse=True)
+    return re.compile(r"(?<![\w-])(" + "|".join(alternatives) + r")(?![\w-])")
+
+# Patterns are compiled once at import time.
+GOAL_TYPE_PATTERN = _phrase_pattern(GOAL_TYPE_VOCABULARY)
+DIET_PATTERN = _phrase_pattern(DIET_VOCABULARY)
+WEIGHT_VALUE = r"(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(WEIGHT_UNITS, key=len, reverse=True)) + r")\b"
+WEIGHT_PATTERN = re.compile(WEIGHT_VALUE)
+# "I weigh 90 kg", "I'm currently 90 kg": the starting weight, not an amount to lose or gain.
+CURRENT_WEIGHT_PATTERN = re.compile(
+    r"\b(?:i\s+weigh|weighing|i'?m|i\s+am|currently|now|starting)\s+(?:currently\s+|at\s+|about\s+|around\s+)*" + WEIGHT_VALUE
+)
+# "get to 70 kg", "reach 70 kg", "weigh 70 kg": a target body weight, not an amount.
+TARGET_WEIGHT_PATTERN = re.compile(
+    r"\b(?:(?:get|go|come)\s+(?:back\s+)?(?:down\s+|up\s+)?to|be(?:\s+at)?|reach|to\s+weigh|hit|under|below|down\s+to)\s+"
+    r"(?:about\s+|around\s+)?" + WEIGHT_VALUE
+)
+DISTANCE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(DISTANCE_UNITS, key=len, reverse=True)) + r")\b")
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+RELATIVE_DEADLINE_PATTERN = re.compile(
+    r"\b(?:in|within|over|after)\s+(?:the\s+next\s+)?(\d+|" + "|".join(NUMBER_WORDS) + r")\s+(day|week|month|year)s?\b"
+)
+NAMED_DEADLINE_PATTERN = re.compile(
+    r"\b(?:by|before|until)\s+(?:the\s+)?(" + "|".join(
+        sorted((re.escape(name) for name in list(NAMED_DATES) + list(MONTHS)), key=len, reverse=True)
+    ) + r")\b"
+)
+# "gain 5 kg of muscle": the amount names what is gained, so it is muscle, not body weight.
+MUSCLE_AMOUNT_PATTERN = re.compile(WEIGHT_VALUE + r"\s+of\s+(?:lean\s+)?(?:muscle|muscle\s+mass|lean\s+mass)\b")
+# A goal phrase is negated ("I don't want to lose muscle") by a negation earlier in its clause.
+NEGATION_PATTERN = re.compile(r"\b(?:no|not|never|without|cannot|avoid|(?:don|doesn|didn|won|can|wouldn|shouldn)['\u2019]?t)\b")
+CLAUSE_BOUNDARY_PATTERN = re.compile(r"[,;:.!?]|\b(?:but|instead|rather|i)\b")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def normalize_description(description: str) -> str:
+    return WHITESPACE_PATTERN.sub(" ", description.lower()).strip(" .!?")
+
+def _next_occurrence(month: int, day: int, today: date) -> date:
+    candidate = date(today.year, month, day)
+    return candidate if candidate >= today else date(today.year + 1, month, day)
+
+def _parse_deadline(text: str, today: date) -> Optional[date]:
+    match = ISO_DATE_PATTERN.search(text)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+
+    match = RELATIVE_DEADLINE_PATTERN.search(text)
+    if match:
+        amount = match.group(1)
+        count = int(amount) if amount.isdigit() else NUMBER_WORDS[amount]
+        return today + timedelta(days=count * PERIOD_DAYS[match.group(2)])
+
+    match = NAMED_DEADLINE_PATTERN.search(text)
+    if match:
+        name = match.group(1)
+        if name in NAMED_DATES:
+            return _next_occurrence(*NAMED_DATES[name], today)
+        month = MONTHS[name]
+        return _next_occurrence(month, calendar.monthrange(today.year, month)[1], today)
+    return None
+
+def _negated(text: str, start: int) -> bool:
+    clause_start = 0
+    for boundary in CLAUSE_BOUNDARY_PATTERN.finditer(text, 0, start):
+        clause_start = boundary.end()
+    return NEGATION_PATTERN.search(text, clause_start, start) is not None
+
+def _detect_goal_type(text: str) -> Optional[str]:
+    # First phrase (by position) that is not negated decides; the pattern already prefers longer phrases.
+    for match in GOAL_TYPE_PATTERN.finditer(text):
+        if not _negated(text, match.start()):
+            return GOAL_TYPE_VOCABULARY[match.group(1)]
+    return None
+
+def _weight_kg(match: re.Match) -> float:
+    return float(match.group(1)) * WEIGHT_UNITS[match.group(2)][1]
+
+def _without(text: str, match: Optional[re.Match]) -> str:
+    return text if match is None else text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+@lru_cache(maxsize=4096)
+def _analyze_normalized(text: str, today: date) -> dict:
+    goal_type = _detect_goal_type(text)
+    diet_keywords = sorted({DIET_VOCABULARY[match] for match in DIET_PATTERN.findall(text)})
+    deadline = _parse_deadline(text, today)
+
+    target_quantity = None
+    target_unit = None
+    target_kg = None # Always the amount to lose or gain, never a body weight
+    warnings = []
+    # Current and target body weights are set aside so they are not read as the amount.
+    current_match = CURRENT_WEIGHT_PATTERN.search(text)
+    target_match = TARGET_WEIGHT_PATTERN.search(_without(text, current_match))
+    amount_text = _without(_without(text, current_match), target_match)
+    weight_match = WEIGHT_PATTERN.search(amount_text)
+    distance_match = DISTANCE_PATTERN.search(amount_text)
+    if target_match and current_match:
+        change_kg = _weight_kg(target_match) - _weight_kg(current_match)
+        unit, kg_factor = WEIGHT_UNITS[target_match.group(2)]
+        target_quantity = round(abs(change_kg) / kg_factor, 2)
+        target_unit = unit
+        target_kg = round(abs(change_kg), 2)
+        if goal_type is None:
+            goal_type = "weight_loss" if change_kg < 0 else "weight_gain"
+    elif target_match:
+        # A target weight without the current one: the amount to lose or gain is unknown.
+        warnings.append("Target body weight given without the current weight.")
+    elif weight_match:
+        unit, kg_factor = WEIGHT_UNITS[weight_match.group(2)]
+        target_quantity = float(weight_match.group(1))
+        target_unit = unit
+        target_kg = round(target_quantity * kg_factor, 2)
+        if goal_type in (None, "weight_gain") and MUSCLE_AMOUNT_PATTERN.match(amount_text, weight_match.start()):
+            goal_type = "muscle_gain"
+    elif distance_match:
+        target_quantity = float(distance_match.group(1))
+        target_unit = DISTANCE_UNITS[distance_match.group(2)]
+        if goal_type is None:
+            goal_type = "endurance"
+
+    # A bare amount or deadline says nothing about the direction ("5 kg by December"), so they
+    # only add confidence to a detected goal type; otherwise the LLM fallback decides.
+    confidence = 0.0
+    if goal_type:
+        confidence += 0.5
+        if target_quantity is not None:
+            confidence += 0.25
+        if deadline is not None:
+            confidence += 0.25
+    if goal_type is None and diet_keywords:
+        goal_type = "diet"
+        confidence = 0.5
+
+    if goal_type == "weight_loss" and target_kg is not None and deadline is not None:
+        weeks = max((deadline - today).days / 7, 1 / 7)
+        if target_kg / weeks > 1.0:
+            warnings.append("Target exceeds about 1 kg per week; consider a longer timeline.")
+    if deadline is not None and deadline < today:
+        warnings.append("Deadline is in the past.")
+
+    validation_status = "valid" if confidence >= LOW_CONFIDENCE_THRESHOLD and not warnings else (
+        "invalid" if deadline is not None and deadline < today else "clarification_needed"
+    )
+
+    return {
+        "parsed_details": {
+            "goal_type": goal_type,
+            "target_quantity": target_quantity,
+            "target_unit": target_unit,
+            "target_kg": target_kg,
+            "deadline": deadline.isoformat() if deadline else None,
+            "diet_keywords": diet_keywords,
+        },
+        "validation_status": validation_status,
+        "confidence": confidence,
+        "warnings": warnings,
+        "recommendations": list(RECOMMENDATIONS.get(goal_type, [])),
+        "source": "rules",
+    }
+
+def analyze_goal(description: str, today: Optional[date] = None) -> dict:
+    """
+    Parses a free-text goal into goal type, target quantity/unit (kg or lb converted to kg),
+    deadline and diet keywords. Identical normalized descriptions are served from a cache;
+    the cache key includes the date so relative deadlines ("in 3 months") stay correct.
+    """
+    cached = _analyze_normalized(normalize_description(description), today or date.today())
+    # Callers may mutate the result; copy the mutable parts so the cached entry stays intact.
+    result = dict(cached)
+    result["parsed_details"] = dict(cached["parsed_details"], diet_keywords=list(cached["parsed_details"]["diet_keywords"]))
+    result["warnings"] = list(cached["warnings"])
+    result["recommendations"] = list(cached["recommendations"])
+    result["original_description"] = description
+    return result
+
+def is_low_confidence(result: dict) -> bool:
+    return result["confidence"] < LOW_CONFIDENCE_THRESHOLD
+
+async def analyze_goal_with_llm_fallback(description: str, today: Optional[date] = None) -> dict:
+    """
+    Runs the local parser and only asks the LLM when the local result is low confidence.
+    If the LLM call fails, the local result is returned unchanged.
+    """
+    today = today or date.today()
+    result = analyze_goal(description, today)
+    if not config.GOAL_LLM_FALLBACK_ENABLED or not is_low_confidence(result):
+        return result
+
+    # Imported here so the common (rules-only) path never touches the agent runtime.
+    from agents import Runner
+    from agents01.goal_analyzer_agent import GoalAnalyzerAgent
+
+    try:
+        # The model has no clock; relative deadlines ("in 3 months") are resolved against this date.
+        goal_input = f"Today's date: {today.isoformat()}\nGoal: {description}"
+        llm_result = await Runner.run(GoalAnalyzerAgent(), goal_input, run_config=config.get_run_config())
+        parsed = llm_result.final_output
+        result["parsed_details"].update(parsed.model_dump())
+        result["validation_status"] = "valid" if parsed.goal_type else "clarification_needed"
+        result["recommendations"] = list(RECOMMENDATIONS.get(parsed.goal_type, result["recommendations"]))
+        result["source"] = "llm"
+    except Exception as e:
+        print(f"LLM goal analysis fallback failed: {e}")
+    return result
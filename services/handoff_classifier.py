@@ -0,0 +1,145 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context import UserSessionContext
+from services.instrumentation import start_handoff_timer
+from services.metrics import HANDOFFS
+
+# Local handoff classifier that runs before HealthWellnessAgent.
+# Each specialist has a weighted lexicon of words and two-word phrases; a message is turned into a
+# bag-of-words count vector over the combined vocabulary and scored against all specialists with
+# one matrix product. Terms negated within their clause ("I don't have any injury") do not count.
+# A confident match starts the run on the specialist agent directly, saving the model turn the
+# main agent would spend deciding to hand off.
+# Every handoff (classifier, model-initiated, or one of the handoff endpoints) is recorded in
+# UserSessionContext.handoff_logs through record_handoff().
+
+@dataclass(frozen=True, slots=True)
+class HandoffTarget:
+    agent_name: str
+    handoff_type: str # Value reported by the handoff endpoints
+    lexicon: Dict[str, float]
+
+HANDOFF_TARGETS: Tuple[HandoffTarget, ...] = (
+    HandoffTarget("EscalationAgent", "escalation_agent", {
+        "human": 3.0, "coach": 1.5, "human coach": 2.0, "real person": 4.0, "live person": 4.0, "a person": 2.0,
+        "talk to": 1.5, "speak to": 1.5, "speak with": 1.5, "talk with": 1.5, "someone": 1.0, "representative": 3.0,
+        "manager": 2.5, "complaint": 3.0, "complain": 3.0, "refund": 3.0, "frustrated": 2.0, "useless": 2.5,
+        "not helpful": 3.0, "unhelpful": 3.0, "escalate": 4.0, "support team": 3.0, "trainer": 1.0,
+    }),
+    HandoffTarget("NutritionExpertAgent", "nutrition_expert_agent", {
+        "diabetes": 4.0, "diabetic": 4.0, "prediabetes": 4.0, "blood sugar": 3.5, "insulin": 3.5, "glucose": 3.0,
+        "celiac": 4.0, "coeliac": 4.0, "allergy": 3.0, "allergies": 3.0, "allergic": 3.0, "anaphylaxis": 4.0,
+        "intolerance": 2.5, "intolerant": 2.5, "ibs": 4.0, "crohn": 4.0, "crohns": 4.0, "colitis": 4.0,
+        "kidney": 3.0, "renal": 3.5, "hypertension": 3.5, "blood pressure": 3.0, "cholesterol": 3.0,
+        "pcos": 4.0, "thyroid": 3.5, "pregnant": 3.5, "pregnancy": 3.5, "breastfeeding": 3.5, "gout": 3.5,
+        "eating disorder": 4.0, "anorexia": 4.0, "bulimia": 4.0, "medication": 2.0, "medications": 2.0,
+        "nutritionist": 3.0, "dietitian": 3.0, "dietician": 3.0, "deficiency": 2.5, "anemia": 3.0, "anaemia": 3.0,
+    }),
+    HandoffTarget("InjurySupportAgent", "injury_support_agent", {
+        "injury": 4.0, "injured": 4.0, "injuries": 4.0, "hurt": 2.5, "hurts": 2.5, "pain": 2.5, "painful": 2.5,
+        "sore": 1.0, "sprain": 4.0, "sprained": 4.0, "strain": 3.0, "strained": 3.0, "torn": 3.5, "tear": 1.5,
+        "fracture": 4.0, "fractured": 4.0, "broken": 2.0, "swollen": 3.0, "swelling": 3.0, "tendonitis": 4.0,
+        "tendinitis": 4.0, "sciatica": 4.0, "herniated": 4.0, "slipped disc": 4.0, "concussion": 4.0, "acl": 3.5,
+        "surgery": 2.5, "rehab": 3.0, "physio": 3.0, "physiotherapy": 3.0, "physical therapy": 3.5,
+        "pulled a": 1.5, "back": 1.0, "back pain": 2.0, "knee": 1.5, "ankle": 1.5, "shoulder": 1.5, "wrist": 1.5,
+        "hip": 1.0, "hamstring": 1.5, "limp": 2.5, "dislocated": 4.0,
+    }),
+)
+
+MIN_SCORE = 3.0
+MIN_CONFIDENCE = 0.7
+NEUTRAL_PRIOR = 1.0 # Added to the denominator so one weak keyword is never "confident"
+
+# Words and the punctuation that ends a clause; apostrophes are removed first ("don't" -> "dont").
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[,;:.!?]")
+# A negation turns off the terms after it until the end of its clause: "I don't have any injury".
+NEGATIONS = frozenset({
+    "no", "not", "never", "without", "none", "nor", "cannot", "dont", "doesnt", "didnt", "isnt", "arent",
+    "wasnt", "werent", "havent", "hasnt", "hadnt", "wont", "cant", "wouldnt", "shouldnt", "couldnt",
+})
+CLAUSE_BREAKS = frozenset({",", ";", ":", ".", "!", "?", "but", "although", "though", "however"})
+
+@dataclass(slots=True)
+class HandoffDecision:
+    target: HandoffTarget
+    score: float
+    confidence: float
+
+class HandoffClassifier:
+    """
+    Bag-of-words scorer over the specialists' lexicons.
+    weights[t, v] is the weight of vocabulary term v for target t.
+    """
+
+    def __init__(self, targets: Sequence[HandoffTarget] = HANDOFF_TARGETS, min_confidence: float = MIN_CONFIDENCE):
+        self.targets = tuple(targets)
+        self.min_confidence = min_confidence
+        terms = sorted({term for target in self.targets for term in target.lexicon})
+        self.vocabulary: Dict[str, int] = {term: index for index, term in enumerate(terms)}
+        self.weights = np.zeros((len(self.targets), len(terms)), dtype=np.float32)
+        for row, target in enumerate(self.targets):
+            for term, weight in target.lexicon.items():
+                self.weights[row, self.vocabulary[term]] = weight
+
+    def _term_indices(self, message: str) -> List[int]:
+        words: List[str] = []
+        negated: List[bool] = [] # Whether each word follows a negation in its clause
+        in_negation = False
+        for token in TOKEN_PATTERN.findall(message.lower().replace("'", "").replace("\u2019", "")):
+            if token in CLAUSE_BREAKS:
+                in_negation = False
+                if not token.isalpha():
+                    continue
+            words.append(token)
+            negated.append(in_negation)
+            if token in NEGATIONS:
+                in_negation = True
+        # A phrase that starts with the negation ("not helpful") is a term of its own and still counts.
+        grams = [word for word, off in zip(words, negated) if not off]
+        grams += [f"{first} {second}" for first, second, off in zip(words, words[1:], negated) if not off]
+        return [self.vocabulary[gram] for gram in grams if gram in self.vocabulary]
+
+    def scores_batch(self, messages: Sequence[str]) -> np.ndarray:
+        """
+        Scores for every (message, target) pair: counts[N, V] @ weights.T -> [N, targets].
+        """
+        counts = np.zeros((len(messages), len(self.vocabulary)), dtype=np.float32)
+        for row, message in enumerate(messages):
+            np.add.at(counts[row], self._term_indices(message), 1.0)
+        return counts @ self.weights.T
+
+    def classify(self, message: str) -> Optional[HandoffDecision]:
+        return self.classify_batch([message])[0]
+
+    def classify_batch(self, messages: Sequence[str]) -> List[Optional[HandoffDecision]]:
+        """
+        The confident specialist for each message, or None when the main agent should handle it.
+        """
+        scores = self.scores_batch(messages)
+        best = scores.argmax(axis=1)
+        top = scores[np.arange(len(messages)), best]
+        confidence = top / (scores.sum(axis=1) + NEUTRAL_PRIOR)
+        return [
+            HandoffDecision(self.targets[int(best[row])], float(top[row]), float(confidence[row]))
+            if top[row] >= MIN_SCORE and confidence[row] >= self.min_confidence else None
+            for row in range(len(messages))
+        ]
+
+def record_handoff(context: UserSessionContext, handoff_type: str, reason: str, source: str) -> str:
+    """
+    Appends one handoff to the session's handoff_logs and returns the log line.
+    `source` says who decided: 'classifier', 'agent' (model-initiated) or 'api' (handoff endpoints).
+    """
+    entry = f"{datetime.now().isoformat(timespec='seconds')} | {handoff_type} | {source} | {reason}"
+    context.handoff_logs.append(entry)
+    HANDOFFS.inc(handoff_type, source)
+    start_handoff_timer(handoff_type, source)
+    return entry
+
+def handoff_type_for(agent_name: str) -> str:
+    return next((target.handoff_type for target in HANDOFF_TARGETS if target.agent_name == agent_name), agent_name)
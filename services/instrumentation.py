@@ -0,0 +1,211 @@
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+from agents import FunctionTool, Model, ModelResponse
+from agents.tool import default_tool_error_function
+from openai.types.responses import ResponseCompletedEvent, ResponseTextDeltaEvent
+
+import config
+from services.metrics import (
+    HANDOFF_SECONDS, HTTP_REQUEST_SECONDS, MODEL_CALL_SECONDS, MODEL_FIRST_TOKEN_SECONDS, MODEL_TOKENS, TOOL_CALL_SECONDS,
+)
+
+# Hooks that record the hot-path metrics in services/metrics.py:
+#   * MetricsMiddleware: every FastAPI route, labelled by route template and status,
+#   * instrument_tool(): every function tool call, from an agent run or the intent router,
+#   * InstrumentedModel: every real model call (response-cache hits never reach it), with tokens.
+# Handoffs are counted in record_handoff(), which every handoff path already goes through; within a
+# chat turn (time_handoffs()) it also starts a timer that stops when the specialist's turn ends.
+# StackSampler is an optional sampling profiler for finding where time goes inside a slow route.
+# With METRICS_ENABLED off the hooks are not installed at all.
+
+# Prefix of the string FunctionTool returns instead of raising when the tool fails.
+TOOL_ERROR_PREFIX = default_tool_error_function(None, Exception("")).split(" Error:")[0]
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request until its last response byte (streams included).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500 # Unless the app sends a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; its path is the template ("/jobs/{job_id}").
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope["method"], getattr(route, "path", "unmatched"), str(status),
+            )
+
+def instrument_tool(tool: FunctionTool) -> FunctionTool:
+    """
+    Times every invocation of the tool in place and returns it, so it can be used as a decorator.
+    """
+    if not config.METRICS_ENABLED:
+        return tool
+    invoke = tool.on_invoke_tool
+
+    async def on_invoke_tool(ctx, arguments: str) -> Any:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await invoke(ctx, arguments)
+            outcome = "error" if isinstance(result, str) and result.startswith(TOOL_ERROR_PREFIX) else "ok"
+            return result
+        finally:
+            TOOL_CALL_SECONDS.observe(time.perf_counter() - start, tool.name, outcome)
+
+    tool.on_invoke_tool = on_invoke_tool
+    return tool
+
+# (handoff_type, source, start) of the handoffs in the current chat turn; None outside time_handoffs().
+# The list is shared with the tasks the agent run spawns, so model-initiated handoffs land in it too.
+_handoff_timers: contextvars.ContextVar[Optional[List[Tuple[str, str, float]]]] = contextvars.ContextVar("handoff_timers", default=None)
+
+@contextmanager
+def time_handoffs() -> Iterator[None]:
+    """
+    Around a chat turn: records how long each handoff made during the turn took, up to the end of the turn.
+    """
+    if not config.METRICS_ENABLED:
+        yield
+        return
+    timers: List[Tuple[str, str, float]] = []
+    _handoff_timers.set(timers)
+    try:
+        yield
+    finally:
+        # set(), not reset(): a streaming turn may be closed from another context than the one it started in.
+        _handoff_timers.set(None)
+        end = time.perf_counter()
+        for handoff_type, source, start in timers:
+            HANDOFF_SECONDS.observe(end - start, handoff_type, source)
+
+def start_handoff_timer(handoff_type: str, source: str) -> None:
+    timers = _handoff_timers.get()
+    if timers is not None:
+        timers.append((handoff_type, source, time.perf_counter()))
+
+def _record_usage(model: str, usage: Any) -> None:
+    if usage is None:
+        return
+    MODEL_TOKENS.inc(model, "input", amount=getattr(usage, "input_tokens", 0) or 0)
+    MODEL_TOKENS.inc(model, "output", amount=getattr(usage, "output_tokens", 0) or 0)
+
+class InstrumentedModel(Model):
+    """
+    Model wrapper recording call latency, time to first token (streamed) and token usage.
+    """
+
+    def __init__(self, model: Model, name: str):
+        self.model = model
+        self.name = name
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> ModelResponse:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.model.get_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs,
+            )
+            outcome = "ok"
+        finally:
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - start, self.name, "once", outcome)
+        _record_usage(self.name, response.usage)
+        return response
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        start = time.perf_counter()
+        first_token = False
+        outcome = "cancelled" # Consumer stopped iterating before the stream ended
+        try:
+            async for event in self.model.stream_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs,
+            ):
+                if not first_token and isinstance(event, ResponseTextDeltaEvent):
+                    first_token = True
+                    MODEL_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, self.name)
+                elif isinstance(event, ResponseCompletedEvent):
+                    _record_usage(self.name, event.response.usage)
+                yield event
+            outcome = "ok"
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - start, self.name, "stream", outcome)
+
+class StackSampler:
+    """
+    Sampling profiler: a background thread records the stack of one thread (the event loop's)
+    every `interval` seconds. top() returns the most frequent stacks in collapsed form
+    ("module:function;module:function ... count"), which flame graph tools read directly.
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._target: Optional[int] = None
+
+    def start(self, thread_id: Optional[int] = None) -> None:
+        if self._thread is not None:
+            return
+        self._target = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def top(self, limit: int = 100) -> List[str]:
+        with self._lock:
+            return [f"{stack} {count}" for stack, count in self._stacks.most_common(limit)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            with self._lock:
+                self._stacks[";".join(reversed(names))] += 1
+                self.samples += 1
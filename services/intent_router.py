@@ -0,0 +1,251 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import FunctionTool
+from agents.tool_context import ToolContext
+
+from context import UserSessionContext
+from services.checkin_scheduler import WEEKDAYS, parse_time_of_day, parse_weekday
+from services.meal_planner import estimate_caloric_goal
+from services.metric_series import METRIC_ALIASES
+
+# Local intent router that runs before HealthWellnessAgent.
+# A keyword classifier scores the message for each routable intent; if one intent clearly wins
+# and its precompiled pattern extracts every argument the tool needs, the tool is invoked directly
+# (through the same FunctionTool entry point the agent uses) and its result is phrased as the reply.
+# Anything else, including questions about these topics, goes to the agent unchanged.
+
+INTENTS: Tuple[str, ...] = ("schedule_checkin", "log_progress", "meal_plan", "workout_plan")
+
+# Keyword weights per intent. "question" is a pseudo-intent: questions dilute confidence, so
+# "how do I log my weight?" goes to the agent while "log weight 72kg" is routed.
+# Words shared by several intents ("plan", "make", ...) carry no weight; plan intents require one
+# of PLAN_REQUEST_WORDS instead, so "I hurt my knee during my workout" is not a plan request.
+KEYWORD_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "schedule_checkin": {"schedule": 2.0, "checkin": 3.0, "check": 1.0, "reminder": 1.5, "remind": 1.5,
+                         "weekly": 1.0, "every": 0.5, "book": 1.0},
+    "log_progress": {"log": 2.5, "record": 2.5, "track": 2.5, "weighed": 2.5, "weigh": 2.0, "weight": 1.0,
+                     "steps": 1.5, "slept": 2.5, "ran": 2.5, "walked": 2.5, "drank": 2.5, "today": 0.5, "add": 2.0,
+                     "calories": 0.5},
+    "meal_plan": {"meal": 2.5, "meals": 2.5, "diet": 1.0, "menu": 1.5, "food": 0.5},
+    "workout_plan": {"workout": 2.5, "workouts": 2.5, "exercise": 1.5, "training": 1.5, "routine": 1.0, "program": 1.0},
+    "question": {"how": 4.0, "why": 4.0, "what": 3.0, "which": 3.0, "should": 3.0, "when": 3.0, "where": 3.0,
+                 "is": 1.0, "are": 1.0, "does": 2.5, "do": 1.0, "explain": 3.0, "cancel": 5.0, "delete": 5.0,
+                 "change": 2.0, "not": 3.0, "dont": 4.0, "stop": 4.0, "hurt": 4.0, "pain": 4.0, "?": 3.0},
+}
+PLAN_REQUEST_WORDS = re.compile(r"\b(?:plan|routine|program|programme|schedule|menu|make|create|generate|give|build|design|new)\b")
+MIN_SCORE = 2.5
+MIN_CONFIDENCE = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|\?")
+CHECKIN_WORD_PATTERN = re.compile(r"check[\s-]?ins?\b")
+
+WEEKDAY = r"(?P<day>mon(?:day)?|tue(?:s(?:day)?)?|wed(?:nesday)?|thu(?:rs(?:day)?)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)s?"
+TIME = r"(?P<time>\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)"
+CHECKIN_DAY_PATTERN = re.compile(rf"\b{WEEKDAY}\b")
+CHECKIN_TIME_PATTERN = re.compile(rf"\b(?:at|@)?\s*{TIME}(?![\d:])")
+REMINDER_TYPE_PATTERN = re.compile(r"\b(?:via|by|through|over)\s+(?P<type>email|e-mail|sms|text|push|notification|whatsapp)\b")
+
+UNIT = r"(?P<unit>kgs?|kilos?|lbs?|pounds?|km|kilometers?|miles?|mi|steps|hours?|hrs?|h|minutes?|mins?|bpm|kcal|calories|cm|liters?|litres?|l|glasses|%)"
+VALUE = r"(?P<value>\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)" # "10,000" is ten thousand
+# "log weight 72kg", "record my weight as 72.5 kg", "track body fat: 18%"
+METRIC_FIRST_PATTERN = re.compile(
+    rf"\b(?:log|record|track|add|weighed|weigh)\b\s+(?:in\s+)?(?:my\s+|today'?s\s+)?(?P<metric>[a-z][a-z ]{{0,20}}?)\b\s*"
+    rf"(?:is|was|as|of|at|to|=|:)?\s*{VALUE}\s*{UNIT}?(?![\w.])"
+)
+# "log 8000 steps", "I slept 7 hours", "ran 5 km today", "weighed 72 kg"
+VALUE_FIRST_PATTERN = re.compile(
+    rf"\b(?P<verb>log|record|track|add|slept|ran|walked|drank|weighed|did)\b\s+(?:in\s+(?:at\s+)?|at\s+)?{VALUE}\s*{UNIT}"
+    rf"(?:\s+(?:of\s+)?(?P<metric>[a-z]+(?: [a-z]+)?))?"
+)
+
+# The metric implied by a unit or verb (names users type are mapped by metric_series.METRIC_ALIASES).
+UNIT_METRICS = {
+    "kg": "weight", "kgs": "weight", "kilo": "weight", "kilos": "weight", "lb": "weight", "lbs": "weight",
+    "pound": "weight", "pounds": "weight", "steps": "steps", "bpm": "heart_rate", "kcal": "calories",
+    "calories": "calories", "km": "distance", "kilometer": "distance", "kilometers": "distance",
+    "mile": "distance", "miles": "distance", "mi": "distance", "%": "body_fat", "cm": "waist",
+    "liter": "water", "liters": "water", "litre": "water", "litres": "water", "l": "water", "glasses": "water",
+}
+VERB_METRICS = {"slept": "sleep", "ran": "distance", "walked": "distance", "drank": "water", "weighed": "weight"}
+# Changes and targets ("log my weight loss of 2 kg", "my goal of 5 kg") are not readings; logging
+# them as the metric would write a delta into an absolute series, so the agent handles them.
+RELATIVE_AMOUNT_PATTERN = re.compile(
+    r"\b(?:loss|lose|lost|losing|gain|gained|gaining|goal|target|difference|change|more|less|down\s+by|up\s+by)\b"
+)
+
+DIET_WORDS = ("vegetarian", "vegan", "pescatarian", "keto", "paleo", "halal", "kosher", "high protein", "low carb",
+              "gluten free", "gluten-free", "dairy free", "dairy-free", "nut free", "nut-free")
+CALORIE_PATTERN = re.compile(r"\b(?P<calories>\d{3,4})\s*(?:kcal|calories|cal)\b")
+LEVEL_PATTERN = re.compile(r"\b(beginner|novice|intermediate|advanced|expert)\b")
+MINUTES_PATTERN = re.compile(r"\b(?P<minutes>\d{2,3})\s*(?:-\s*)?(?:minutes?|mins?)\b")
+EQUIPMENT_WORDS = ("gym", "dumbbells", "dumbbell", "kettlebell", "kettlebells", "barbell", "bands", "resistance bands",
+                   "treadmill", "bodyweight", "no equipment")
+
+@dataclass(slots=True)
+class RoutedIntent:
+    intent: str
+    confidence: float
+    tool_name: str
+    arguments: Dict[str, Any]
+
+@dataclass(slots=True)
+class RoutedReply:
+    intent: str
+    tool_name: str
+    result: Any
+    reply: str
+
+def keyword_scores(message: str) -> Dict[str, float]:
+    """Keyword score of the message for every intent in KEYWORD_WEIGHTS (including "question")."""
+    text = CHECKIN_WORD_PATTERN.sub(" checkin ", message.lower().replace("'", ""))
+    scores = dict.fromkeys(KEYWORD_WEIGHTS, 0.0)
+    for token in TOKEN_PATTERN.findall(text):
+        for intent, weights in KEYWORD_WEIGHTS.items():
+            scores[intent] += weights.get(token, 0.0)
+    return scores
+
+def classify(message: str) -> Tuple[Optional[str], float]:
+    """
+    Keyword classifier: returns (best intent or None, confidence in [0, 1]).
+    """
+    scores = keyword_scores(message)
+    best = max(INTENTS, key=scores.__getitem__)
+    total = sum(scores.values())
+    if scores[best] < MIN_SCORE or not total:
+        return None, 0.0
+    return best, scores[best] / total
+
+def _normalize_metric(metric: Optional[str], unit: Optional[str], verb: Optional[str] = None, named: bool = False) -> Optional[str]:
+    # `named`: the text is where the user names the metric ("log <metric> 72 kg"), so an unknown
+    # name is not replaced by the unit's metric ("log my weight loss of 2 kg" is not a weight).
+    metric = (metric or "").strip()
+    if metric in METRIC_ALIASES:
+        return METRIC_ALIASES[metric]
+    if named and metric:
+        return None
+    return UNIT_METRICS.get(unit or "") or VERB_METRICS.get(verb or "")
+
+def _extract_progress(text: str) -> Optional[Dict[str, Any]]:
+    if RELATIVE_AMOUNT_PATTERN.search(text):
+        return None
+    match = METRIC_FIRST_PATTERN.search(text)
+    metric = None
+    if match:
+        metric = _normalize_metric(match.group("metric"), match.group("unit"), named=True)
+    if metric is None:
+        match = VALUE_FIRST_PATTERN.search(text)
+        if match is None:
+            return None
+        metric = _normalize_metric(match.group("metric"), match.group("unit"), match.group("verb"))
+        if metric is None:
+            return None
+    value = match.group("value").replace(",", "")
+    unit = match.group("unit")
+    return {"metric_name": metric, "metric_value": f"{value} {unit}" if unit else value}
+
+def _extract_checkin(text: str) -> Optional[Dict[str, Any]]:
+    day_match = CHECKIN_DAY_PATTERN.search(text)
+    if day_match is None or parse_weekday(day_match.group("day")) is None:
+        return None
+    checkin_time = "09:00" # Same default as the /schedule_checkin endpoint
+    for time_match in CHECKIN_TIME_PATTERN.finditer(text):
+        if parse_time_of_day(time_match.group("time")) is not None:
+            checkin_time = time_match.group("time").strip()
+            break
+    reminder = REMINDER_TYPE_PATTERN.search(text)
+    reminder_type = {"e-mail": "email", "text": "sms", "notification": "push"}.get(
+        reminder.group("type"), reminder.group("type")) if reminder else "email"
+    return {"checkin_day": WEEKDAYS[parse_weekday(day_match.group("day"))], "checkin_time": checkin_time, "reminder_type": reminder_type}
+
+def _extract_meal_plan(text: str, context: UserSessionContext) -> Dict[str, Any]:
+    diet_words = [word for word in DIET_WORDS if word in text]
+    calories = CALORIE_PATTERN.search(text)
+    caloric_goal = int(calories.group("calories")) if calories else (estimate_caloric_goal(context.goal) if context.goal else None)
+    return {
+        "dietary_preferences": ", ".join(diet_words) or context.diet_preferences,
+        "restrictions": ((context.goal or {}).get("parsed_details") or {}).get("diet_keywords") or None,
+        "caloric_goal": caloric_goal,
+    }
+
+def _extract_workout_plan(text: str, context: UserSessionContext) -> Dict[str, Any]:
+    goal = context.goal or {}
+    level = LEVEL_PATTERN.search(text)
+    minutes = MINUTES_PATTERN.search(text)
+    equipment = [word for word in EQUIPMENT_WORDS if re.search(rf"\b{word}\b", text) and word not in ("bodyweight", "no equipment")]
+    return {
+        "fitness_goal": {
+            "original_description": goal.get("description") or text,
+            "goal_type": (goal.get("parsed_details") or {}).get("goal_type"),
+        },
+        "current_fitness_level": level.group(1) if level else None,
+        "available_equipment": equipment or None,
+        "time_per_session_minutes": int(minutes.group("minutes")) if minutes else None,
+    }
+
+class IntentRouter:
+    """
+    Routes high-confidence messages straight to a tool; route() returns None for everything else.
+    `tools` maps tool names to the FunctionTools the agent uses (e.g. from agent.tools).
+    """
+
+    def __init__(self, tools: List[FunctionTool], min_confidence: float = MIN_CONFIDENCE):
+        self.tools = {tool.name: tool for tool in tools}
+        self.min_confidence = min_confidence
+
+    def match(self, message: str, context: UserSessionContext) -> Optional[RoutedIntent]:
+        """
+        Classifies the message and extracts tool arguments, without calling anything.
+        """
+        intent, confidence = classify(message)
+        if intent is None or confidence < self.min_confidence:
+            return None
+        text = message.lower()
+        if intent == "schedule_checkin":
+            arguments = _extract_checkin(text)
+            if arguments is None:
+                return None
+            return RoutedIntent(intent, confidence, "CheckinSchedulerTool", arguments)
+        if intent == "log_progress":
+            arguments = _extract_progress(text)
+            if arguments is None:
+                return None
+            return RoutedIntent(intent, confidence, "ProgressTrackerTool", {**arguments, "log_notes": message})
+        if not PLAN_REQUEST_WORDS.search(text):
+            return None
+        if intent == "meal_plan":
+            return RoutedIntent(intent, confidence, "MealPlannerTool", _extract_meal_plan(text, context))
+        return RoutedIntent(intent, confidence, "WorkoutRecommenderTool", _extract_workout_plan(text, context))
+
+    async def route(self, message: str, context: UserSessionContext) -> Optional[RoutedReply]:
+        """
+        Runs the matched tool and returns its result with a reply for the user, or None if the
+        message (or the tool call) should be handled by the agent instead.
+        """
+        routed = self.match(message, context)
+        if routed is None or routed.tool_name not in self.tools:
+            return None
+        tool = self.tools[routed.tool_name]
+        arguments = json.dumps({key: value for key, value in routed.arguments.items() if value is not None})
+        result = await tool.on_invoke_tool(
+            ToolContext(context=context, tool_name=tool.name, tool_call_id="router", tool_arguments=arguments), arguments,
+        )
+        if not isinstance(result, (dict, list)):
+            return None # Invalid arguments come back as an error string; let the agent deal with it
+        if routed.intent == "meal_plan":
+            context.meal_plan = result
+        elif routed.intent == "workout_plan":
+            context.workout_plan = result
+        return RoutedReply(routed.intent, routed.tool_name, result, format_reply(routed.intent, result))
+
+def format_reply(intent: str, result: Any) -> str:
+    if intent == "meal_plan":
+        return "Here is your 7-day meal plan:\n" + "\n".join(result)
+    if intent == "workout_plan":
+        plan = result["recommended_plan"]
+        schedule = "\n".join(f"{day}: {session}" for day, session in plan["weekly_schedule"].items())
+        return (f"Here is your workout plan ({plan['frequency']}, {plan['duration_per_session']} per session, "
+                f"{plan['equipment']}):\n{schedule}\n{plan['notes']}")
+    return result.get("message", "Done.")
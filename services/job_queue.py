@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import config
+from services.db import connect
+
+# In-process background job queue with a persistent job table.
+# Long-running work (plan generation for /set_goal?async=true) is stored as a row in SQLite,
+# queued on an asyncio.Queue and run by a fixed pool of worker tasks; clients poll GET /jobs/{id}.
+# The table is the source of truth: a job is claimed with a conditional UPDATE before it runs, so
+# it runs once even if several workers recover the same rows. Jobs still queued when the app
+# stopped, or left running by a process that has exited, are queued again on startup, so
+# handlers must be safe to run again.
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class JobQueueFullError(RuntimeError):
+    """Too many jobs are waiting to run; the caller should retry later."""
+
+@dataclass(slots=True)
+class Job:
+    job_id: str
+    kind: str
+    user_id: str
+    status: str # queued, running, succeeded or failed
+    result: Optional[Any] # Handler's return value once succeeded
+    error: Optional[str] # Failure message once failed
+    created_at: float # Epoch seconds
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Exists, owned by another user
+    return True
+
+class JobQueue:
+    """
+    Bounded asyncio worker pool over a SQLite job table.
+    Handlers are registered per job kind and receive the payload given to submit().
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        workers: int = 4,
+        max_pending: int = 1000,
+        retention_seconds: float = 86400,
+        conn: Optional[sqlite3.Connection] = None,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._conn = conn or connect(path)
+        self._lock = threading.Lock()
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pid = os.getpid()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " user_id TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " owner_pid INTEGER," # Process running the job
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, kind: str, user_id: str, payload: Dict[str, Any]) -> Job:
+        """
+        Records a job and queues it. Raises JobQueueFullError when `max_pending` jobs are already waiting.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'.")
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running.")
+        if self._queue.qsize() >= self.max_pending:
+            raise JobQueueFullError(f"{self._queue.qsize()} jobs are already waiting.")
+        job = Job(uuid.uuid4().hex, kind, user_id, "queued", None, None, time.time(), None, None)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, user_id, status, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.job_id, kind, user_id, job.status, json.dumps(payload), job.created_at),
+            )
+        self._queue.put_nowait(job.job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, kind, user_id, status, result, error, created_at, started_at, finished_at FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = Job(*row)
+        job.result = json.loads(job.result) if job.result is not None else None
+        return job
+
+    def recover(self) -> List[str]:
+        """
+        Deletes finished jobs older than the retention period, re-queues jobs whose process has
+        exited, and returns the ids of every queued job, oldest first.
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (time.time() - self.retention_seconds,),
+            )
+            for job_id, owner_pid in self._conn.execute("SELECT job_id, owner_pid FROM jobs WHERE status = 'running'").fetchall():
+                if owner_pid is None or not _pid_alive(owner_pid):
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'queued', owner_pid = NULL, started_at = NULL WHERE job_id = ? AND status = 'running'",
+                        (job_id,),
+                    )
+            rows = self._conn.execute("SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [job_id for (job_id,) in rows]
+
+    async def run_job(self, job_id: str) -> bool:
+        """
+        Claims and runs one queued job, recording its result or error. Returns False if the job
+        was not queued any more (claimed by another worker, or unknown).
+        """
+        with self._lock:
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', owner_pid = ?, started_at = ? WHERE job_id = ? AND status = 'queued'",
+                (self._pid, time.time(), job_id),
+            ).rowcount == 1
+            row = self._conn.execute("SELECT kind, payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone() if claimed else None
+        if row is None:
+            return False
+        kind, payload = row
+        try:
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{kind}'.")
+            result = await handler(json.loads(payload))
+        except asyncio.CancelledError:
+            # Shutting down: leave the job for the next start.
+            self._finish(job_id, "queued", None, None, finished=False)
+            raise
+        except Exception as e:
+            print(f"Job {job_id} ({kind}) failed: {e}")
+            self._finish(job_id, "failed", None, str(e))
+        else:
+            self._finish(job_id, "succeeded", json.dumps(result, default=str), None)
+        return True
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str], finished: bool = True) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner_pid = NULL"
+                + ("" if finished else ", started_at = NULL") + " WHERE job_id = ?",
+                (status, result, error, time.time() if finished else None, job_id),
+            )
+
+    async def start(self) -> None:
+        """
+        Recovers persisted jobs and starts the worker pool.
+        """
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for job_id in self.recover():
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Stops the workers. Jobs still waiting or interrupted mid-run stay queued in the table.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def join(self) -> None:
+        """Waits until every queued job has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+            except Exception as e:
+                print(f"Job worker error for {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+@lru_cache(maxsize=1)
+def get_job_queue() -> JobQueue:
+    """
+    Process-wide job queue on the database configured in config.py.
+    """
+    return JobQueue(
+        config.DATABASE_PATH,
+        workers=config.JOB_WORKERS,
+        max_pending=config.JOB_MAX_PENDING,
+        retention_seconds=config.JOB_RETENTION_SECONDS,
+    )
@@ -0,0 +1,191 @@
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context import UserSessionContext
+from services.meal_planner import (
+    DAYS, DEFAULT_CALORIC_GOAL, MAX_CALORIC_GOAL, MAX_SERVINGS, MEAL_CALORIE_SPLIT, MIN_CALORIC_GOAL,
+    MIN_SERVINGS, estimate_caloric_goal, format_day, parse_restrictions,
+)
+from services.recipe_catalog import MEAL_TYPES, get_catalog
+from services.session_locks import MAX_SAVE_ATTEMPTS
+from services.session_store import SessionConflictError, SessionStore
+
+# Batch meal planning for many users at once (e.g. a nightly cohort refresh).
+# Selection runs as NumPy operations over a users x recipes matrix, so the cost of a batch
+# is a handful of array passes instead of one Python planner call per user.
+# For the same inputs it picks exactly what services/meal_planner.py picks.
+
+@lru_cache(maxsize=1)
+def _recipe_matrices() -> Tuple[np.ndarray, Tuple[str, ...], np.ndarray, np.ndarray]:
+    """
+    Returns (calories[R], tag names, tag matrix[T, R] bool, meal mask[3, R] bool) for the catalog.
+    """
+    catalog = get_catalog()
+    calories = np.frombuffer(catalog.calories, dtype=np.uint16).astype(np.float64)
+    tags = tuple(sorted(catalog.tag_index))
+    tag_matrix = np.zeros((len(tags), len(catalog)), dtype=bool)
+    for row, tag in enumerate(tags):
+        tag_matrix[row, list(catalog.tag_index[tag])] = True
+    meal_mask = np.zeros((len(MEAL_TYPES), len(catalog)), dtype=bool)
+    for row, meal in enumerate(MEAL_TYPES):
+        meal_mask[row, list(catalog.meal_index[meal])] = True
+    return calories, tags, tag_matrix, meal_mask
+
+def _allowed_matrix(restriction_sets: Sequence[FrozenSet[str]]) -> np.ndarray:
+    # allowed[u, r] is True when recipe r carries every tag user u requires.
+    _, tags, tag_matrix, _ = _recipe_matrices()
+    tag_rows = {tag: row for row, tag in enumerate(tags)}
+    required = np.zeros((len(restriction_sets), len(tags)), dtype=np.int32)
+    impossible = np.zeros(len(restriction_sets), dtype=bool) # Users requiring a tag no recipe has
+    for user, restriction_set in enumerate(restriction_sets):
+        for tag in restriction_set:
+            if tag in tag_rows:
+                required[user, tag_rows[tag]] = 1
+            else:
+                impossible[user] = True
+    # Number of required tags each recipe is missing; zero means allowed.
+    missing = required @ (~tag_matrix).astype(np.int32)
+    return (missing == 0) & ~impossible[:, None]
+
+def _servings(calories: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        servings = np.round(targets / calories * 4) / 4
+    return np.clip(servings, MIN_SERVINGS, MAX_SERVINGS)
+
+def select_meals_batch(caloric_goals: Sequence[int], restriction_sets: Sequence[FrozenSet[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Chooses breakfast, lunch and dinner for 7 days for every user in one vectorized pass.
+    Returns (recipe_ids, servings), both shaped [users, 7, 3]; recipe id -1 means no match.
+    """
+    calories, _, _, meal_mask = _recipe_matrices()
+    goals = np.clip(np.asarray(caloric_goals, dtype=np.float64), MIN_CALORIC_GOAL, MAX_CALORIC_GOAL)
+    users, days = len(goals), len(DAYS)
+    allowed = _allowed_matrix(restriction_sets)
+    user_index = np.arange(users)
+
+    recipe_ids = np.full((users, days, len(MEAL_TYPES)), -1, dtype=np.int64)
+    servings = np.ones((users, days, len(MEAL_TYPES)), dtype=np.float64)
+
+    # Breakfast and lunch: the 7 recipes closest to each user's slot target, one per day.
+    for slot, meal in enumerate(MEAL_TYPES[:2]):
+        targets = goals * MEAL_CALORIE_SPLIT[meal]
+        candidates = allowed & meal_mask[slot]
+        cost = np.where(candidates, np.abs(calories[None, :] - targets[:, None]), np.inf)
+        order = np.argsort(cost, axis=1, kind="stable") # Stable sort breaks ties by recipe id
+        counts = np.minimum(candidates.sum(axis=1), days)
+        day_pick = np.arange(days)[None, :] % np.maximum(counts, 1)[:, None]
+        picked = np.take_along_axis(order, day_pick, axis=1)
+        picked[counts == 0] = -1
+        recipe_ids[:, :, slot] = picked
+        servings[:, :, slot] = np.where(picked >= 0, _servings(calories[picked], targets[:, None]), 1.0)
+
+    # Dinner: fill what breakfast and lunch left of each day's target, without repeats until exhausted.
+    dinner_slot = MEAL_TYPES.index("dinner")
+    dinner_candidates = allowed & meal_mask[dinner_slot]
+    used = np.zeros_like(dinner_candidates)
+    for day in range(days):
+        chosen = recipe_ids[:, day, :dinner_slot]
+        eaten = np.where(chosen >= 0, calories[chosen] * servings[:, day, :dinner_slot], 0.0).sum(axis=1)
+        remaining = goals - eaten
+
+        available = dinner_candidates & ~used
+        exhausted = ~available.any(axis=1)
+        used[exhausted] = False
+        available[exhausted] = dinner_candidates[exhausted]
+
+        cost = np.where(available, np.abs(calories[None, :] - remaining[:, None]), np.inf)
+        picked = np.argmin(cost, axis=1) # First minimum, i.e. lowest recipe id on ties
+        has_dinner = available.any(axis=1)
+        picked = np.where(has_dinner, picked, -1)
+        used[user_index[has_dinner], picked[has_dinner]] = True
+        recipe_ids[:, day, dinner_slot] = picked
+        servings[:, day, dinner_slot] = np.where(has_dinner, _servings(calories[picked], remaining), 1.0)
+
+    return recipe_ids, servings
+
+def plan_meals_batch(caloric_goals: Sequence[int], restriction_sets: Sequence[FrozenSet[str]]) -> List[List[str]]:
+    """
+    Batch counterpart of generate_meal_plan: one 7-day plan (list of day strings) per user.
+    """
+    catalog = get_catalog()
+    recipe_ids, servings = select_meals_batch(caloric_goals, restriction_sets)
+    ids, portions = recipe_ids.tolist(), servings.tolist()
+    return [
+        [
+            format_day(catalog, day, [
+                (recipe_id if recipe_id >= 0 else None, portion)
+                for recipe_id, portion in zip(ids[user][day_index], portions[user][day_index])
+            ])
+            for day_index, day in enumerate(DAYS)
+        ]
+        for user in range(len(ids))
+    ]
+
+def _plan_inputs(session: UserSessionContext) -> Tuple[int, FrozenSet[str]]:
+    goal = session.goal or {}
+    diet_keywords = (goal.get("parsed_details") or {}).get("diet_keywords") or []
+    caloric_goal = estimate_caloric_goal(goal) if goal else DEFAULT_CALORIC_GOAL
+    return caloric_goal, parse_restrictions(session.diet_preferences, diet_keywords)
+
+def _save_meal_plan(session_store: SessionStore, user_id: str, session: UserSessionContext, meal_plan: List[str]) -> bool:
+    """
+    Saves a meal plan built from the session as it was read. If another writer saved the session
+    meanwhile (e.g. /set_goal), the plan is rebuilt from the reloaded session's goal and diet
+    preferences, so a plan for the old goal never overwrites the new one.
+    Returns False if the session was deleted meanwhile.
+    """
+    inputs = _plan_inputs(session)
+    for attempt in range(MAX_SAVE_ATTEMPTS):
+        session.meal_plan = meal_plan
+        try:
+            session_store.put(user_id, session)
+            return True
+        except SessionConflictError:
+            if attempt == MAX_SAVE_ATTEMPTS - 1:
+                raise
+        session = session_store.get(user_id)
+        if session is None:
+            return False
+        latest_inputs = _plan_inputs(session)
+        if latest_inputs != inputs:
+            inputs = latest_inputs
+            meal_plan = plan_meals_batch([inputs[0]], [inputs[1]])[0]
+    return False
+
+def refresh_meal_plans(
+    session_store: SessionStore,
+    user_ids: Iterable[str],
+    batch_size: int = 1000,
+) -> Tuple[int, List[str]]:
+    """
+    Regenerates and saves meal plans for every listed user that has a session, in batches.
+    Returns (number of users updated, user ids that had no session).
+    """
+    updated = 0
+    missing: List[str] = []
+    batch: List[Tuple[str, UserSessionContext]] = []
+
+    def flush():
+        nonlocal updated
+        if not batch:
+            return
+        goals, restriction_sets = zip(*(_plan_inputs(session) for _, session in batch))
+        for (user_id, session), meal_plan in zip(batch, plan_meals_batch(goals, restriction_sets)):
+            if _save_meal_plan(session_store, user_id, session, meal_plan):
+                updated += 1
+            else:
+                missing.append(user_id)
+        batch.clear()
+
+    for user_id in user_ids:
+        session: Optional[UserSessionContext] = session_store.get(user_id)
+        if session is None:
+            missing.append(user_id)
+            continue
+        batch.append((user_id, session))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return updated, missing
@@ -0,0 +1,154 @@
+import re
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from services.recipe_catalog import MEAL_TYPES, RecipeCatalog, get_catalog
+
+# Meal-plan generation for MealPlannerTool and /set_goal, backed by the bundled recipe catalog.
+
+DAYS: Tuple[str, ...] = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Share of the daily calorie target given to each meal. Dinner absorbs whatever
+# breakfast and lunch leave over, so each day lands as close to the target as possible.
+MEAL_CALORIE_SPLIT = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.40}
+
+# Portions are scaled in quarter servings between these bounds to close the gap
+# between a recipe's calories and its share of the target.
+MIN_SERVINGS = 0.5
+MAX_SERVINGS = 2.0
+
+DEFAULT_CALORIC_GOAL = 2000
+MIN_CALORIC_GOAL = 1200
+MAX_CALORIC_GOAL = 4000
+
+CALORIES_BY_GOAL_TYPE = {
+    "weight_loss": 1700, "weight_gain": 2700, "muscle_gain": 2600, "endurance": 2400,
+    "maintenance": 2100, "general_fitness": 2000, "flexibility": 2000, "diet": 2000,
+}
+
+# Diet words map straight to catalog tags.
+DIET_TAGS = {
+    "vegetarian": "vegetarian", "veggie": "vegetarian", "vegan": "vegan", "plant based": "vegan",
+    "plant-based": "vegan", "pescatarian": "pescatarian", "keto": "keto", "ketogenic": "keto",
+    "low carb": "low-carb", "low-carb": "low-carb", "high protein": "high-protein",
+    "high-protein": "high-protein", "halal": "halal", "celiac": "gluten-free", "coeliac": "gluten-free",
+}
+
+# Allergen words map to "<allergen>-free" tags, but only in an excluding context
+# ("no nuts", "nut-free", "dairy allergy") or as a bare item in the restrictions list.
+ALLERGEN_TAGS = {
+    "nut": "nut-free", "nuts": "nut-free", "peanut": "nut-free", "peanuts": "nut-free", "tree nuts": "nut-free",
+    "gluten": "gluten-free", "wheat": "gluten-free", "dairy": "dairy-free", "lactose": "dairy-free",
+    "milk": "dairy-free", "egg": "egg-free", "eggs": "egg-free", "soy": "soy-free", "fish": "fish-free",
+    "shellfish": "shellfish-free", "shrimp": "shellfish-free",
+}
+
+def _alternation(words: Iterable[str]) -> str:
+    return "|".join(sorted((re.escape(word) for word in words), key=len, reverse=True))
+
+DIET_PATTERN = re.compile(r"(?<![\w-])(" + _alternation(DIET_TAGS) + r")(?![\w-])")
+ALLERGEN_EXCLUSION_PATTERN = re.compile(
+    r"(?:\b(?:no|without|avoid|avoids|allergic to|allergy to|intolerant to)\s+(" + _alternation(ALLERGEN_TAGS) + r")\b)"
+    r"|(?:\b(" + _alternation(ALLERGEN_TAGS) + r")[\s-]*(?:free|allergy|allergies|intolerance|intolerant)\b)"
+)
+
+def parse_restrictions(dietary_preferences: Optional[str] = None, restrictions: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+    """
+    Turns free-text preferences and a list of restrictions into the set of catalog tags
+    every selected recipe must carry.
+    """
+    tags = set()
+    texts = [dietary_preferences or ""] + [item for item in (restrictions or []) if item]
+    for text in texts:
+        text = text.lower().strip()
+        tags.update(DIET_TAGS[match] for match in DIET_PATTERN.findall(text))
+        for match in ALLERGEN_EXCLUSION_PATTERN.finditer(text):
+            tags.add(ALLERGEN_TAGS[match.group(1) or match.group(2)])
+    for item in restrictions or []:
+        item = (item or "").lower().strip()
+        if item in ALLERGEN_TAGS:
+            tags.add(ALLERGEN_TAGS[item])
+    return frozenset(tags)
+
+def estimate_caloric_goal(goal: Optional[dict]) -> int:
+    """
+    Picks a daily calorie target for an analyzed goal (see services/goal_parser.py).
+    """
+    goal_type = ((goal or {}).get("parsed_details") or {}).get("goal_type")
+    return CALORIES_BY_GOAL_TYPE.get(goal_type, DEFAULT_CALORIC_GOAL)
+
+def _nearest(catalog: RecipeCatalog, ids: Iterable[int], target: float) -> List[int]:
+    # Recipe ids ordered by distance from the calorie target (ties broken by id for determinism).
+    calories = catalog.calories
+    return sorted(ids, key=lambda recipe_id: (abs(calories[recipe_id] - target), recipe_id))
+
+def _servings(calories: int, target: float) -> float:
+    servings = round(target / calories * 4) / 4
+    return min(max(servings, MIN_SERVINGS), MAX_SERVINGS)
+
+def _describe(catalog: RecipeCatalog, meal: str, recipe_id: Optional[int], servings: float) -> str:
+    if recipe_id is None:
+        return f"{meal.capitalize()}: no recipe matches your restrictions"
+    portion = "" if servings == 1 else f" x{servings:g}"
+    return f"{meal.capitalize()}: {catalog.names[recipe_id]}{portion} ({catalog.calories[recipe_id] * servings:.0f} kcal)"
+
+def format_day(catalog: RecipeCatalog, day: str, meals: Sequence[Tuple[Optional[int], float]]) -> str:
+    """
+    Renders one plan line from (recipe_id, servings) pairs in MEAL_TYPES order.
+    """
+    chosen = [(recipe_id, servings) for recipe_id, servings in meals if recipe_id is not None]
+    total_calories = sum(catalog.calories[recipe_id] * servings for recipe_id, servings in chosen)
+    total_protein = sum(catalog.protein_g[recipe_id] * servings for recipe_id, servings in chosen)
+    described = ", ".join(
+        _describe(catalog, meal, recipe_id, servings) for meal, (recipe_id, servings) in zip(MEAL_TYPES, meals)
+    )
+    return f"{day}: {described} | Total: {total_calories:.0f} kcal, {total_protein:.0f} g protein"
+
+@lru_cache(maxsize=4096)
+def _build_plan(tags: FrozenSet[str], caloric_goal: int) -> Tuple[str, ...]:
+    catalog = get_catalog()
+    breakfast_target = caloric_goal * MEAL_CALORIE_SPLIT["breakfast"]
+    lunch_target = caloric_goal * MEAL_CALORIE_SPLIT["lunch"]
+
+    # The 7 closest breakfasts and lunches, one per day (repeating if fewer than 7 match).
+    breakfasts = _nearest(catalog, catalog.matching("breakfast", tags), breakfast_target)[:len(DAYS)]
+    lunches = _nearest(catalog, catalog.matching("lunch", tags), lunch_target)[:len(DAYS)]
+    dinner_ids = catalog.matching("dinner", tags)
+
+    plan = []
+    used_dinners = set()
+    for day_index, day in enumerate(DAYS):
+        breakfast = breakfasts[day_index % len(breakfasts)] if breakfasts else None
+        lunch = lunches[day_index % len(lunches)] if lunches else None
+        servings = {}
+        if breakfast is not None:
+            servings[breakfast] = _servings(catalog.calories[breakfast], breakfast_target)
+        if lunch is not None:
+            servings[lunch] = _servings(catalog.calories[lunch], lunch_target)
+        eaten = sum(catalog.calories[recipe_id] * portion for recipe_id, portion in servings.items())
+
+        # Dinner fills the rest of the day's target, without repeating a dinner until all have been used.
+        available = dinner_ids - used_dinners
+        if not available:
+            used_dinners.clear()
+            available = dinner_ids
+        ranked = _nearest(catalog, available, caloric_goal - eaten)
+        dinner = ranked[0] if ranked else None
+        if dinner is not None:
+            used_dinners.add(dinner)
+            servings[dinner] = _servings(catalog.calories[dinner], caloric_goal - eaten)
+
+        plan.append(format_day(catalog, day, [(recipe_id, servings.get(recipe_id, 1.0)) for recipe_id in (breakfast, lunch, dinner)]))
+    return tuple(plan)
+
+def generate_meal_plan(
+    dietary_preferences: Optional[str] = None,
+    restrictions: Optional[List[str]] = None,
+    caloric_goal: Optional[int] = None,
+) -> List[str]:
+    """
+    Builds a 7-day x 3-meal plan from the recipe catalog that respects every restriction
+    and keeps each day close to the calorie target. Identical inputs are served from a cache.
+    """
+    caloric_goal = min(max(int(caloric_goal or DEFAULT_CALORIC_GOAL), MIN_CALORIC_GOAL), MAX_CALORIC_GOAL)
+    return list(_build_plan(parse_restrictions(dietary_preferences, restrictions), caloric_goal))
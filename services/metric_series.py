@@ -0,0 +1,432 @@
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+from services.db import connect
+from services.goal_parser import KG_PER_LB
+
+# Numeric progress metrics (weight, steps, reps, calories, ...) stored per user as columnar time
+# series: int64 epoch-second timestamps and float64 values in growable NumPy arrays, with metric
+# names interned. A data point costs 16 bytes in memory instead of a dict of strings, and trend
+# questions are answered from aggregates (rolling average, weekly deltas, slope toward the goal)
+# rather than by handing the raw log to the model.
+# Points are appended to SQLite for durability; a user's series are loaded on first access and
+# kept in a bounded LRU. Every write bumps the user's row in metric_versions, and reads reload
+# a cached user whose version changed, so points written by other workers are never missed.
+# A metric's series has one unit (see resolve_unit): known metrics have a canonical unit, other
+# metrics take the first explicit unit they get, and readings in another unit are rejected.
+
+DAY_SECONDS = 24 * 3600
+WEEK_SECONDS = 7 * DAY_SECONDS
+WEEK_OFFSET_SECONDS = 4 * DAY_SECONDS # The epoch is a Thursday; shift so weeks start on Monday
+
+# Canonical metric names for what users (and the model) type.
+METRIC_ALIASES: Dict[str, str] = {
+    "weight": "weight", "my weight": "weight", "body weight": "weight", "bodyweight": "weight",
+    "steps": "steps", "step": "steps", "step count": "steps",
+    "sleep": "sleep", "hours of sleep": "sleep",
+    "water": "water", "water intake": "water",
+    "calories": "calories", "calorie intake": "calories", "kcal": "calories",
+    "distance": "distance", "run": "distance", "running": "distance", "walk": "distance",
+    "heart rate": "heart_rate", "resting heart rate": "heart_rate", "hr": "heart_rate", "pulse": "heart_rate",
+    "body fat": "body_fat", "bodyfat": "body_fat", "fat": "body_fat",
+    "workout": "workout_minutes", "exercise": "workout_minutes", "workout minutes": "workout_minutes",
+    "reps": "reps", "push ups": "reps", "pushups": "reps",
+    "waist": "waist",
+}
+
+# Unit spelling -> (canonical unit, factor to convert into it)
+UNIT_CONVERSIONS: Dict[str, Tuple[str, float]] = {
+    "kg": ("kg", 1.0), "kgs": ("kg", 1.0), "kilo": ("kg", 1.0), "kilos": ("kg", 1.0),
+    "lb": ("kg", KG_PER_LB), "lbs": ("kg", KG_PER_LB), "pound": ("kg", KG_PER_LB), "pounds": ("kg", KG_PER_LB),
+    "km": ("km", 1.0), "kilometer": ("km", 1.0), "kilometers": ("km", 1.0),
+    "mi": ("km", 1.609344), "mile": ("km", 1.609344), "miles": ("km", 1.609344),
+    "h": ("hours", 1.0), "hr": ("hours", 1.0), "hrs": ("hours", 1.0), "hour": ("hours", 1.0), "hours": ("hours", 1.0),
+    "min": ("minutes", 1.0), "mins": ("minutes", 1.0), "minute": ("minutes", 1.0), "minutes": ("minutes", 1.0),
+    "l": ("l", 1.0), "liter": ("l", 1.0), "liters": ("l", 1.0), "litre": ("l", 1.0), "litres": ("l", 1.0),
+    "glass": ("l", 0.25), "glasses": ("l", 0.25), "ml": ("l", 0.001),
+    "kcal": ("kcal", 1.0), "cal": ("kcal", 1.0), "calories": ("kcal", 1.0),
+    "%": ("%", 1.0), "bpm": ("bpm", 1.0), "cm": ("cm", 1.0), "steps": ("steps", 1.0), "reps": ("reps", 1.0),
+}
+# Canonical unit of each known metric.
+METRIC_UNITS: Dict[str, str] = {
+    "weight": "kg", "steps": "steps", "sleep": "hours", "water": "l", "calories": "kcal", "distance": "km",
+    "heart_rate": "bpm", "body_fat": "%", "workout_minutes": "minutes", "reps": "reps", "waist": "cm",
+}
+# Known metrics where a bare number can only mean the canonical unit ('8000' steps, '62' bpm).
+# Weight, distance, water and waist need a unit: '176' could be pounds or kilograms.
+UNITLESS_METRICS = frozenset({"steps", "sleep", "calories", "heart_rate", "body_fat", "workout_minutes", "reps"})
+METRIC_VALUE_PATTERN = re.compile(r"^\s*(-?\d+(?:,\d{3})*(?:\.\d+)?)\s*([a-z%]*)\s*$")
+
+def canonical_metric(metric_name: str) -> str:
+    name = " ".join((metric_name or "").lower().replace("_", " ").split())
+    return sys.intern(METRIC_ALIASES.get(name, name.replace(" ", "_")))
+
+def parse_metric_value(metric_value: str) -> Optional[Tuple[float, str]]:
+    """
+    Parses '72 kg', '160lbs', '8,000 steps' or '7.5' into (value in the canonical unit, unit).
+    Returns None if the text is not a number with an optional known unit.
+    """
+    match = METRIC_VALUE_PATTERN.match((metric_value or "").lower())
+    if not match:
+        return None
+    return convert_unit(float(match.group(1).replace(",", "")), match.group(2))
+
+def convert_unit(value: float, unit: Optional[str]) -> Optional[Tuple[float, str]]:
+    """
+    (value, unit) converted to the canonical unit; None for an unknown unit.
+    """
+    unit = (unit or "").strip().lower()
+    if not unit:
+        return value, ""
+    if unit not in UNIT_CONVERSIONS:
+        return None
+    canonical_unit, factor = UNIT_CONVERSIONS[unit]
+    return round(value * factor, 4), canonical_unit
+
+class UnitMismatchError(ValueError):
+    """
+    A reading whose (canonical) unit differs from the unit its metric is already tracked in.
+    """
+
+    def __init__(self, metric: str, unit: str, series_unit: str):
+        self.metric = metric
+        self.unit = unit
+        self.series_unit = series_unit
+        if series_unit and not unit:
+            message = f"{metric} is tracked in {series_unit}; give the unit, e.g. '72 {series_unit}'."
+        else:
+            message = f"{metric} is tracked in {series_unit or 'no unit'}, not {unit or 'no unit'}."
+        super().__init__(message)
+
+def resolve_unit(metric: str, unit: str, series_unit: Optional[str]) -> str:
+    """
+    The unit a reading of the (canonical) metric is stored in, given its canonical unit and the
+    unit of the user's series (None if there is none yet). A series without a unit takes on the
+    first explicit one. Raises UnitMismatchError if the reading does not fit the series.
+    """
+    if not unit and metric in UNITLESS_METRICS:
+        unit = METRIC_UNITS[metric]
+    expected = series_unit or METRIC_UNITS.get(metric)
+    if expected is not None and unit != expected:
+        raise UnitMismatchError(metric, unit, expected)
+    return unit
+
+class _Series:
+    """
+    One metric's points, sorted by timestamp, in arrays that double in capacity as they fill.
+    """
+    __slots__ = ("timestamps", "values", "size", "unit")
+
+    def __init__(self, unit: str = "", capacity: int = 16):
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+        self.unit = unit
+
+    def append(self, timestamp: int, value: float) -> None:
+        if self.size == len(self.timestamps):
+            self.timestamps = np.resize(self.timestamps, self.size * 2)
+            self.values = np.resize(self.values, self.size * 2)
+        # Points almost always arrive in order; back-dated ones are inserted at their position.
+        index = self.size if self.size == 0 or timestamp >= self.timestamps[self.size - 1] else int(
+            np.searchsorted(self.timestamps[:self.size], timestamp, side="right"))
+        self.timestamps[index + 1:self.size + 1] = self.timestamps[index:self.size]
+        self.values[index + 1:self.size + 1] = self.values[index:self.size]
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+        self.size += 1
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.timestamps[:self.size], self.values[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.values.nbytes
+
+def rolling_average(timestamps: np.ndarray, values: np.ndarray, window_seconds: int) -> np.ndarray:
+    """
+    For every point, the mean of the points in the trailing window (timestamp - window, timestamp].
+    """
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    starts = np.searchsorted(timestamps, timestamps - window_seconds, side="right")
+    ends = np.arange(1, len(values) + 1)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+def weekly_deltas(timestamps: np.ndarray, values: np.ndarray, weeks: int) -> List[Dict]:
+    """
+    Week-over-week change of the weekly mean, for the last `weeks` weeks that have data.
+    """
+    week_index = (timestamps - WEEK_OFFSET_SECONDS) // WEEK_SECONDS
+    unique_weeks, starts = np.unique(week_index, return_index=True)
+    means = np.add.reduceat(values, starts) / np.diff(np.append(starts, len(values)))
+    deltas = np.diff(means)
+    return [
+        {"week_of": datetime.fromtimestamp(int(week) * WEEK_SECONDS + WEEK_OFFSET_SECONDS).date().isoformat(), "mean": round(float(mean), 2),
+         "delta": round(float(delta), 2)}
+        for week, mean, delta in zip(unique_weeks[1:][-weeks:], means[1:][-weeks:], deltas[-weeks:])
+    ]
+
+def trend_slope_per_week(timestamps: np.ndarray, values: np.ndarray) -> Optional[float]:
+    """
+    Least-squares slope of value over time, in units per week (None with fewer than 2 distinct times).
+    """
+    if len(values) < 2 or timestamps[0] == timestamps[-1]:
+        return None
+    weeks = (timestamps - timestamps[0]) / WEEK_SECONDS
+    slope, _ = np.polyfit(weeks, values, 1)
+    return float(slope)
+
+class MetricStore:
+    """
+    Columnar per-user metric time series with NumPy aggregates, persisted in SQLite.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_users: int = 10000, conn: Optional[sqlite3.Connection] = None):
+        self.max_users = max_users
+        self._conn = conn or connect(path)
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, Dict[str, _Series]]" = OrderedDict()
+        self._versions: Dict[str, int] = {} # metric_versions.version each cached user was loaded at
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metric_points ("
+            " user_id TEXT NOT NULL,"
+            " metric TEXT NOT NULL,"
+            " ts INTEGER NOT NULL,"
+            " value REAL NOT NULL,"
+            " unit TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_metric_points_user ON metric_points (user_id, metric, ts)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS metric_versions (user_id TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    def record(self, user_id: str, metric_name: str, value: float, unit: str = "", timestamp: Optional[datetime] = None) -> Tuple[str, float, str]:
+        """
+        Appends one point; returns (canonical metric name, value, unit).
+        Raises UnitMismatchError if the unit does not fit the metric (see resolve_unit).
+        """
+        metric = canonical_metric(metric_name)
+        ts = int((timestamp.timestamp() if timestamp else time.time()))
+        with self._lock:
+            rows, adopted = self._resolve_units(user_id, [(user_id, metric, ts, value, unit)])
+            self._write(user_id, rows, adopted=adopted)
+        return metric, value, rows[0][4]
+
+    def record_many(
+        self,
+        user_id: str,
+        points: Sequence[Tuple[str, datetime, float, str]],
+        also: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ) -> int:
+        """
+        Appends many (metric name, timestamp, value, canonical unit) points in one transaction.
+        Returns the number of points written. Raises UnitMismatchError (writing nothing) if a
+        point's unit does not fit its metric; bulk callers validate rows first (see units()).
+        `also(conn)` runs inside the same transaction, so its writes commit or roll back with the points.
+        """
+        rows = self._rows(user_id, points)
+        with self._lock:
+            rows, adopted = self._resolve_units(user_id, rows)
+            self._write(user_id, rows, also, adopted)
+        return len(rows)
+
+    def units(self, user_id: str) -> Dict[str, str]:
+        """
+        Unit of each metric the user already tracks.
+        """
+        with self._lock:
+            return {metric: series.unit for metric, series in self._load(user_id).items()}
+
+    @staticmethod
+    def _rows(user_id: str, points: Sequence[Tuple[str, datetime, float, str]]) -> List[Tuple[str, str, int, float, str]]:
+        rows = [(user_id, canonical_metric(metric), int(timestamp.timestamp()), value, unit) for metric, timestamp, value, unit in points]
+        rows.sort(key=lambda row: (row[1], row[2])) # In-order appends are the cheap path in _Series
+        return rows
+
+    def _resolve_units(self, user_id: str, rows: Sequence[Tuple[str, str, int, float, str]]) -> Tuple[List[Tuple[str, str, int, float, str]], Dict[str, str]]:
+        # Caller must hold self._lock. Returns the rows with their stored unit (resolve_unit against
+        # the series) and the unit each existing unitless series takes on.
+        series_by_metric = self._load(user_id)
+        units: Dict[str, Optional[str]] = {metric: series.unit for metric, series in series_by_metric.items()}
+        resolved = []
+        for user, metric, ts, value, unit in rows:
+            unit = units[metric] = resolve_unit(metric, unit, units.get(metric))
+            resolved.append((user, metric, ts, value, unit))
+        adopted = {metric: units[metric] for metric, series in series_by_metric.items() if not series.unit and units[metric]}
+        return resolved, adopted
+
+    @staticmethod
+    def _insert_rows(conn: sqlite3.Connection, user_id: str, rows: Sequence[Tuple[str, str, int, float, str]], adopted: Dict[str, str]) -> int:
+        # Inserts rows and bumps the user's version inside the caller's open transaction on `conn`.
+        # Series stored without a unit take the unit in `adopted` (see resolve_unit).
+        for metric, unit in adopted.items():
+            conn.execute("UPDATE metric_points SET unit = ? WHERE user_id = ? AND metric = ? AND unit = ''", (unit, user_id, metric))
+        conn.executemany("INSERT INTO metric_points (user_id, metric, ts, value, unit) VALUES (?, ?, ?, ?, ?)", rows)
+        return conn.execute(
+            "INSERT INTO metric_versions (user_id, version) VALUES (?, 1)"
+            " ON CONFLICT (user_id) DO UPDATE SET version = version + 1 RETURNING version",
+            (user_id,),
+        ).fetchone()[0]
+
+    def _write(
+        self,
+        user_id: str,
+        rows: Sequence[Tuple[str, str, int, float, str]],
+        also: Optional[Callable[[sqlite3.Connection], None]] = None,
+        adopted: Optional[Dict[str, str]] = None,
+    ) -> None:
+        # Caller must hold self._lock.
+        self._conn.execute("BEGIN")
+        try:
+            if also is not None:
+                also(self._conn)
+            version = self._insert_rows(self._conn, user_id, rows, adopted or {})
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._apply(user_id, rows, version)
+
+    def _apply(self, user_id: str, rows: Sequence[Tuple[str, str, int, float, str]], version: int) -> None:
+        # Caller must hold self._lock. Appends committed rows (now at `version`) to the cached
+        # series if the cache was current before this write; otherwise drops it for a reload.
+        series_by_metric = self._users.get(user_id)
+        if series_by_metric is None:
+            return
+        if self._versions.get(user_id) != version - 1:
+            del self._users[user_id] # Another worker wrote in between
+            self._versions.pop(user_id, None)
+            return
+        for _, metric, ts, value, unit in rows:
+            series = series_by_metric.get(metric)
+            if series is None:
+                series = series_by_metric[metric] = _Series(sys.intern(unit))
+            series.unit = series.unit or sys.intern(unit)
+            series.append(ts, value)
+        self._versions[user_id] = version
+
+    def record_text(self, user_id: str, metric_name: str, metric_value: str, timestamp: Optional[datetime] = None) -> Optional[Tuple[str, float, str]]:
+        """
+        record() for a value given as text ('72 kg', '160 lbs'); None if it is not numeric.
+        Raises UnitMismatchError like record().
+        """
+        parsed = parse_metric_value(metric_value)
+        if parsed is None:
+            return None
+        return self.record(user_id, metric_name, parsed[0], parsed[1], timestamp)
+
+    def metrics(self, user_id: str) -> List[str]:
+        with self._lock:
+            return sorted(self._load(user_id))
+
+    def series(self, user_id: str, metric_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (timestamps, values) for one metric; copies, so callers may keep them.
+        """
+        with self._lock:
+            series = self._load(user_id).get(canonical_metric(metric_name))
+            if series is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+            timestamps, values = series.view()
+            return timestamps.copy(), values.copy()
+
+    def summary(self, user_id: str, metric_name: str, goal: Optional[dict] = None, window_days: int = 7, weeks: int = 4) -> Optional[Dict]:
+        """
+        Compact trend summary for one metric, or None if the user has no points for it.
+        For weight with an analyzed goal it also reports progress toward the target.
+        """
+        metric = canonical_metric(metric_name)
+        with self._lock:
+            series = self._load(user_id).get(metric)
+            unit = series.unit if series is not None else ""
+        timestamps, values = self.series(user_id, metric)
+        if len(values) == 0:
+            return None
+        rolling = rolling_average(timestamps, values, window_days * DAY_SECONDS)
+        slope = trend_slope_per_week(timestamps, values)
+        summary = {
+            "metric": metric,
+            "unit": unit,
+            "points": int(len(values)),
+            "first": {"timestamp": datetime.fromtimestamp(int(timestamps[0])).isoformat(), "value": float(values[0])},
+            "latest": {"timestamp": datetime.fromtimestamp(int(timestamps[-1])).isoformat(), "value": float(values[-1])},
+            "min": float(values.min()),
+            "max": float(values.max()),
+            f"rolling_{window_days}d_average": round(float(rolling[-1]), 2),
+            "weekly_deltas": weekly_deltas(timestamps, values, weeks),
+            "trend_per_week": round(slope, 3) if slope is not None else None,
+        }
+        if metric == "weight" and goal:
+            summary["goal_progress"] = _weight_goal_progress(values, slope, goal)
+        return summary
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(series.nbytes for series_by_metric in self._users.values() for series in series_by_metric.values())
+
+    def _load(self, user_id: str) -> Dict[str, _Series]:
+        # Caller must hold self._lock. Returns the user's series, reading them from SQLite on a miss
+        # or when another worker has written since they were loaded (one primary-key lookup).
+        row = self._conn.execute("SELECT version FROM metric_versions WHERE user_id = ?", (user_id,)).fetchone()
+        version = row[0] if row else 0
+        series_by_metric = self._users.get(user_id)
+        if series_by_metric is not None and self._versions.get(user_id) == version:
+            self._users.move_to_end(user_id)
+            return series_by_metric
+        series_by_metric = {}
+        rows = self._conn.execute(
+            "SELECT metric, ts, value, unit FROM metric_points WHERE user_id = ? ORDER BY metric, ts", (user_id,)
+        ).fetchall()
+        for metric, ts, value, unit in rows:
+            metric = sys.intern(metric)
+            series = series_by_metric.get(metric)
+            if series is None:
+                series = series_by_metric[metric] = _Series(sys.intern(unit))
+            series.append(ts, value)
+        self._users[user_id] = series_by_metric
+        self._users.move_to_end(user_id)
+        self._versions[user_id] = version
+        while len(self._users) > self.max_users:
+            evicted, _ = self._users.popitem(last=False)
+            self._versions.pop(evicted, None)
+        return series_by_metric
+
+def _weight_goal_progress(values: np.ndarray, slope: Optional[float], goal: dict) -> Optional[Dict]:
+    details = goal.get("parsed_details") or {}
+    target_kg = details.get("target_kg")
+    direction = {"weight_loss": -1.0, "weight_gain": 1.0, "muscle_gain": 1.0}.get(details.get("goal_type"))
+    if not target_kg or direction is None:
+        return None
+    target_weight = float(values[0]) + direction * target_kg
+    remaining = (target_weight - float(values[-1])) * direction # kg still to lose/gain; <= 0 once reached
+    progress = {
+        "target_weight": round(target_weight, 2),
+        "remaining": round(remaining, 2),
+        "percent_complete": round(min(max(1 - remaining / target_kg, 0.0), 1.0) * 100, 1),
+        "weeks_to_target": None,
+        "on_track": None,
+    }
+    if remaining <= 0:
+        progress["weeks_to_target"] = 0.0
+    elif slope and slope * direction > 0:
+        progress["weeks_to_target"] = round(remaining / (slope * direction), 1)
+    deadline = details.get("deadline")
+    if deadline:
+        weeks_left = (datetime.fromisoformat(deadline) - datetime.now()).days / 7
+        progress["on_track"] = progress["weeks_to_target"] is not None and progress["weeks_to_target"] <= max(weeks_left, 0)
+    return progress
+
+@lru_cache(maxsize=1)
+def get_metric_store() -> MetricStore:
+    """
+    Process-wide metric store on the database configured in config.py (shared by api.py and the tools).
+    """
+    return MetricStore(config.DATABASE_PATH, max_users=config.SESSION_CACHE_SIZE)
@@ -0,0 +1,193 @@
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# In-process metrics with Prometheus text exposition (GET /metrics in api.py).
+# Histograms have fixed buckets: recording a value is one bisect and a few integer updates under
+# a lock, cheap enough for every request, tool call and model call. Nothing is sampled or
+# aggregated in the background; render() snapshots everything when /metrics is scraped.
+# The hooks that feed these metrics live in services/instrumentation.py.
+
+# Seconds; from a cached lookup (~1 ms) up to slow multi-turn agent runs.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Estimated prompt tokens per model call.
+TOKEN_BUCKETS: Tuple[float, ...] = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+
+class Gauge(Metric):
+    """A value read from `read()` at scrape time (queue depth, cache size, ...)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        try:
+            yield f"{self.name} {_number(self.read())}"
+        except Exception as e:
+            print(f"Gauge {self.name} failed: {e}")
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (+Inf last), sum]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def quantile(self, q: float, *label_values: str) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None without observations)."""
+        series = self._series.get(label_values)
+        if not series:
+            return None
+        counts = series[0]
+        rank, seen = q * sum(counts), 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series = [(label_values, list(counts), total[0]) for label_values, (counts, total) in self._series.items()]
+        for label_values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket{_labels(self.label_names, label_values, 'le="' + le + '"')} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, label_values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, label_values)} {cumulative}"
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing # Same name: the metric already recording under it
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        gauge = self.register(Gauge(name, documentation, read))
+        gauge.read = read # Re-registered (e.g. the app was rebuilt): read the current object
+        return gauge
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# Process-wide registry and the hot-path metrics recorded by services/instrumentation.py.
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from request start to the last response byte, by route template.",
+    ("method", "route", "status"),
+)
+TOOL_CALL_SECONDS = REGISTRY.histogram(
+    "tool_call_duration_seconds", "Function tool invocation time, from the agent or the intent router.",
+    ("tool", "outcome"),
+)
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    "model_call_duration_seconds", "Model call time (cache hits excluded); streamed calls end at the last event.",
+    ("model", "mode", "outcome"),
+)
+MODEL_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "model_time_to_first_token_seconds", "Time from a streamed model call to its first text delta.", ("model",),
+)
+MODEL_TOKENS = REGISTRY.counter("model_tokens_total", "Tokens reported by the model, by direction.", ("model", "direction"))
+HANDOFFS = REGISTRY.counter("agent_handoffs_total", "Specialist handoffs, by specialist and who decided.", ("handoff_type", "source"))
+HANDOFF_SECONDS = REGISTRY.histogram(
+    "agent_handoff_duration_seconds", "Time from a chat handoff to the end of the specialist's turn, by specialist and who decided.",
+    ("handoff_type", "source"),
+)
+MODEL_RETRIES = REGISTRY.counter("model_call_retries_total", "Model call attempts retried, by reason.", ("model", "reason"))
+MODEL_HEDGES = REGISTRY.counter("model_call_hedges_total", "Slow model calls hedged with a second attempt, by which attempt won.", ("model", "winner"))
+ADMISSION_REJECTED = REGISTRY.counter("admission_rejected_total", "Requests rejected before reaching a route, by reason.", ("reason",))
+PROMPT_TOKENS = REGISTRY.histogram(
+    "model_prompt_tokens", "Estimated prompt tokens per agent model call, before compaction (baseline) and as sent.",
+    ("stage",), buckets=TOKEN_BUCKETS,
+)
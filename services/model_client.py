@@ -0,0 +1,253 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+from agents import Model, ModelResponse
+from openai import (
+    APIConnectionError, APIStatusError, AsyncOpenAI, DefaultAsyncHttpxClient, InternalServerError, RateLimitError,
+)
+
+import config
+from services.metrics import MODEL_HEDGES, MODEL_RETRIES
+
+# Client layer between the agents and the model endpoint (wired up in config.get_model()):
+#   * one pooled httpx transport per process (connection limits, keep-alive, optional HTTP/2),
+#   * UpstreamLimiter: a cap on requests in flight plus a token bucket matched to the provider quota,
+#   * ResilientModel: retries with jittered exponential backoff (honouring Retry-After) on 429s,
+#     5xx and connection errors, and optional hedging of slow non-streamed calls.
+# The OpenAI client's own retries are turned off so attempts are not multiplied.
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average, with bursts of up to `capacity`.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+class UpstreamLimiter:
+    """
+    Admission for upstream model requests: at most `max_concurrent` in flight, and (with
+    `requests_per_minute` > 0) no more than the token bucket allows. Extra callers wait.
+    """
+
+    def __init__(self, max_concurrent: int, requests_per_minute: float = 0, burst: int = 10):
+        self.max_concurrent = max_concurrent
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._bucket = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute > 0 else None
+        self.in_flight = 0
+        self.waiting = 0
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.in_flight < self.max_concurrent and self.waiting == 0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            if self._bucket is not None:
+                await self._bucket.acquire()
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+        finally:
+            self._semaphore.release()
+
+def retry_reason(error: BaseException) -> Optional[str]:
+    """Why `error` is worth retrying ("rate_limited", "server_error", "connection"), or None."""
+    if isinstance(error, RateLimitError):
+        return "rate_limited"
+    if isinstance(error, InternalServerError) or (isinstance(error, APIStatusError) and error.status_code in (408, 409)):
+        return "server_error"
+    if isinstance(error, APIConnectionError): # Includes timeouts
+        return "connection"
+    return None
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None # HTTP-date form; fall back to backoff
+
+class ResilientModel(Model):
+    """
+    Model wrapper sending every call through the limiter, retrying transient failures, and
+    (with `hedge_after`) starting a second attempt when a non-streamed call is slower than
+    `hedge_after` seconds, keeping whichever finishes first. Streamed calls are retried only
+    until their first event and are never hedged.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        limiter: UpstreamLimiter,
+        name: str,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        hedge_after: Optional[float] = None,
+    ):
+        self.model = model
+        self.limiter = limiter
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+
+    def _delay(self, attempt: int, error: BaseException) -> float:
+        # Full jitter spreads out clients that failed together; Retry-After is a lower bound.
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = _retry_after(error)
+        return min(self.backoff_max, max(delay, retry_after)) if retry_after is not None else delay
+
+    async def _limited(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        async with self.limiter.slot():
+            return await call()
+
+    async def _hedged(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        first = asyncio.create_task(self._limited(call))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            # Hedge only with spare capacity, so hedges never queue ahead of first attempts.
+            hedged = not done and self.limiter.has_capacity
+            if hedged:
+                tasks.add(asyncio.create_task(self._limited(call)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedged:
+                            MODEL_HEDGES.inc(self.name, "first" if task is first else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> ModelResponse:
+        def call():
+            return self.model.get_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs,
+            )
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await (self._hedged(call) if self.hedge_after else self._limited(call))
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or attempt == self.max_retries:
+                    raise
+                MODEL_RETRIES.inc(self.name, reason)
+                await asyncio.sleep(self._delay(attempt, e))
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self.limiter.slot():
+                    async for event in self.model.stream_response(
+                        system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs,
+                    ):
+                        started = True
+                        yield event
+                return
+            except Exception as e:
+                reason = retry_reason(e)
+                if started or reason is None or attempt == self.max_retries:
+                    raise # Events already reached the caller; a retry would repeat them
+                MODEL_RETRIES.inc(self.name, reason)
+                await asyncio.sleep(self._delay(attempt, e))
+
+def _http2_available() -> bool:
+    try:
+        import h2 # noqa: F401 (httpx needs it for HTTP/2)
+    except ImportError:
+        print("MODEL_HTTP2 is set but the h2 package is not installed; using HTTP/1.1.")
+        return False
+    return True
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Pooled HTTP transport for the model endpoint, tuned by the MODEL_HTTP_* settings.
+    """
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=config.MODEL_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.MODEL_HTTP_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.MODEL_HTTP_KEEPALIVE_SECONDS,
+        ),
+        timeout=httpx.Timeout(config.MODEL_TIMEOUT_SECONDS, connect=config.MODEL_CONNECT_TIMEOUT_SECONDS),
+        http2=config.MODEL_HTTP2 and _http2_available(),
+    )
+
+def create_client(api_key: str, base_url: str) -> AsyncOpenAI:
+    """
+    AsyncOpenAI client on the pooled transport, with retries left to ResilientModel.
+    """
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=create_http_client(),
+        timeout=httpx.Timeout(config.MODEL_TIMEOUT_SECONDS, connect=config.MODEL_CONNECT_TIMEOUT_SECONDS),
+        max_retries=0,
+    )
+
+@lru_cache(maxsize=1)
+def get_upstream_limiter() -> UpstreamLimiter:
+    """
+    Process-wide limiter shared by every model call.
+    """
+    return UpstreamLimiter(
+        config.MODEL_MAX_CONCURRENT_REQUESTS,
+        requests_per_minute=config.MODEL_REQUESTS_PER_MINUTE,
+        burst=config.MODEL_RATE_BURST,
+    )
+
+def resilient(model: Model, name: str) -> ResilientModel:
+    """
+    Wraps `model` with the process-wide limiter and the MODEL_RETRY_* / MODEL_HEDGE_* settings.
+    """
+    return ResilientModel(
+        model,
+        get_upstream_limiter(),
+        name,
+        max_retries=config.MODEL_MAX_RETRIES,
+        backoff_base=config.MODEL_RETRY_BASE_SECONDS,
+        backoff_max=config.MODEL_RETRY_MAX_SECONDS,
+        hedge_after=config.MODEL_HEDGE_AFTER_SECONDS or None,
+    )
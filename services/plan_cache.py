@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+from services.goal_parser import analyze_goal_with_llm_fallback, is_low_confidence, normalize_description
+from services.meal_planner import estimate_caloric_goal, generate_meal_plan, parse_restrictions
+from services.session_store import SessionStore
+from services.workout_library import recommend_workout, template_key
+
+# Plan cache for /set_goal.
+# Goal analysis (possibly an LLM call), the meal plan and the workout plan depend only on the
+# request's inputs, so they are cached together under a content hash of those inputs: the
+# normalized goal description, the catalog tags the diet preferences map to, the workout
+# template parameters and the date (relative deadlines and plan creation dates change daily).
+# Users with the same inputs share one PlanSet. Nothing is invalidated by hand: when a session's
+# goal or diet preferences change, the new values hash to a different key, and entries for inputs
+# nobody uses any more fall out of the LRU.
+# precompute_popular() fills the cache in the background with the most common goal/diet
+# combinations among stored sessions.
+
+PlanInputs = Tuple[str, Optional[str]] # (goal description, diet preferences)
+
+@dataclass(frozen=True, slots=True)
+class PlanSet:
+    """Goal analysis and plans for one set of inputs; shared between users, so read-only."""
+    key: str
+    analyzed_goal: dict # analyze_goal_with_llm_fallback() result
+    meal_plan: Tuple[str, ...]
+    workout_plan: dict
+
+    def goal_for(self, goal_description: str) -> dict:
+        """The session's goal dict, in the form /set_goal stores it."""
+        return {"description": goal_description, **self.analyzed_goal, "original_description": goal_description, "status": "analyzed"}
+
+def plan_key(
+    goal_description: str,
+    diet_preferences: Optional[str] = None,
+    current_fitness_level: Optional[str] = None,
+    available_equipment: Optional[Iterable[str]] = None,
+    time_per_session_minutes: Optional[int] = None,
+    today: Optional[date] = None,
+) -> str:
+    # Normalized the same way the planners do, so inputs that produce identical plans share a key.
+    _, level, equipment, minutes = template_key(None, current_fitness_level, available_equipment, time_per_session_minutes)
+    inputs = [
+        normalize_description(goal_description),
+        sorted(parse_restrictions(diet_preferences)),
+        level, equipment, minutes,
+        (today or date.today()).isoformat(),
+    ]
+    return hashlib.sha1(json.dumps(inputs).encode("utf-8")).hexdigest()
+
+def _cacheable(analyzed_goal: dict) -> bool:
+    # A low-confidence rules result with the fallback enabled means the LLM call failed; retry next time.
+    return not (config.GOAL_LLM_FALLBACK_ENABLED and is_low_confidence(analyzed_goal) and analyzed_goal["source"] == "rules")
+
+async def build_plans(
+    key: str,
+    goal_description: str,
+    diet_preferences: Optional[str] = None,
+    current_fitness_level: Optional[str] = None,
+    available_equipment: Optional[List[str]] = None,
+    time_per_session_minutes: Optional[int] = None,
+) -> PlanSet:
+    """Runs goal analysis and both planners for one set of inputs (the uncached /set_goal path)."""
+    # 1. Goal Analysis
+    # Parsed locally by the same rule engine GoalAnalyzerTool uses; the LLM is only
+    # consulted when the rules are not confident about the description.
+    analyzed_goal = await analyze_goal_with_llm_fallback(goal_description)
+    goal = {"description": goal_description, **analyzed_goal}
+
+    # 2 + 3. Meal plan and workout plan only depend on the analyzed goal, so they run in parallel.
+    # Meal plan: same catalog-backed generator MealPlannerTool uses.
+    # Workout plan: indexed lookup in the same template library WorkoutRecommenderTool uses.
+    meal_plan, workout_plan = await asyncio.gather(
+        asyncio.to_thread(generate_meal_plan, diet_preferences, goal["parsed_details"]["diet_keywords"], estimate_caloric_goal(goal)),
+        asyncio.to_thread(
+            recommend_workout, goal["parsed_details"]["goal_type"], goal_description,
+            current_fitness_level, available_equipment, time_per_session_minutes,
+        ),
+    )
+    return PlanSet(key, analyzed_goal, tuple(meal_plan), workout_plan)
+
+class PlanCache:
+    """
+    Bounded LRU of PlanSets by plan_key(). Concurrent requests for the same missing key share one build.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, PlanSet]" = OrderedDict()
+        self._building: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[PlanSet]:
+        with self._lock:
+            plans = self._entries.get(key)
+            if plans is not None:
+                self._entries.move_to_end(key)
+            return plans
+
+    def put(self, plans: PlanSet) -> None:
+        with self._lock:
+            self._entries[plans.key] = plans
+            self._entries.move_to_end(plans.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_build(
+        self,
+        goal_description: str,
+        diet_preferences: Optional[str] = None,
+        current_fitness_level: Optional[str] = None,
+        available_equipment: Optional[List[str]] = None,
+        time_per_session_minutes: Optional[int] = None,
+    ) -> PlanSet:
+        key = plan_key(goal_description, diet_preferences, current_fitness_level, available_equipment, time_per_session_minutes)
+        plans = self.get(key)
+        if plans is not None:
+            self.hits += 1
+            return plans
+        building = self._building.get(key)
+        if building is not None:
+            self.hits += 1
+            return await asyncio.shield(building)
+        self.misses += 1
+        building = self._building[key] = asyncio.get_running_loop().create_future()
+        try:
+            plans = await build_plans(key, goal_description, diet_preferences, current_fitness_level, available_equipment, time_per_session_minutes)
+        except BaseException as e:
+            building.set_exception(e)
+            building.exception() # Marks it retrieved, so an unawaited failure is not logged
+            raise
+        else:
+            building.set_result(plans)
+        finally:
+            del self._building[key]
+        if _cacheable(plans.analyzed_goal):
+            self.put(plans)
+        return plans
+
+    async def precompute(self, inputs: Iterable[PlanInputs]) -> int:
+        """Builds and caches plans for each (goal description, diet preferences); returns how many were built."""
+        built = 0
+        for goal_description, diet_preferences in inputs:
+            misses = self.misses
+            try:
+                await self.get_or_build(goal_description, diet_preferences)
+            except Exception as e:
+                print(f"Plan precompute failed for {goal_description!r}: {e}")
+                continue
+            built += self.misses - misses
+        return built
+
+    async def precompute_popular(self, session_store: SessionStore, limit: int) -> int:
+        """Precomputes the `limit` most common goal/diet combinations among stored sessions."""
+        inputs = await asyncio.to_thread(popular_plan_inputs, session_store, limit)
+        return await self.precompute(inputs)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def popular_plan_inputs(session_store: SessionStore, limit: int) -> List[PlanInputs]:
+    """The most common (goal description, diet preferences) pairs among stored sessions, most common first."""
+    counts: Counter = Counter()
+    examples: Dict[Tuple, PlanInputs] = {}
+    for _, goal, diet_preferences in session_store.field_values(("goal", "diet_preferences")):
+        if goal and goal.get("description"):
+            # Counted by what the plans depend on, so "Vegan" and "vegan" are one combination.
+            combination = (normalize_description(goal["description"]), parse_restrictions(diet_preferences))
+            counts[combination] += 1
+            examples.setdefault(combination, (goal["description"], diet_preferences))
+    return [examples[combination] for combination, _ in counts.most_common(limit)]
+
+@lru_cache(maxsize=1)
+def get_plan_cache() -> PlanCache:
+    return PlanCache(max_entries=config.PLAN_CACHE_SIZE)
@@ -0,0 +1,204 @@
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import config
+from context import UserSessionContext
+from services.db import connect
+
+class ProgressStore:
+    """
+    Append-only, time-indexed progress log per user, stored in SQLite.
+    Appends cost the same no matter how long a user's history is: one insert plus
+    one counter update. Reads are in timestamp order (back-dated bulk rows included), paginated
+    with an entry id cursor and an optional time range.
+    """
+
+    def __init__(self, path: Optional[str] = None, conn: Optional[sqlite3.Connection] = None):
+        self._conn = conn or connect(path)
+        self._lock = threading.Lock()
+        self._imported: Set[str] = set() # Users known to have no legacy session logs left to import
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress_logs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id TEXT NOT NULL,"
+            " ts REAL NOT NULL,"
+            " timestamp TEXT NOT NULL,"
+            " entry TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_user_id ON progress_logs (user_id, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_user_ts ON progress_logs (user_id, ts, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress_counts ("
+            " user_id TEXT PRIMARY KEY,"
+            " count INTEGER NOT NULL)"
+        )
+        # Users whose legacy UserSessionContext.progress_logs were imported (see import_session_logs).
+        self._conn.execute("CREATE TABLE IF NOT EXISTS progress_imports (user_id TEXT PRIMARY KEY)")
+
+    def append(self, user_id: str, entry: str, timestamp: Optional[datetime] = None) -> Tuple[Dict, int]:
+        """
+        Appends one entry and returns it together with the user's new total entry count.
+        """
+        timestamp = timestamp or datetime.now()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO progress_logs (user_id, ts, timestamp, entry) VALUES (?, ?, ?, ?)",
+                    (user_id, timestamp.timestamp(), timestamp.isoformat(), entry),
+                )
+                entry_id = cursor.lastrowid
+                count = self._increment_count(self._conn, user_id, 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"id": entry_id, "timestamp": timestamp.isoformat(), "entry": entry}, count
+
+    def append_many(self, user_id: str, entries: Sequence[Tuple[datetime, str]]) -> Tuple[int, int]:
+        """
+        Appends many (timestamp, entry) pairs in one transaction.
+        Returns (entries written, the user's new total entry count).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                count = self.insert_many(self._conn, user_id, entries)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(entries), count
+
+    @staticmethod
+    def insert_many(conn: sqlite3.Connection, user_id: str, entries: Sequence[Tuple[datetime, str]]) -> int:
+        """
+        append_many() inside the caller's open transaction on `conn`, a connection to the same
+        database (bulk ingest shares one with MetricStore.record_many). Returns the new total count.
+        """
+        rows = [(user_id, timestamp.timestamp(), timestamp.isoformat(), entry) for timestamp, entry in entries]
+        conn.executemany("INSERT INTO progress_logs (user_id, ts, timestamp, entry) VALUES (?, ?, ?, ?)", rows)
+        return ProgressStore._increment_count(conn, user_id, len(rows))
+
+    def has_imported(self, user_id: str) -> bool:
+        if user_id in self._imported:
+            return True
+        with self._lock:
+            found = self._conn.execute("SELECT 1 FROM progress_imports WHERE user_id = ?", (user_id,)).fetchone() is not None
+        if found:
+            self._imported.add(user_id)
+        return found
+
+    def import_session_logs(self, user_id: str, logs: Sequence[Dict[str, str]]) -> int:
+        """
+        Imports progress_logs kept in the session before this store existed, once per user
+        (later calls, from this or another worker, import nothing). Returns the entries imported.
+        """
+        rows = []
+        for log in logs:
+            try:
+                timestamp = datetime.fromisoformat(log.get("timestamp", ""))
+            except ValueError:
+                continue
+            rows.append((user_id, timestamp.timestamp(), timestamp.isoformat(), log.get("entry", "")))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if self._conn.execute("INSERT OR IGNORE INTO progress_imports (user_id) VALUES (?)", (user_id,)).rowcount == 0:
+                    rows = [] # Already imported
+                elif rows:
+                    self._conn.executemany("INSERT INTO progress_logs (user_id, ts, timestamp, entry) VALUES (?, ?, ?, ?)", rows)
+                    self._increment_count(self._conn, user_id, len(rows))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._imported.add(user_id)
+        return len(rows)
+
+    def import_session(self, user_id: str, context: UserSessionContext) -> int:
+        """
+        Imports the session's legacy progress_logs (once per user) and clears them from the
+        session, which the caller saves. Safe to repeat. Returns the entries imported.
+        """
+        imported = 0 if self.has_imported(user_id) else self.import_session_logs(user_id, context.progress_logs)
+        context.progress_logs = []
+        return imported
+
+    def list(
+        self,
+        user_id: str,
+        cursor: Optional[int] = None,
+        limit: int = 50,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Returns up to `limit` entries in chronological order (by timestamp, then id), starting
+        after the entry with id `cursor`, restricted to since <= timestamp < until. The second
+        value is the cursor for the next page, or None when there are no more entries.
+        """
+        query, params = self._range_query("SELECT id, timestamp, entry", user_id, since, until)
+        if cursor is not None:
+            # The cursor entry's (ts, id) is the position; ids alone are insertion order.
+            query += " AND (ts, id) > (SELECT ts, id FROM progress_logs WHERE id = ?)"
+            params.append(cursor)
+        query += " ORDER BY ts, id LIMIT ?"
+        params.append(limit + 1) # One extra row tells us whether another page exists
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        entries = [{"id": row[0], "timestamp": row[1], "entry": row[2]} for row in rows[:limit]]
+        next_cursor = entries[-1]["id"] if len(rows) > limit else None
+        return entries, next_cursor
+
+    def count(self, user_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+        """
+        The user's total entries (a stored counter), or the entries in since <= timestamp < until
+        when a range is given (counted over the time index).
+        """
+        with self._lock:
+            if since is None and until is None:
+                row = self._conn.execute("SELECT count FROM progress_counts WHERE user_id = ?", (user_id,)).fetchone()
+                return row[0] if row else 0
+            query, params = self._range_query("SELECT COUNT(*)", user_id, since, until)
+            return self._conn.execute(query, params).fetchone()[0]
+
+    @staticmethod
+    def _range_query(select: str, user_id: str, since: Optional[datetime], until: Optional[datetime]) -> Tuple[str, list]:
+        query = f"{select} FROM progress_logs WHERE user_id = ?"
+        params: list = [user_id]
+        if since is not None:
+            query += " AND ts >= ?"
+            params.append(since.timestamp())
+        if until is not None:
+            query += " AND ts < ?"
+            params.append(until.timestamp())
+        return query, params
+
+    @staticmethod
+    def _increment_count(conn: sqlite3.Connection, user_id: str, amount: int) -> int:
+        # Caller must have an open transaction on `conn` (and hold self._lock if it is self._conn).
+        conn.execute(
+            "INSERT INTO progress_counts (user_id, count) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET count = count + excluded.count",
+            (user_id, amount),
+        )
+        return conn.execute("SELECT count FROM progress_counts WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+def create_progress_store() -> ProgressStore:
+    """
+    Builds the progress store on the database configured in config.py.
+    """
+    return ProgressStore(config.DATABASE_PATH)
+
+@lru_cache(maxsize=1)
+def get_progress_store() -> ProgressStore:
+    """
+    Process-wide progress store (shared by api.py and the tools).
+    """
+    return create_progress_store()
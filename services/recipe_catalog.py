@@ -0,0 +1,81 @@
+import csv
+import os
+from array import array
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+# Bundled recipe/nutrient dataset used by MealPlannerTool.
+RECIPES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "recipes.csv")
+
+MEAL_TYPES: Tuple[str, ...] = ("breakfast", "lunch", "dinner")
+
+# Every allergen in the dataset also produces a "<allergen>-free" tag on the recipes that
+# do not contain it, so "gluten-free" or "nut-free" is an ordinary tag lookup.
+ALLERGENS: Tuple[str, ...] = ("gluten", "dairy", "egg", "nuts", "soy", "fish", "shellfish")
+ALLERGEN_FREE_TAGS: Dict[str, str] = {allergen: ("nut-free" if allergen == "nuts" else f"{allergen}-free")
+                                      for allergen in ALLERGENS}
+
+class RecipeCatalog:
+    """
+    Column-oriented, read-only view of the recipe dataset.
+    Each nutrient is a compact typed array indexed by recipe id, and tags/meal types have
+    inverted indexes (tag -> frozenset of recipe ids) so filtering by restrictions is a
+    set intersection instead of a scan over all recipes.
+    """
+
+    def __init__(self, rows: Iterable[dict]):
+        self.names: List[str] = []
+        self.meal_types = array("B") # Index into MEAL_TYPES
+        self.calories = array("H")
+        self.protein_g = array("f")
+        self.carbs_g = array("f")
+        self.fat_g = array("f")
+        tag_ids: Dict[str, set] = {}
+        meal_ids: Dict[str, set] = {meal: set() for meal in MEAL_TYPES}
+
+        for recipe_id, row in enumerate(rows):
+            meal = row["meal"].strip()
+            self.names.append(row["name"].strip())
+            self.meal_types.append(MEAL_TYPES.index(meal))
+            self.calories.append(int(row["calories"]))
+            self.protein_g.append(float(row["protein_g"]))
+            self.carbs_g.append(float(row["carbs_g"]))
+            self.fat_g.append(float(row["fat_g"]))
+            meal_ids[meal].add(recipe_id)
+
+            allergens = {item.strip() for item in row["allergens"].split(";") if item.strip()}
+            tags = {item.strip() for item in row["tags"].split(";") if item.strip()}
+            tags.update(tag for allergen, tag in ALLERGEN_FREE_TAGS.items() if allergen not in allergens)
+            for tag in tags:
+                tag_ids.setdefault(tag, set()).add(recipe_id)
+
+        self.all_ids: FrozenSet[int] = frozenset(range(len(self.names)))
+        self.tag_index: Dict[str, FrozenSet[int]] = {tag: frozenset(ids) for tag, ids in tag_ids.items()}
+        self.meal_index: Dict[str, FrozenSet[int]] = {meal: frozenset(ids) for meal, ids in meal_ids.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def tags(self) -> FrozenSet[str]:
+        return frozenset(self.tag_index)
+
+    def matching(self, meal: str, required_tags: Iterable[str]) -> FrozenSet[int]:
+        """
+        Returns the ids of `meal` recipes that carry every tag in `required_tags`.
+        Unknown tags match nothing.
+        """
+        ids = self.meal_index[meal]
+        for tag in required_tags:
+            ids = ids & self.tag_index.get(tag, frozenset())
+            if not ids:
+                break
+        return ids
+
+@lru_cache(maxsize=1)
+def get_catalog() -> RecipeCatalog:
+    """
+    Loads the bundled dataset once per process.
+    """
+    with open(RECIPES_PATH, newline="", encoding="utf-8") as f:
+        return RecipeCatalog(csv.DictReader(f))
@@ -0,0 +1,291 @@
+import contextvars
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from agents import Model, ModelResponse, Usage
+from openai.types.responses import Response, ResponseCompletedEvent, ResponseTextDeltaEvent
+
+from context import UserSessionContext
+
+# Response cache layered around the chat model (wired up in config.get_model()).
+# A turn is looked up by its scope (agent instructions, tools, the assistant message it replies to,
+# the numbers and negations in the prompt, and a fingerprint of the session fields that shape the
+# reply) plus the normalized prompt. The user's identity is not part of the scope: users with the
+# same goal, diet and injury notes share replies, and nothing that identifies a user (name, uid)
+# is sent to the model, so a shared reply never carries another user's details:
+#   * exact hit:   same scope and same normalized prompt,
+#   * similar hit: opt-in (`similarity_threshold`); same scope and a prompt whose character n-gram
+#                  vector has cosine similarity >= the threshold with a cached one in the same scope
+#                  (one vectorized NumPy pass). N-grams barely see small wording changes, so
+#                  "with" and "without" differ only through the negations in the scope.
+# Only plain text replies to a user message are cached; turns that call tools or hand off always
+# go to the model, so tool side effects are never skipped.
+
+NGRAM_SIZE = 3
+VECTOR_DIMENSIONS = 256
+
+NON_WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# Matched on the lowercased prompt with apostrophes removed ("can't" -> "cant").
+NEGATION_PATTERN = re.compile(
+    r"\b(no|not|without|never|none|nor|cannot|dont|doesnt|didnt|cant|wont|isnt|arent|wasnt|werent|"
+    r"shouldnt|wouldnt|couldnt|mustnt|havent|hasnt|hadnt|avoid|except)\b"
+)
+
+# Session fields that change what a good answer looks like; set per run by ConversationService.
+# Anything else the model sees about the session (the compacted profile) is in the instructions, which are part of the scope.
+SESSION_FINGERPRINT_FIELDS = ("goal", "diet_preferences", "injury_notes")
+_session_fingerprint: contextvars.ContextVar[str] = contextvars.ContextVar("session_fingerprint", default="")
+
+def session_fingerprint(context: Optional[UserSessionContext]) -> str:
+    if context is None:
+        return ""
+    fields = {name: getattr(context, name) for name in SESSION_FINGERPRINT_FIELDS}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def set_session_fingerprint(context: Optional[UserSessionContext]) -> None:
+    """
+    Scopes cache entries made by model calls in the current task to this session's state.
+    """
+    _session_fingerprint.set(session_fingerprint(context))
+
+def normalize_prompt(text: str) -> str:
+    return NON_WORD_PATTERN.sub(" ", text.lower()).strip()
+
+def negations(text: str) -> List[str]:
+    return NEGATION_PATTERN.findall(text.lower().replace("'", "").replace("\u2019", ""))
+
+def ngram_vector(normalized: str) -> np.ndarray:
+    """
+    L2-normalized hashed character n-gram counts (fixed size, so vectors can be stacked).
+    """
+    vector = np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+    padded = f" {normalized} "
+    for start in range(max(len(padded) - NGRAM_SIZE + 1, 1)):
+        gram = padded[start:start + NGRAM_SIZE]
+        vector[zlib.crc32(gram.encode("utf-8")) % VECTOR_DIMENSIONS] += 1.0
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+def _item_text(item: Any) -> str:
+    content = item.get("content") if isinstance(item, dict) else None
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+def _cacheable(output: List[Any]) -> bool:
+    return bool(_output_text(output))
+
+def _output_text(output: List[Any]) -> Optional[str]:
+    # Text of a reply made only of assistant messages; None if it contains tool calls or handoffs.
+    texts = []
+    for item in output:
+        if getattr(item, "type", None) != "message":
+            return None
+        texts.extend(part.text for part in item.content if getattr(part, "type", None) == "output_text")
+    return "".join(texts)
+
+@dataclass(slots=True)
+class _Entry:
+    stored_at: float
+    scope: str
+    prompt: str
+    row: int # Row of this entry's vector in the similarity matrix
+    output: List[Any]
+
+class ResponseCache:
+    """
+    Exact (+ optional near-duplicate) cache of model replies with LRU size eviction and a TTL.
+    With `similarity_threshold` None only exact prompts hit.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: Optional[float] = 3600, similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Similarity index: one row per cached entry; freed rows are reused.
+        self._vectors = np.zeros((max_entries, VECTOR_DIMENSIONS), dtype=np.float32)
+        self._row_scopes = np.zeros(max_entries, dtype=np.int64) # 0 marks a free row
+        self._row_keys: List[Optional[Tuple[str, str]]] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0 # Turns that were not cacheable (tool results, tool calls, ...)
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, scope: str, prompt: str) -> Optional[List[Any]]:
+        """
+        Returns the cached output for the prompt in this scope, or None on a miss.
+        """
+        key = (scope, prompt)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.output
+            if entry is not None:
+                self._remove(key)
+            if self.similarity_threshold is None:
+                self.misses += 1
+                return None
+
+            # Only rows in the same scope are compared; usually a small slice of the index.
+            rows = np.flatnonzero(self._row_scopes == self._scope_id(scope))
+            if rows.size:
+                query = ngram_vector(prompt)
+                # Gathering rows copies them, so for a large scope scoring the whole matrix is cheaper.
+                scores = (self._vectors @ query)[rows] if rows.size * 4 > len(self._row_keys) else self._vectors[rows] @ query
+                best = int(np.argmax(scores))
+                row = int(rows[best]) if scores[best] >= self.similarity_threshold else None
+            else:
+                row = None
+            if row is not None:
+                similar_key = self._row_keys[row]
+                similar = self._entries[similar_key]
+                if not self._expired(similar, now):
+                    self._entries.move_to_end(similar_key)
+                    self.similar_hits += 1
+                    return similar.output
+                self._remove(similar_key)
+            self.misses += 1
+            return None
+
+    def store(self, scope: str, prompt: str, output: List[Any]) -> None:
+        key = (scope, prompt)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            row = self._free_rows.pop()
+            self._vectors[row] = ngram_vector(prompt)
+            self._row_scopes[row] = self._scope_id(scope)
+            self._row_keys[row] = key
+            self._entries[key] = _Entry(time.monotonic(), scope, prompt, row, output)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+        }
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry.stored_at > self.ttl_seconds
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        # Caller must hold self._lock.
+        entry = self._entries.pop(key)
+        self._row_scopes[entry.row] = 0
+        self._row_keys[entry.row] = None
+        self._free_rows.append(entry.row)
+
+    @staticmethod
+    def _scope_id(scope: str) -> int:
+        # Non-zero 63-bit id so scope matching is one integer comparison per row.
+        return int.from_bytes(hashlib.blake2b(scope.encode("utf-8"), digest_size=8).digest(), "little") >> 1 or 1
+
+class CachingModel(Model):
+    """
+    Model wrapper that answers repeated (or near-identical) user turns from a ResponseCache.
+    """
+
+    def __init__(self, model: Model, cache: ResponseCache):
+        self.model = model
+        self.cache = cache
+
+    def _cache_key(self, system_instructions: Optional[str], input: Any, tools: list, handoffs: list) -> Optional[Tuple[str, str]]:
+        # (scope, normalized prompt), or None when the turn is not cacheable.
+        items = [{"role": "user", "content": input}] if isinstance(input, str) else list(input)
+        if not items or not isinstance(items[-1], dict) or items[-1].get("role") != "user":
+            return None # Continuing after a tool call; the reply depends on the tool output
+        prompt = normalize_prompt(_item_text(items[-1]))
+        if not prompt:
+            return None
+        previous_reply = next(
+            (_item_text(item) for item in reversed(items[:-1]) if isinstance(item, dict) and item.get("role") == "assistant"),
+            "",
+        )
+        scope = json.dumps([
+            system_instructions or "",
+            sorted(getattr(tool, "name", "") for tool in tools),
+            sorted(getattr(handoff, "agent_name", "") for handoff in handoffs),
+            normalize_prompt(previous_reply),
+            NUMBER_PATTERN.findall(prompt), # "lose 5 kg" must never answer "lose 15 kg"
+            negations(_item_text(items[-1])), # "with a knee injury" must never answer "without"
+            _session_fingerprint.get(),
+        ])
+        return scope, prompt
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> ModelResponse:
+        key = self._cache_key(system_instructions, input, tools, handoffs) if output_schema is None else None
+        if key is None:
+            self.cache.bypassed += 1
+        else:
+            output = self.cache.lookup(*key)
+            if output is not None:
+                return ModelResponse(output=list(output), usage=Usage(), response_id=None)
+
+        response = await self.model.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs,
+        )
+        if key is not None and _cacheable(response.output):
+            self.cache.store(*key, list(response.output))
+        return response
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        key = self._cache_key(system_instructions, input, tools, handoffs) if output_schema is None else None
+        if key is None:
+            self.cache.bypassed += 1
+        else:
+            output = self.cache.lookup(*key)
+            if output is not None:
+                # Replay the cached reply as one text delta followed by the completed response.
+                yield ResponseTextDeltaEvent(
+                    type="response.output_text.delta", delta=_output_text(output), item_id=output[0].id,
+                    output_index=0, content_index=0, sequence_number=0, logprobs=[],
+                )
+                yield ResponseCompletedEvent(
+                    type="response.completed", sequence_number=1,
+                    response=Response(
+                        id="cached", created_at=time.time(), model="cache", object="response", output=list(output),
+                        tool_choice="auto", tools=[], parallel_tool_calls=False,
+                    ),
+                )
+                return
+
+        async for event in self.model.stream_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs,
+        ):
+            if key is not None and isinstance(event, ResponseCompletedEvent) and _cacheable(event.response.output):
+                self.cache.store(*key, list(event.response.output))
+            yield event
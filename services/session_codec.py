@@ -0,0 +1,107 @@
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import msgpack
+from pydantic_core import to_jsonable_python
+
+from context import UserSessionContext
+
+# Compact stored form of UserSessionContext.
+# UserSessionContext stays the Pydantic model that endpoints, tools and agent runs work with;
+# the session stores keep a CompactSession instead: one msgpack blob per field in a slotted,
+# immutable dataclass. Saving re-encodes the session and compares it field by field with the
+# blobs it was loaded from, so only changed fields are written. Strings in the plan fields come
+# from a small set of templates (meal plan lines, workout plan schedules, diet preferences) and
+# are interned on decode, so sessions loaded at the same time share them (msgpack already
+# interns dict keys).
+
+SESSION_FIELDS: Tuple[str, ...] = tuple(UserSessionContext.model_fields)
+FIELD_INDEX: Dict[str, int] = {name: index for index, name in enumerate(SESSION_FIELDS)}
+INTERNED_FIELDS = frozenset({"diet_preferences", "workout_plan", "meal_plan"})
+
+_local = threading.local()
+
+def _packer() -> msgpack.Packer:
+    # One Packer per thread: reusing it is about twice as fast as msgpack.packb, but it is not thread-safe.
+    packer = getattr(_local, "packer", None)
+    if packer is None:
+        # to_jsonable_python handles anything msgpack cannot (dates, models, ...) the way JSON storage did.
+        packer = _local.packer = msgpack.Packer(use_bin_type=True, default=to_jsonable_python)
+    return packer
+
+_DEFAULTS: Tuple[Optional[bytes], ...] = tuple(
+    None if field.is_required() else _packer().pack(field.get_default(call_default_factory=True))
+    for field in UserSessionContext.model_fields.values()
+)
+
+@dataclass(frozen=True, slots=True)
+class CompactSession:
+    fields: Tuple[bytes, ...] # msgpack blob per field, in SESSION_FIELDS order
+    version: int = 0 # Stored row version this state was read at or saved as (0: never stored)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(blob) for blob in self.fields)
+
+    def field_items(self):
+        return zip(SESSION_FIELDS, self.fields)
+
+# msgpack calls these for every decoded map/array, innermost first, so nested plan strings are
+# interned without a Python-level walk.
+def _intern_map(value: dict) -> dict:
+    for key, item in value.items():
+        if type(item) is str:
+            value[key] = sys.intern(item)
+    return value
+
+def _intern_array(value: list) -> list:
+    return [sys.intern(item) if type(item) is str else item for item in value]
+
+def pack_session(session: UserSessionContext) -> Tuple[CompactSession, Tuple[str, ...]]:
+    """
+    Encodes the session. Returns it with the names of the fields that differ from what the
+    session was loaded from or last saved as (every field for a session never stored).
+    """
+    values = session.__dict__
+    stored: Optional[CompactSession] = session._stored
+    # Carries the version it was read at, which the SQLite store checks before writing.
+    compact = CompactSession(tuple(map(_packer().pack, map(values.__getitem__, SESSION_FIELDS))), stored.version if stored else 0)
+    if stored is None:
+        return compact, SESSION_FIELDS
+    dirty = tuple(name for name, new, old in zip(SESSION_FIELDS, compact.fields, stored.fields) if new != old)
+    return compact, dirty
+
+def mark_stored(session: UserSessionContext, compact: CompactSession) -> None:
+    """Records `compact` as the session's saved state once a write has succeeded."""
+    session._stored = compact
+
+def unpack_session(compact: CompactSession) -> UserSessionContext:
+    """
+    Decodes a stored session. Stored data was validated when it was first saved, so it is not validated again.
+    """
+    values = {}
+    for name, blob in compact.field_items():
+        if name in INTERNED_FIELDS:
+            value = msgpack.unpackb(blob, object_hook=_intern_map, list_hook=_intern_array)
+            values[name] = sys.intern(value) if type(value) is str else value
+        else:
+            values[name] = msgpack.unpackb(blob)
+    session = UserSessionContext.model_construct(**values)
+    session._stored = compact
+    return session
+
+def unpack_field(name: str, blob: Optional[bytes]):
+    """Decodes one stored field (NULL: the field's default)."""
+    if blob is None:
+        blob = _DEFAULTS[FIELD_INDEX[name]]
+    return None if blob is None else msgpack.unpackb(blob)
+
+def compact_from_row(blobs: Sequence[Optional[bytes]], version: int = 0) -> Optional[CompactSession]:
+    """
+    Builds a CompactSession from stored blobs in SESSION_FIELDS order. Fields added to the model
+    after the row was written (NULL) get their defaults; None if a required field is missing.
+    """
+    fields = tuple(default if blob is None else blob for blob, default in zip(blobs, _DEFAULTS))
+    return None if None in fields else CompactSession(fields, version)
@@ -0,0 +1,99 @@
+import asyncio
+import inspect
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from context import UserSessionContext
+from services.session_codec import pack_session
+from services.session_store import SessionConflictError, SessionStore
+
+# Per-user serialization of session read-modify-write cycles.
+# Inside one worker, UserLocks gives every user_id its own asyncio.Lock, so two requests for the
+# same user run their updates one after the other (even across awaits such as a goal-analysis LLM
+# call or an agent run) while requests for different users never wait on each other. Locks only
+# exist while a request holds or waits for them.
+# Across workers, the SQLite store's row version catches a save based on a stale read
+# (SessionConflictError): update_session() re-reads and re-applies the change, and
+# save_session() re-applies the fields an agent run changed onto the latest copy.
+
+MAX_SAVE_ATTEMPTS = 5
+
+Mutation = Callable[[UserSessionContext], Union[Any, Awaitable[Any]]]
+
+class UserLocks:
+    """
+    One asyncio.Lock per user_id, created on first use and dropped when no task holds or awaits it.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {} # user_id -> (lock, holders + waiters)
+
+    @asynccontextmanager
+    async def hold(self, user_id: str):
+        lock, users = self._locks.get(user_id) or (asyncio.Lock(), 0)
+        self._locks[user_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[user_id]
+            if users == 1:
+                del self._locks[user_id]
+            else:
+                self._locks[user_id] = (lock, users - 1)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+async def update_session(
+    store: SessionStore,
+    locks: UserLocks,
+    user_id: str,
+    mutate: Mutation,
+    create: Optional[Callable[[], UserSessionContext]] = None,
+) -> Optional[Tuple[UserSessionContext, Any]]:
+    """
+    Loads the user's session (or `create()`s it), applies `mutate` (sync or async) and saves it,
+    holding the user's lock. On a cross-worker conflict the session is re-read and `mutate`
+    applied again, so `mutate` must be safe to repeat. Returns (session, mutate's result), or
+    None if the user has no session and there is no `create`.
+    """
+    async with locks.hold(user_id):
+        for attempt in range(MAX_SAVE_ATTEMPTS):
+            session = store.get(user_id)
+            if session is None:
+                if create is None:
+                    return None
+                session = create()
+            result = mutate(session)
+            if inspect.isawaitable(result):
+                result = await result
+            try:
+                store.put(user_id, session)
+                return session, result
+            except SessionConflictError:
+                if attempt == MAX_SAVE_ATTEMPTS - 1:
+                    raise
+
+def save_session(store: SessionStore, user_id: str, session: UserSessionContext) -> UserSessionContext:
+    """
+    Saves a session whose changes cannot be re-applied by re-running them (an agent run).
+    On a cross-worker conflict, the fields it changed are copied onto the latest stored copy,
+    which is saved instead and returned. Concurrent changes to other fields are kept; for a
+    field both writers changed, this save wins.
+    """
+    for attempt in range(MAX_SAVE_ATTEMPTS):
+        try:
+            store.put(user_id, session)
+            return session
+        except SessionConflictError:
+            if attempt == MAX_SAVE_ATTEMPTS - 1:
+                raise
+            _, dirty = pack_session(session)
+            latest = store.get(user_id)
+            if latest is None:
+                continue # Deleted meanwhile: the next put() stores the whole session
+            for name in dirty:
+                setattr(latest, name, getattr(session, name))
+            session = latest
+    return session
@@ -0,0 +1,290 @@
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import config
+from context import UserSessionContext
+from services.db import connect
+from services.session_codec import FIELD_INDEX, SESSION_FIELDS, CompactSession, compact_from_row, mark_stored, pack_session, unpack_field, unpack_session
+
+class SessionConflictError(RuntimeError):
+    """
+    The stored session changed after it was read (another worker saved it first).
+    Re-read the session, re-apply the change and save again.
+    """
+
+class SessionStore(ABC):
+    """
+    Interface for storing one UserSessionContext per user_id.
+    api.py only talks to this interface, so the backend can be swapped without touching endpoints.
+    """
+
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[UserSessionContext]:
+        """Returns the user's session, or None if it does not exist."""
+
+    @abstractmethod
+    def put(self, user_id: str, session: UserSessionContext) -> None:
+        """Creates or replaces the user's session."""
+
+    @abstractmethod
+    def delete(self, user_id: str) -> None:
+        """Removes the user's session if it exists."""
+
+    @abstractmethod
+    def user_ids(self) -> Iterator[str]:
+        """Iterates over every stored user_id (used by batch jobs such as meal-plan refreshes)."""
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def field_values(self, names: Sequence[str]) -> Iterator[tuple]:
+        """Iterates over (user_id, *values of the `names` fields) for every stored session."""
+        for user_id in self.user_ids():
+            session = self.get(user_id)
+            if session is not None:
+                yield (user_id, *(getattr(session, name) for name in names))
+
+class InMemoryLRUSessionStore(SessionStore):
+    """
+    Bounded in-process session store.
+    Keeps at most `max_entries` sessions and drops entries older than `ttl_seconds`,
+    evicting the least recently used session first when full.
+    Sessions are held in their compact encoded form; get() decodes a fresh copy.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, CompactSession]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[UserSessionContext]:
+        compact = self.get_compact(user_id)
+        return unpack_session(compact) if compact is not None else None
+
+    def put(self, user_id: str, session: UserSessionContext) -> None:
+        compact, _ = pack_session(session)
+        self.put_compact(user_id, compact)
+        mark_stored(session, compact)
+
+    def get_compact(self, user_id: str) -> Optional[CompactSession]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            stored_at, session = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return session
+
+    def put_compact(self, user_id: str, session: CompactSession) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), session)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def user_ids(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get_compact(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def nbytes(self) -> int:
+        """Encoded size of every held session (field blobs only)."""
+        with self._lock:
+            return sum(session.nbytes for _, session in self._entries.values())
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Persistent session store backed by a local SQLite file in WAL mode.
+    Each session is one row with a msgpack BLOB column per field, so a save only sends and
+    updates the fields that changed. Sessions survive restarts and are visible to every worker.
+    """
+
+    def __init__(self, path: Optional[str] = None, conn: Optional[sqlite3.Connection] = None):
+        self._conn = conn or connect(path)
+        self._lock = threading.Lock()
+        columns = ", ".join(f"{name} BLOB" for name in SESSION_FIELDS)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_data ("
+            f" user_id TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 1, updated_at REAL NOT NULL, {columns})"
+        )
+        # Fields added to UserSessionContext later become new (NULL) columns; reads fill in the default.
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(session_data)")}
+        for name in ("version", *SESSION_FIELDS):
+            if name not in existing:
+                column_type = "INTEGER NOT NULL DEFAULT 1" if name == "version" else "BLOB"
+                self._conn.execute(f"ALTER TABLE session_data ADD COLUMN {name} {column_type}")
+        self._select_sql = f"SELECT version, {', '.join(SESSION_FIELDS)} FROM session_data WHERE user_id = ?"
+        self._insert_sql = (
+            f"INSERT INTO session_data (user_id, version, updated_at, {', '.join(SESSION_FIELDS)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' for _ in SESSION_FIELDS)}) ON CONFLICT(user_id) DO NOTHING"
+        )
+        self._update_sql: Dict[Tuple[str, ...], str] = {}
+        self._migrate_json_sessions()
+
+    def _migrate_json_sessions(self) -> None:
+        # Earlier versions stored each session as one JSON document in `sessions`; convert them once.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sessions'").fetchone():
+                    for user_id, data in self._conn.execute("SELECT user_id, data FROM sessions").fetchall():
+                        compact, _ = pack_session(UserSessionContext.model_validate_json(data))
+                        self._conn.execute(self._insert_sql, (user_id, 1, time.time(), *compact.fields))
+                    self._conn.execute("DROP TABLE sessions")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, user_id: str) -> Optional[UserSessionContext]:
+        compact = self.get_compact(user_id)
+        return unpack_session(compact) if compact is not None else None
+
+    def put(self, user_id: str, session: UserSessionContext) -> None:
+        compact, dirty = pack_session(session)
+        mark_stored(session, self.put_compact(user_id, compact, dirty))
+
+    def get_compact(self, user_id: str) -> Optional[CompactSession]:
+        with self._lock:
+            row = self._conn.execute(self._select_sql, (user_id,)).fetchone()
+        return compact_from_row(row[1:], row[0]) if row is not None else None
+
+    def put_compact(self, user_id: str, session: CompactSession, dirty: Sequence[str] = SESSION_FIELDS) -> CompactSession:
+        """
+        Updates the `dirty` fields of the user's row if it is still at `session.version`, and returns
+        the session at its new version. Raises SessionConflictError if another writer saved the row
+        since it was read. If the user has no row (new, or deleted), the whole session is inserted.
+        """
+        with self._lock:
+            if dirty:
+                sql = self._update_sql.get(tuple(dirty))
+                if sql is None:
+                    sql = self._update_sql[tuple(dirty)] = (
+                        f"UPDATE session_data SET version = version + 1, updated_at = ?, "
+                        f"{', '.join(f'{name} = ?' for name in dirty)} WHERE user_id = ? AND version = ?"
+                    )
+                blobs = session.fields
+                params = (time.time(), *(blobs[FIELD_INDEX[name]] for name in dirty), user_id, session.version)
+                if self._conn.execute(sql, params).rowcount:
+                    return replace(session, version=session.version + 1)
+            row = self._conn.execute("SELECT version FROM session_data WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None:
+                if not dirty:
+                    return session # Nothing changed: a read instead of a write
+                raise SessionConflictError(f"Session for {user_id} was saved by another writer (version {row[0]}, read at {session.version}).")
+            if not self._conn.execute(self._insert_sql, (user_id, session.version + 1, time.time(), *session.fields)).rowcount:
+                raise SessionConflictError(f"Session for {user_id} was created by another writer.")
+            return replace(session, version=session.version + 1)
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM session_data WHERE user_id = ?", (user_id,))
+
+    def user_ids(self) -> Iterator[str]:
+        # Paged by primary key so a full scan never holds the lock or all ids at once.
+        last_user_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT user_id FROM session_data WHERE user_id > ? ORDER BY user_id LIMIT 1000", (last_user_id,)
+                ).fetchall()
+            if not rows:
+                return
+            for (user_id,) in rows:
+                yield user_id
+            last_user_id = rows[-1][0]
+
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM session_data WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def field_values(self, names: Sequence[str]) -> Iterator[tuple]:
+        # Reads only the requested columns, paged like user_ids().
+        unknown = [name for name in names if name not in FIELD_INDEX]
+        if unknown:
+            raise ValueError(f"Unknown session fields: {', '.join(unknown)}")
+        sql = f"SELECT user_id, {', '.join(names)} FROM session_data WHERE user_id > ? ORDER BY user_id LIMIT 1000"
+        last_user_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, (last_user_id,)).fetchall()
+            if not rows:
+                return
+            for user_id, *blobs in rows:
+                yield (user_id, *(unpack_field(name, blob) for name, blob in zip(names, blobs)))
+            last_user_id = rows[-1][0]
+
+class TieredSessionStore(SessionStore):
+    """
+    LRU hot tier in front of a persistent backend.
+    Reads are served from memory when possible; writes go through to the backend immediately,
+    and only the fields that changed since the session was read are written.
+    With several workers, another worker's write becomes visible here once the hot entry expires (TTL);
+    saving a session read from a stale hot entry raises SessionConflictError instead of overwriting it.
+    """
+
+    def __init__(self, hot: InMemoryLRUSessionStore, backend: SQLiteSessionStore):
+        self.hot = hot
+        self.backend = backend
+
+    def get(self, user_id: str) -> Optional[UserSessionContext]:
+        compact = self.hot.get_compact(user_id)
+        if compact is None:
+            compact = self.backend.get_compact(user_id)
+            if compact is None:
+                return None
+            self.hot.put_compact(user_id, compact)
+        return unpack_session(compact)
+
+    def put(self, user_id: str, session: UserSessionContext) -> None:
+        compact, dirty = pack_session(session)
+        try:
+            compact = self.backend.put_compact(user_id, compact, dirty)
+        except SessionConflictError:
+            self.hot.delete(user_id) # The hot copy is stale; the next get() reads the latest version
+            raise
+        self.hot.put_compact(user_id, compact)
+        mark_stored(session, compact)
+
+    def delete(self, user_id: str) -> None:
+        self.backend.delete(user_id)
+        self.hot.delete(user_id)
+
+    def user_ids(self) -> Iterator[str]:
+        return self.backend.user_ids()
+
+    def field_values(self, names: Sequence[str]) -> Iterator[tuple]:
+        return self.backend.field_values(names)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.hot or user_id in self.backend
+
+def create_session_store() -> SessionStore:
+    """
+    Builds the session store configured in config.py: an LRU hot tier over SQLite.
+    """
+    return TieredSessionStore(
+        hot=InMemoryLRUSessionStore(
+            max_entries=config.SESSION_CACHE_SIZE,
+            ttl_seconds=config.SESSION_CACHE_TTL_SECONDS,
+        ),
+        backend=SQLiteSessionStore(config.DATABASE_PATH),
+    )
@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional
+
+import config
+from context import UserSessionContext
+from services.db import connect
+
+# Stable numeric ids for users.
+# Every external user_id (the string the API is called with) gets an integer uid allocated
+# once from SQLite's AUTOINCREMENT sequence: never reused, never colliding, and the same in
+# every worker and after restarts, so uid can be used to shard or partition per-user data.
+# Tools act for the session that runs them: session_user_id() turns the session's uid back into
+# the user_id the API stores progress, metrics and check-ins under. Uids are sequential and easy
+# to guess, so tools never take a user id from the model.
+# A mapping never changes once allocated, so both directions are cached without a TTL.
+
+class UserIdRegistry:
+    """
+    Persistent user_id <-> uid mapping with bounded in-memory lookup caches.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_cached: int = 100000, conn: Optional[sqlite3.Connection] = None):
+        self.max_cached = max_cached
+        self._conn = conn or connect(path)
+        self._lock = threading.Lock()
+        self._uids: "OrderedDict[str, int]" = OrderedDict()
+        self._user_ids: "OrderedDict[int, str]" = OrderedDict()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_ids ("
+            " uid INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id TEXT NOT NULL UNIQUE)"
+        )
+
+    def uid_for(self, user_id: str) -> int:
+        """
+        The user's uid, allocated on first use. Workers allocating the same user_id concurrently
+        all get the one uid that won the insert.
+        """
+        with self._lock:
+            uid = self._uids.get(user_id)
+            if uid is not None:
+                self._uids.move_to_end(user_id)
+                return uid
+            self._conn.execute("INSERT INTO user_ids (user_id) VALUES (?) ON CONFLICT(user_id) DO NOTHING", (user_id,))
+            uid = self._conn.execute("SELECT uid FROM user_ids WHERE user_id = ?", (user_id,)).fetchone()[0]
+            self._remember(user_id, uid)
+            return uid
+
+    def user_id_for(self, uid: int) -> Optional[str]:
+        """The user_id a uid was allocated to, or None if it was never allocated."""
+        with self._lock:
+            user_id = self._user_ids.get(uid)
+            if user_id is not None:
+                self._user_ids.move_to_end(uid)
+                return user_id
+            row = self._conn.execute("SELECT user_id FROM user_ids WHERE uid = ?", (uid,)).fetchone()
+            if row is None:
+                return None
+            self._remember(row[0], uid)
+            return row[0]
+
+    def _remember(self, user_id: str, uid: int) -> None:
+        # Caller holds the lock.
+        self._uids[user_id] = uid
+        self._user_ids[uid] = user_id
+        while len(self._uids) > self.max_cached:
+            self._uids.popitem(last=False)
+        while len(self._user_ids) > self.max_cached:
+            self._user_ids.popitem(last=False)
+
+@lru_cache(maxsize=1)
+def get_user_id_registry() -> UserIdRegistry:
+    return UserIdRegistry(config.DATABASE_PATH, max_cached=config.SESSION_CACHE_SIZE)
+
+def session_user_id(context: Any) -> Optional[str]:
+    """
+    The API user_id of the session a tool runs for (its RunContextWrapper.context), or None
+    outside a user session. Falls back to str(uid) for a uid that was never allocated here.
+    """
+    if not isinstance(context, UserSessionContext):
+        return None
+    return get_user_id_registry().user_id_for(context.uid) or str(context.uid)
@@ -0,0 +1,190 @@
+import hashlib
+import json
+from datetime import date
+from functools import lru_cache
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Workout recommendation for WorkoutRecommenderTool and /set_goal.
+# Every combination of (goal type, fitness level, equipment set, session length) is built
+# once into a template library; a request is normalized to one of those keys, looked up,
+# and only the goal description is filled in. No LLM turn is involved.
+
+DAYS: Tuple[str, ...] = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+GOAL_TYPES: Tuple[str, ...] = (
+    "weight_loss", "weight_gain", "muscle_gain", "endurance", "flexibility", "maintenance", "general_fitness",
+)
+LEVELS: Tuple[str, ...] = ("beginner", "intermediate", "advanced")
+EQUIPMENT_SETS: Tuple[str, ...] = ("bodyweight", "free_weights", "full_gym")
+SESSION_LENGTHS: Tuple[int, ...] = (20, 30, 45, 60, 90)
+
+DEFAULT_LEVEL = "beginner"
+DEFAULT_SESSION_MINUTES = 45
+
+LEVEL_ALIASES = {
+    "beginner": "beginner", "novice": "beginner", "new": "beginner", "low": "beginner", "sedentary": "beginner",
+    "intermediate": "intermediate", "moderate": "intermediate", "medium": "intermediate", "average": "intermediate",
+    "advanced": "advanced", "expert": "advanced", "high": "advanced", "athlete": "advanced", "experienced": "advanced",
+}
+
+# Any of these items puts the request in the corresponding equipment set (the richest set wins).
+FULL_GYM_ITEMS = {"gym", "barbell", "barbells", "machine", "machines", "cable", "cables", "rack", "squat rack",
+                  "bench", "treadmill", "rower", "rowing machine", "leg press"}
+FREE_WEIGHT_ITEMS = {"dumbbell", "dumbbells", "kettlebell", "kettlebells", "resistance bands", "bands", "band",
+                     "weights", "free weights"}
+
+DAYS_PER_WEEK = {"beginner": 3, "intermediate": 4, "advanced": 5}
+TRAINING_DAYS = {3: (0, 2, 4), 4: (0, 1, 3, 4), 5: (0, 1, 2, 4, 5)}
+VOLUME = {"beginner": "2 sets of 10-12 reps", "intermediate": "3 sets of 8-12 reps", "advanced": "4 sets of 6-10 reps"}
+
+# Session types cycled over the training days for each goal.
+SESSION_ROTATION = {
+    "weight_loss": ("strength", "cardio", "intervals"),
+    "weight_gain": ("upper", "lower", "full"),
+    "muscle_gain": ("upper", "lower", "full"),
+    "endurance": ("easy_cardio", "intervals", "strength", "long_cardio"),
+    "flexibility": ("mobility", "yoga", "strength"),
+    "maintenance": ("strength", "cardio", "mobility"),
+    "general_fitness": ("strength", "cardio", "mobility"),
+}
+
+STRENGTH_EXERCISES = {
+    "bodyweight": ("Squats", "Push-ups", "Reverse lunges", "Glute bridges", "Plank", "Table inverted rows"),
+    "free_weights": ("Goblet squats", "Dumbbell bench press", "One-arm dumbbell rows", "Romanian deadlifts",
+                     "Dumbbell overhead press", "Walking lunges"),
+    "full_gym": ("Barbell back squats", "Bench press", "Lat pulldowns", "Deadlifts", "Seated cable rows", "Leg press"),
+}
+UPPER_EXERCISES = {
+    "bodyweight": ("Push-ups", "Pike push-ups", "Table inverted rows", "Bench dips", "Plank shoulder taps"),
+    "free_weights": ("Dumbbell bench press", "One-arm dumbbell rows", "Dumbbell overhead press", "Bicep curls",
+                     "Overhead triceps extensions"),
+    "full_gym": ("Bench press", "Lat pulldowns", "Overhead press", "Seated cable rows", "Cable triceps pushdowns"),
+}
+LOWER_EXERCISES = {
+    "bodyweight": ("Squats", "Reverse lunges", "Glute bridges", "Step-ups", "Calf raises"),
+    "free_weights": ("Goblet squats", "Romanian deadlifts", "Walking lunges", "Dumbbell step-ups", "Calf raises"),
+    "full_gym": ("Barbell back squats", "Deadlifts", "Leg press", "Leg curls", "Calf raises"),
+}
+CARDIO_ACTIVITIES = {
+    "bodyweight": "brisk walking or jogging",
+    "free_weights": "jogging or a kettlebell/jump-rope circuit",
+    "full_gym": "treadmill, rower or stationary bike",
+}
+MOBILITY_EXERCISES = ("Hip flexor stretch", "Hamstring stretch", "Cat-cow", "Thoracic rotations",
+                      "Child's pose", "Downward dog")
+
+REST_DAY = "Rest / Active Recovery (light walk, stretching)"
+WARM_UP = "Warm-up: 5-10 minutes light cardio and dynamic stretches"
+COOL_DOWN = "Cool-down: 5-10 minutes static stretches"
+NOTES = "Adjust intensity and volume based on how you feel. Consult a professional before starting any new workout regimen."
+
+TemplateKey = Tuple[str, str, str, int]
+
+def _exercise_count(minutes: int) -> int:
+    return max(2, min(6, minutes // 10))
+
+def _describe_session(session_type: str, level: str, equipment: str, minutes: int) -> str:
+    count = _exercise_count(minutes)
+    volume = VOLUME[level]
+    if session_type in ("strength", "upper", "lower", "full"):
+        bank = {"upper": UPPER_EXERCISES, "lower": LOWER_EXERCISES}.get(session_type, STRENGTH_EXERCISES)[equipment]
+        label = {"upper": "Upper-body strength", "lower": "Lower-body strength"}.get(session_type, "Full-body strength")
+        return f"{label} ({minutes} min): {', '.join(bank[:count])} - {volume}"
+    if session_type == "cardio":
+        return f"Steady cardio ({minutes} min): {CARDIO_ACTIVITIES[equipment]} at moderate intensity"
+    if session_type == "easy_cardio":
+        return f"Easy cardio ({minutes} min): {CARDIO_ACTIVITIES[equipment]} at conversational pace"
+    if session_type == "long_cardio":
+        return f"Long cardio ({minutes + 15} min): {CARDIO_ACTIVITIES[equipment]} at easy pace"
+    if session_type == "intervals":
+        rounds = max(4, minutes // 5)
+        return f"Intervals ({minutes} min): {rounds} rounds of 1 min hard / 2 min easy {CARDIO_ACTIVITIES[equipment]}"
+    if session_type == "yoga":
+        return f"Yoga flow ({minutes} min): sun salutations, warrior series, balance poses"
+    return f"Mobility ({minutes} min): {', '.join(MOBILITY_EXERCISES[:count])}"
+
+def _build_template(goal_type: str, level: str, equipment: str, minutes: int) -> dict:
+    days_per_week = DAYS_PER_WEEK[level]
+    rotation = SESSION_ROTATION[goal_type]
+    schedule = {day: REST_DAY for day in DAYS}
+    for index, day_index in enumerate(TRAINING_DAYS[days_per_week]):
+        schedule[DAYS[day_index]] = _describe_session(rotation[index % len(rotation)], level, equipment, minutes)
+
+    main_type = rotation[0]
+    return {
+        "goal_type": goal_type,
+        "level": level,
+        "frequency": f"{days_per_week} times per week",
+        "duration_per_session": f"{minutes} minutes",
+        "equipment": equipment.replace("_", " "),
+        "weekly_schedule": schedule,
+        "exercises": [WARM_UP, _describe_session(main_type, level, equipment, minutes), COOL_DOWN],
+        "notes": NOTES,
+    }
+
+@lru_cache(maxsize=1)
+def get_library() -> Dict[TemplateKey, dict]:
+    """
+    Builds every plan template once per process.
+    """
+    return {
+        (goal_type, level, equipment, minutes): _build_template(goal_type, level, equipment, minutes)
+        for goal_type, level, equipment, minutes in product(GOAL_TYPES, LEVELS, EQUIPMENT_SETS, SESSION_LENGTHS)
+    }
+
+def normalize_level(level: Optional[str]) -> str:
+    words = (level or "").lower().replace("-", " ").split()
+    return next((LEVEL_ALIASES[word] for word in words if word in LEVEL_ALIASES), DEFAULT_LEVEL)
+
+def normalize_equipment(available_equipment: Optional[Iterable[str]]) -> str:
+    items = {item.lower().strip() for item in available_equipment or [] if item}
+    if items & FULL_GYM_ITEMS:
+        return "full_gym"
+    if items & FREE_WEIGHT_ITEMS:
+        return "free_weights"
+    return "bodyweight"
+
+def normalize_session_minutes(minutes: Optional[int]) -> int:
+    if not minutes:
+        return DEFAULT_SESSION_MINUTES
+    return min(SESSION_LENGTHS, key=lambda length: (abs(length - minutes), length))
+
+def template_key(
+    goal_type: Optional[str],
+    current_fitness_level: Optional[str] = None,
+    available_equipment: Optional[Iterable[str]] = None,
+    time_per_session_minutes: Optional[int] = None,
+) -> TemplateKey:
+    return (
+        goal_type if goal_type in GOAL_TYPES else "general_fitness",
+        normalize_level(current_fitness_level),
+        normalize_equipment(available_equipment),
+        normalize_session_minutes(time_per_session_minutes),
+    )
+
+@lru_cache(maxsize=8192)
+def _parameterized_plan(key: TemplateKey, goal_description: str) -> Tuple[str, dict]:
+    plan = dict(get_library()[key], goal=goal_description)
+    # Content hash: identical requests always get the same id, so duplicate plans can be detected.
+    digest = hashlib.sha256(json.dumps(plan, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"WKPLN_{digest[:12]}", plan
+
+def recommend_workout(
+    goal_type: Optional[str],
+    goal_description: str,
+    current_fitness_level: Optional[str] = None,
+    available_equipment: Optional[List[str]] = None,
+    time_per_session_minutes: Optional[int] = None,
+) -> dict:
+    """
+    Returns {'recommended_plan', 'plan_id', 'creation_date'} for the request.
+    The recommended plan is shared between identical requests and must be treated as read-only.
+    """
+    key = template_key(goal_type, current_fitness_level, available_equipment, time_per_session_minutes)
+    plan_id, plan = _parameterized_plan(key, goal_description)
+    return {
+        "recommended_plan": plan,
+        "plan_id": plan_id,
+        "creation_date": date.today().isoformat(),
+    }
@@ -1,28 +1,34 @@
 from typing import Optional, Type
 import datetime
-from agents import function_tool
+from agents import RunContextWrapper, function_tool
 
+from context import UserSessionContext
+from services.checkin_scheduler import get_checkin_scheduler, parse_time_of_day, parse_weekday
+from services.user_ids import session_user_id
+from services.instrumentation import instrument_tool
+
+@instrument_tool
 @function_tool(
     name_override="CheckinSchedulerTool",
     description_override="Schedules weekly progress check-ins for the user. This tool allows setting up recurring reminders or events for tracking health and wellness progress.",
 )
-async def CheckinSchedulerTool(user_id: int, checkin_day: str, checkin_time: str, reminder_type: Optional[str] = "email") -> dict:
+async def CheckinSchedulerTool(ctx: RunContextWrapper[UserSessionContext], checkin_day: str, checkin_time: str, reminder_type: Optional[str] = "email") -> dict:
     """
-    Schedules weekly progress check-ins for the user.
+    Schedules weekly progress check-ins for the session's user.
     This tool allows setting up recurring reminders or events for tracking health and wellness progress.
     """
-    # In a real system, this would integrate with a calendar API or a notification service.
-    # For this prototype, we'll simulate the scheduling and return a confirmation.
-
-    days_of_week = {
-        "Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3,
-        "Friday": 4, "Saturday": 5, "Sunday": 6
-    }
+    # The check-in is registered with the in-process scheduler (services/checkin_scheduler.py),
+    # which persists it and sends a reminder through its notifier every week. It is always the
+    # session's own schedule; the model cannot pick another user.
+    user_id = session_user_id(ctx.context)
+    if user_id is None:
+        return {
+            "scheduled": False,
+            "message": "Check-in not scheduled: there is no user session.",
+            "next_checkin_date": None
+        }
 
-    today = datetime.date.today()
-    current_day_of_week = today.weekday() # Monday is 0, Sunday is 6
-    
-    target_day_of_week = days_of_week.get(checkin_day.capitalize())
+    target_day_of_week = parse_weekday(checkin_day)
 
     if target_day_of_week is None:
         return {
@@ -31,18 +37,25 @@ async def CheckinSchedulerTool(user_id: int, checkin_day: str, checkin_time: str
             "next_checkin_date": None
         }
 
-    days_until_next_checkin = (target_day_of_week - current_day_of_week + 7) % 7
-    if days_until_next_checkin == 0 and datetime.datetime.now().strftime("%H:%M") > checkin_time.replace(" AM", "").replace(" PM", "")[:5]:
-        # If target day is today, but time has passed, schedule for next week
-        days_until_next_checkin += 7
-        
-    next_checkin_date = today + datetime.timedelta(days=days_until_next_checkin)
-    
-    message = (f"Weekly check-in scheduled for user {user_id} every {checkin_day} at {checkin_time} "
-                f"via {reminder_type}. Your next check-in is on {next_checkin_date.strftime('%Y-%m-%d')}.")
-    
+    time_of_day = parse_time_of_day(checkin_time)
+    if time_of_day is None:
+        return {
+            "scheduled": False,
+            "message": f"Invalid check-in time: {checkin_time}. Please provide a time such as '09:00' or '9 AM'.",
+            "next_checkin_date": None
+        }
+
+    # Scheduled under the session's API user_id, like /schedule_checkin.
+    entry = get_checkin_scheduler().schedule(user_id, target_day_of_week, *time_of_day, reminder_type=reminder_type)
+    next_checkin_date = datetime.datetime.fromtimestamp(entry.next_fire_at)
+    # The session mirrors the active schedule, as with /schedule_checkin; it is saved after the run.
+    ctx.context.scheduled_checkins = [entry.as_dict()]
+
+    message = (f"Weekly check-in scheduled every {checkin_day} at {checkin_time} "
+                f"via {entry.reminder_type}. Your next check-in is on {next_checkin_date.strftime('%Y-%m-%d')}.")
+
     return {
         "scheduled": True,
         "message": message,
         "next_checkin_date": next_checkin_date.strftime('%Y-%m-%d')
-    }
\ No newline at end of file
+    }
@@ -1,6 +1,10 @@
 from typing import Optional
 from agents import function_tool # Import function_tool
 
+from services.goal_parser import analyze_goal
+from services.instrumentation import instrument_tool
+
+@instrument_tool # Latency histogram per call (services/instrumentation.py)
 @function_tool(
     name_override="GoalAnalyzerTool",
     description_override="Converts user goals into a structured format using guardrails. It takes a user's raw input regarding their health and wellness goals and outputs a structured dictionary containing parsed and validated goals.",
@@ -11,18 +15,8 @@ async def GoalAnalyzerTool(user_goal_description: str) -> dict:
     It takes a user's raw input regarding their health and wellness goals
     and outputs a structured dictionary containing parsed and validated goals.
     """
-    # In a real implementation, this would involve more sophisticated NLP
-    # and validation logic to parse the goals and apply guardrails.
-    # For now, we'll return a simple structured goal.
-    # This part needs to be expanded to actually parse and validate goals.
-    # Example: parse 'lose 10 pounds by Christmas' into {'goal_type': 'weight_loss', 'target_weight_loss_kg': 4.5, 'deadline': '2025-12-25'}
-    # The specific structure will depend on the types of goals the agent is designed to handle.
-
-    # Placeholder for actual goal analysis and structuring
-    structured_goal = {
-        "original_description": user_goal_description,
-        "parsed_details": "TBD: detailed parsing based on goal type (e.g., weight loss, muscle gain, specific diet)",
-        "validation_status": "pending", # could be 'valid', 'invalid', 'clarification_needed'
-        "recommendations": "TBD: initial recommendations based on broad goal categories"
-    }
-    return structured_goal
\ No newline at end of file
+    # Parsing is done by the local rule engine in services/goal_parser.py:
+    # e.g. 'lose 10 pounds by Christmas' -> {'goal_type': 'weight_loss', 'target_kg': 4.54, 'deadline': '2026-12-25'}
+    # A 'clarification_needed' status (low confidence) tells the agent to ask the user follow-up questions.
+    structured_goal = analyze_goal(user_goal_description)
+    return structured_goal
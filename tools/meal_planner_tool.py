@@ -1,7 +1,10 @@
 from typing import Optional, List
-import datetime
 from agents import function_tool
 
+from services.meal_planner import generate_meal_plan
+from services.instrumentation import instrument_tool
+
+@instrument_tool
 @function_tool(
     name_override="MealPlannerTool",
     description_override="Generates a 7-day meal plan based on user preferences. This tool takes dietary preferences, restrictions, and caloric goals to produce a structured meal plan.",
@@ -12,22 +15,8 @@ async def MealPlannerTool(dietary_preferences: Optional[str] = None, restriction
     This tool takes dietary preferences, restrictions, and caloric goals
     to produce a structured meal plan.
     """
-    # In a real-world scenario, this would involve a complex logic to
-    # generate a meal plan, possibly integrating with a recipe database
-    # and nutritional information APIs.
-    # For this prototype, we'll return a placeholder plan.
-
-    meal_plan = []
-    for i in range(1, 8):  # 7 days
-        day_plan = f"Day {i}: "
-        if dietary_preferences:
-            day_plan += f"({dietary_preferences}) "
-        if restrictions:
-            day_plan += f" (Restrictions: {', '.join(restrictions)}) "
-        if caloric_goal:
-            day_plan += f" (Approx. {caloric_goal/3} calories per meal) "
-        
-        day_plan += "Breakfast: Oatmeal with fruits, Lunch: Salad with lean protein, Dinner: Chicken and vegetables."
-        meal_plan.append(day_plan)
-
-    return meal_plan
\ No newline at end of file
+    # Recipes come from the bundled catalog (data/recipes.csv). Restrictions such as
+    # 'vegetarian', 'gluten-free' or 'no nuts' are resolved to catalog tags, and each day's
+    # breakfast, lunch and dinner are chosen (and portioned) to land close to caloric_goal.
+    meal_plan = generate_meal_plan(dietary_preferences, restrictions, caloric_goal)
+    return meal_plan
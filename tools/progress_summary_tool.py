@@ -0,0 +1,31 @@
+from typing import Optional
+from agents import RunContextWrapper, function_tool
+
+from context import UserSessionContext
+from services.metric_series import get_metric_store
+from services.user_ids import session_user_id
+from services.instrumentation import instrument_tool
+
+@instrument_tool
+@function_tool(
+    name_override="ProgressSummaryTool",
+    description_override="Summarizes how a tracked metric (e.g. weight, steps, calories) is trending for the user: latest value, rolling average, weekly changes, trend per week and progress toward the goal. Use this for 'how am I doing/trending' questions.",
+)
+async def ProgressSummaryTool(ctx: RunContextWrapper[UserSessionContext], metric_name: Optional[str] = "weight") -> dict:
+    """
+    Summarizes how a tracked metric is trending for the session's user.
+    """
+    # Aggregates are computed over the stored time series with NumPy, so only a small summary
+    # (never the raw log) goes back into the conversation. The user is always the session's own.
+    user_id = session_user_id(ctx.context)
+    if user_id is None:
+        return {"found": False, "message": "No user session to summarize progress for.", "tracked_metrics": []}
+    store = get_metric_store()
+    summary = store.summary(user_id, metric_name or "weight", goal=ctx.context.goal)
+    if summary is None:
+        return {
+            "found": False,
+            "message": f"No '{metric_name}' entries tracked yet.",
+            "tracked_metrics": store.metrics(user_id),
+        }
+    return {"found": True, **summary}
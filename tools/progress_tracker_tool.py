@@ -1,30 +1,62 @@
 from typing import Optional, List, Dict
 import datetime
-from agents import function_tool
+from agents import RunContextWrapper, function_tool
 
+from context import UserSessionContext
+from services.metric_series import UnitMismatchError, get_metric_store
+from services.progress_store import get_progress_store
+from services.user_ids import session_user_id
+from services.instrumentation import instrument_tool
+
+@instrument_tool
 @function_tool(
     name_override="ProgressTrackerTool",
-    description_override="Tracks updates, progress logs, and modifies the user session context. This tool allows the agent to record user progress, update relevant goals, and store information about their journey.",
+    description_override="Records a progress update for the user: numeric values (e.g. '72 kg', '8000 steps') go into the user's metric history and every update is added to their progress log. Use this when the user reports a reading or a milestone.",
 )
-async def ProgressTrackerTool(user_id: int, metric_name: str, metric_value: str, log_notes: Optional[str] = None, update_goal: Optional[bool] = False) -> dict:
+async def ProgressTrackerTool(ctx: RunContextWrapper[UserSessionContext], metric_name: str, metric_value: str, log_notes: Optional[str] = None, update_goal: Optional[bool] = False) -> dict:
     """
-    Tracks updates, progress logs, and modifies the user session context.
-    This tool allows the agent to record user progress, update relevant goals,
-    and store information about their journey.
+    Records a progress update for the session's user: numeric values go into the user's metric time series and
+    every call adds a progress log entry, as /track_progress does.
     """
-    # In a full implementation, this tool would interact with the UserSessionContext
-    # to add to progress_logs and potentially update other fields like 'goal' or 'workout_plan'.
-    # For this prototype, we'll simulate the update and return a success message.
+    # Numeric values ('72 kg', '8000 steps', '160 lbs') are converted to a canonical unit and
+    # appended to the user's columnar time series (services/metric_series.py), where
+    # ProgressSummaryTool can aggregate them. A value in a different unit than the series
+    # (e.g. '176' for weight tracked in kg) is rejected and nothing is logged.
 
-    log_entry = {
-        "timestamp": datetime.datetime.now().isoformat(),
-        "metric_name": metric_name,
-        "metric_value": metric_value,
-        "notes": log_notes
-    }
+    # Progress is stored under the session's API user_id, like /track_progress; the model cannot
+    # pick another user.
+    api_user_id = session_user_id(ctx.context)
+    if api_user_id is None:
+        return {
+            "success": False,
+            "message": "Progress not recorded: there is no user session.",
+            "timestamp": datetime.datetime.now().isoformat(),
+            "notes": log_notes,
+            "updated_context_info": {},
+        }
+    try:
+        recorded = get_metric_store().record_text(api_user_id, metric_name, metric_value)
+    except UnitMismatchError as e:
+        return {
+            "success": False,
+            "message": f"Progress not recorded: {e}",
+            "timestamp": datetime.datetime.now().isoformat(),
+            "notes": log_notes,
+            "updated_context_info": {},
+        }
+
+    progress_store = get_progress_store()
+    # Legacy progress_logs move to the store before the first new entry; the session is saved after the run.
+    progress_store.import_session(api_user_id, ctx.context)
+    entry, _ = progress_store.append(api_user_id, log_notes or f"{metric_name}: {metric_value}")
 
     updated_context = {}
-    message = f"Progress for user {user_id} tracked: {metric_name} set to {metric_value}."
+    if recorded is None:
+        message = (f"Progress note logged: {metric_name} = {metric_value}. "
+                   "It was not recorded as a metric because the value is not a number.")
+    else:
+        metric, value, unit = recorded
+        message = f"Progress tracked: {metric} set to {value:g}{' ' + unit if unit else ''}."
 
     if update_goal:
         # Simulate updating a goal in the context. In reality, this would be more complex.
@@ -33,6 +65,9 @@ async def ProgressTrackerTool(user_id: int, metric_name: str, metric_value: str,
 
     return {
         "success": True,
+        "entry": entry,
         "message": message,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "notes": log_notes,
         "updated_context_info": updated_context
-    }
\ No newline at end of file
+    }
@@ -2,16 +2,18 @@ from pydantic import BaseModel, Field
 from typing import Optional, List
 from agents import function_tool
 
+from services.goal_parser import analyze_goal
+from services.workout_library import recommend_workout
+from services.instrumentation import instrument_tool
+
 class FitnessGoalInput(BaseModel):
     original_description: str = Field(..., description="The original description of the fitness goal.")
-    # Add other expected fields for a structured fitness goal here
-    # Example:
-    # target_weight_loss_kg: Optional[float] = None
-    # goal_type: Optional[str] = None
+    goal_type: Optional[str] = Field(None, description="Goal type from GoalAnalyzerTool (e.g. weight_loss, muscle_gain, endurance).")
 
     class Config:
         extra = "forbid" # Disallow additional properties
 
+@instrument_tool
 @function_tool(
     name_override="WorkoutRecommenderTool",
     description_override="Recommends a workout plan based on the user's parsed goals. This tool takes structured fitness goals and suggests a suitable workout regimen.",
@@ -21,29 +23,17 @@ async def WorkoutRecommenderTool(fitness_goal: FitnessGoalInput, current_fitness
     Recommends a workout plan based on the user's parsed goals.
     This tool takes structured fitness goals and suggests a suitable workout regimen.
     """
-    # In a real implementation, this would use a more sophisticated recommendation engine
-    # based on exercise science principles, user data, and available resources.
-    # For now, we provide a placeholder.
-
-    plan_details = {
-        "goal": fitness_goal.original_description, # Access field from Pydantic model
-        "level": current_fitness_level if current_fitness_level else "all levels",
-        "frequency": "3-4 times per week",
-        "duration_per_session": f"{time_per_session_minutes} minutes" if time_per_session_minutes else "60 minutes",
-        "equipment": ", ".join(available_equipment) if available_equipment else "bodyweight, basic gym equipment",
-        "exercises": [
-            "Warm-up: 5-10 minutes light cardio and dynamic stretches",
-            "Strength Training: (e.g., Squats, Push-ups, Rows, Lunges - 3 sets of 8-12 reps)",
-            "Cardio: 20-30 minutes of moderate intensity (e.g., jogging, cycling)",
-            "Cool-down: 5-10 minutes static stretches"
-        ],
-        "notes": "Adjust intensity and volume based on how you feel. Consult a professional before starting any new workout regimen."
-    }
+    # Plans come from the precomputed template library in services/workout_library.py,
+    # keyed by (goal type, fitness level, equipment set, session length).
+    # If the caller did not pass a goal type, the local goal parser derives it from the description.
+    goal_type = fitness_goal.goal_type or analyze_goal(fitness_goal.original_description)["parsed_details"]["goal_type"]
 
-    workout_plan = {
-        "recommended_plan": plan_details,
-        "plan_id": "WKPLN_001",
-        "creation_date": "2025-11-20"
-    }
+    workout_plan = recommend_workout(
+        goal_type,
+        fitness_goal.original_description,
+        current_fitness_level,
+        available_equipment,
+        time_per_session_minutes,
+    )
 
-    return workout_plan
\ No newline at end of file
+    return workout_plan